@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Wendet SQL-Migrationen auf die Datenbank an
+Wendet Migrationen auf die Datenbank an
+
+Ohne Argumente: ausstehende versionierte Migrationen aus schema.py
+(in schema_migrations protokolliert, bereits angewendete werden übersprungen).
+Mit SQL-Dateien als Argument: genau diese Dateien ausführen (manuell, ohne Protokoll).
 """
 
-import os
+import sys
 import logging
-from users import get_db_connection, USE_POSTGRES
+from users import get_db_connection, release_db_connection
+from schema import migrate, current_version, execute_sql, SCHEMA_VERSION
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,18 +24,12 @@ def apply_migration(sql_file):
     with open(sql_file, 'r', encoding='utf-8') as f:
         sql_content = f.read()
     
-    # Teile in einzelne Statements (bei Kommentaren aufpassen)
-    statements = [s.strip() for s in sql_content.split(';') if s.strip() and not s.strip().startswith('--')]
-    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        for statement in statements:
-            if statement.strip():
-                logger.info(f"Führe aus: {statement[:60]}...")
-                cursor.execute(statement)
-        
+        # Wie schema.py: auch Trigger und $$-Funktionsrümpfe bleiben ganz
+        execute_sql(cursor, sql_content)
         conn.commit()
         logger.info(f"✅ Migration erfolgreich: {sql_file}")
     except Exception as e:
@@ -38,26 +37,18 @@ def apply_migration(sql_file):
         logger.error(f"❌ Migration fehlgeschlagen: {e}")
         raise
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 if __name__ == "__main__":
-    if not USE_POSTGRES:
-        logger.warning("⚠️  SQLite erkannt - Indizes sind für PostgreSQL optimiert, werden aber trotzdem angewendet")
-    
-    migrations_dir = "migrations"
-    if os.path.exists(migrations_dir):
-        migration_files = sorted([
-            os.path.join(migrations_dir, f) 
-            for f in os.listdir(migrations_dir) 
-            if f.endswith('.sql')
-        ])
-        
-        for migration_file in migration_files:
+    if len(sys.argv) > 1:
+        for migration_file in sys.argv[1:]:
             try:
                 apply_migration(migration_file)
             except Exception as e:
                 logger.error(f"Stoppe Migration-Prozess: {e}")
-                break
+                sys.exit(1)
     else:
-        logger.error(f"❌ Migrations-Verzeichnis nicht gefunden: {migrations_dir}")
+        logger.info(f"Schema-Version: {current_version()} (erwartet: {SCHEMA_VERSION})")
+        applied = migrate()
+        logger.info(f"✅ Angewendet: {applied}" if applied else "✅ Schema ist aktuell")
@@ -3,178 +3,703 @@
 
 """
 Backup-Script für die Zeitaufzeichnung-Datenbank
-Erstellt JSON-Dumps aller wichtigen Tabellen
+
+Jede Tabelle wird als gzip-komprimiertes NDJSON (eine JSON-Zeile pro Datensatz)
+blockweise geschrieben, alle Tabellen aus demselben konsistenten Snapshot
+(PostgreSQL: REPEATABLE READ mit Server-Cursor, SQLite: eine Lese-Transaktion).
+Der Speicherbedarf hängt nicht von der Datenbankgröße ab.
+
+Ein Backup ist ein Verzeichnis:
+    backup_20260101_020000/
+        manifest.json          Typ, Watermarks, Zeilenanzahl und SHA-256 (unkomprimiert) pro Tabelle
+        users.ndjson.gz
+        profiles.ndjson.gz
+        timerecords.ndjson.gz
+        submissions.ndjson.gz
+        tombstones.ndjson.gz   nur bei inkrementellen Backups: seitdem gelöschte Zeilen
+
+Inkrementelle Backups enthalten nur Zeilen jenseits der Watermarks des
+Vorgängers (updated_at bzw. id) und die Tombstones aus deleted_rows.
+`compact` führt eine Kette (voll + Inkremente) zu einem neuen vollen Backup
+zusammen.
+
+Abgeleitete Tabellen (Einträge, Monatssummen, Suchindex) werden nicht
+gesichert, sie lassen sich aus den Submissions neu aufbauen.
+
+Aufruf:
+    python backup_database.py backup [verzeichnis]
+    python backup_database.py incremental <vorgänger> [verzeichnis]
+    python backup_database.py compact <letztes_backup> [verzeichnis]
+    python backup_database.py verify <verzeichnis>
+    python backup_database.py restore <verzeichnis> [--dry-run] [--yes]
 """
 
 import os
-import json
 import sys
-from datetime import datetime
-from users import get_db, USE_POSTGRES
+import gzip
+import json
+import shutil
+import sqlite3
+import hashlib
+import logging
+import secrets
+import tempfile
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+
+import users
+from users import get_db_connection, release_db_connection, prune_tombstones, USE_POSTGRES
+
+logger = logging.getLogger(__name__)
+
+BACKUP_FORMAT = 'zeitaufzeichnung-backup'
+BACKUP_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+TOMBSTONE_FILE = 'tombstones.ndjson.gz'
+
+# Zeilen pro Roundtrip (itersize bzw. fetchmany) und pro geschriebenem Block
+BACKUP_FETCH_SIZE = 1000
+
+# Gesicherte Tabellen in Restore-Reihenfolge (Fremdschlüssel zuerst): Spalten und Boolean-Spalten.
+# Passwort-Hashes werden gesichert (sonst ist kein Restore möglich), Reset-Tokens nicht.
+BACKUP_TABLES = {
+    'users': (['id', 'username', 'password_hash', 'pfarrei', 'email', 'is_admin', 'is_approved'],
+              ['is_admin', 'is_approved']),
+    'profiles': (['id', 'user_id', 'vorname', 'nachname', 'geburtsdatum', 'personalnummer',
+                  'einsatzort', 'gkz', 'updated_at'], []),
+    'timerecords': (['id', 'user_id', 'month_year', 'form_data', 'status', 'submitted_at',
+                     'created_at', 'updated_at', 'version', 'content_hash'], []),
+    'submissions': (['id', 'user_id', 'month_year', 'form_data', 'submitted_at'], []),
+}
+
+# Watermark-Spalte pro Tabelle für inkrementelle Backups. users hat keinen
+# Änderungszeitpunkt, ist aber klein - wird in jedem Backup vollständig gesichert.
+BACKUP_WATERMARKS = {
+    'users': None,
+    'profiles': 'updated_at',
+    'timerecords': 'updated_at',
+    # Submissions werden nie geändert, nur angelegt oder gelöscht. Trotzdem nicht
+    # per id: SERIAL-Werte werden beim INSERT vergeben, sichtbar erst beim Commit -
+    # eine kleinere id kann nach einer größeren committen
+    'submissions': 'submitted_at',
+}
+
+# Watermarks (auch das der Tombstones, deleted_at) überlappen: CURRENT_TIMESTAMP hat
+# in SQLite Sekundenauflösung und ist in PostgreSQL der Transaktionsbeginn, eine später
+# committete Zeile kann also älter aussehen. Doppelt exportierte Zeilen sind harmlos
+# (Zusammenführen ersetzt bzw. löscht per id).
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# Tombstones älter als das werden nach jedem Backup entfernt; ältere Vorgänger
+# taugen deshalb nicht mehr als Basis für ein Inkrement.
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('BACKUP_TOMBSTONE_RETENTION_DAYS', '90'))
+
+
+def _json_default(value):
+    """Serialisiert Datums- und Dezimalwerte aus PostgreSQL"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Nicht serialisierbar: {type(value).__name__}")
+
+
+def _plain(value):
+    """Wert so, wie er im Manifest steht (Zeitstempel als ISO-String)"""
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _open_snapshot():
+    """Öffnet eine Verbindung mit konsistentem Lese-Snapshot für alle Tabellen"""
+    if USE_POSTGRES:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # Erstes Statement der (implizit begonnenen) Transaktion
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        cursor.close()
+    else:
+        # Eigene Verbindung: in WAL blockiert die lange Lese-Transaktion keine Schreiber
+        conn = users._open_sqlite_connection(users.DATABASE)
+        conn.execute('BEGIN')
+    return conn
+
+
+def _close_snapshot(conn):
+    conn.rollback()
+    if USE_POSTGRES:
+        release_db_connection(conn)
+    else:
+        conn.close()
+
+
+def _iter_rows(conn, sql, params, fetch_size):
+    """Liefert die Zeilen einer Abfrage blockweise (Listen mit bis zu fetch_size Zeilen)"""
+    if USE_POSTGRES:
+        # Benannter Cursor: Ergebnis bleibt auf dem Server
+        cursor = conn.cursor(name=f'backup_{secrets.token_hex(4)}')
+        cursor.itersize = fetch_size
+    else:
+        cursor = conn.cursor()
+
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _write_ndjson(path, chunks):
+    """
+    Schreibt Blöcke von JSON-Zeilen gzip-komprimiert.
+
+    Returns:
+        tuple: (Zeilen, SHA-256 der unkomprimierten Daten)
+    """
+    digest = hashlib.sha256()
+    count = 0
+
+    # mtime=0: gleicher Inhalt ergibt die gleiche Datei
+    with open(path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+        for lines in chunks:
+            if not lines:
+                continue
+            chunk = ('\n'.join(lines) + '\n').encode('utf-8')
+            digest.update(chunk)
+            gz.write(chunk)
+            count += len(lines)
+
+    return count, digest.hexdigest()
+
 
-def backup_database(output_file=None):
-    """Erstellt ein vollständiges Backup aller Daten"""
-    
-    if not output_file:
+def _watermark_lower_bound(column, watermark):
+    """
+    WHERE-Bedingung und Parameter für Zeilen jenseits eines Watermarks
+    (None: alles exportieren)
+    """
+    if watermark is None or isinstance(watermark, int):
+        # Ältere Backups hatten id-Watermarks (submissions, Tombstones) - einmal komplett
+        return None
+    ph = '%s' if USE_POSTGRES else '?'
+    since = datetime.fromisoformat(str(watermark)) - WATERMARK_OVERLAP
+    return f"{column} > {ph}", since.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _dump_table(conn, table, path, fetch_size, watermark=None):
+    """
+    Schreibt eine Tabelle als gzip-NDJSON, mit watermark nur die Zeilen danach.
+
+    Returns:
+        tuple: (Zeilen, SHA-256, neues Watermark)
+    """
+    columns, bool_columns = BACKUP_TABLES[table]
+    bool_indexes = [columns.index(name) for name in bool_columns]
+    watermark_column = BACKUP_WATERMARKS[table]
+    watermark_index = columns.index(watermark_column) if watermark_column else None
+
+    where, params = '', ()
+    bound = _watermark_lower_bound(watermark_column, watermark) if watermark_column else None
+    if bound:
+        where, params = f'WHERE {bound[0]}', (bound[1],)
+    sql = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id"
+
+    newest = [watermark]
+
+    def chunks():
+        for rows in _iter_rows(conn, sql, params, fetch_size):
+            lines = []
+            for row in rows:
+                record = dict(zip(columns, row))
+                for index in bool_indexes:
+                    value = row[index]
+                    record[columns[index]] = None if value is None else bool(value)
+                lines.append(json.dumps(record, ensure_ascii=False, default=_json_default))
+
+                # Zeilen kommen nach id sortiert, das Maximum des Watermarks also mitführen
+                if watermark_index is not None and row[watermark_index] is not None:
+                    value = _plain(row[watermark_index])
+                    if newest[0] is None or isinstance(newest[0], int) or value > newest[0]:
+                        newest[0] = value
+            yield lines
+
+    count, checksum = _write_ndjson(path, chunks())
+    return count, checksum, newest[0]
+
+
+def _dump_tombstones(conn, path, since, fetch_size):
+    """Schreibt die Tombstones seit since (deleted_at, mit Überlappung), liefert (Zeilen, SHA-256, neues Watermark)"""
+    where, params = '', ()
+    bound = _watermark_lower_bound('deleted_at', since)
+    if bound:
+        where, params = f'WHERE {bound[0]}', (bound[1],)
+    sql = f'SELECT id, table_name, row_id, deleted_at FROM deleted_rows {where} ORDER BY id'
+
+    def chunks():
+        for rows in _iter_rows(conn, sql, params, fetch_size):
+            yield [json.dumps({'table': table, 'id': row_id, 'deleted_at': deleted_at},
+                              ensure_ascii=False, default=_json_default)
+                   for _, table, row_id, deleted_at in rows]
+
+    count, checksum = _write_ndjson(path, chunks())
+    return count, checksum, _tombstone_watermark(conn)
+
+
+def _tombstone_watermark(conn):
+    """Jüngstes deleted_at im Snapshot (None ohne Tombstones - das nächste Inkrement nimmt dann alle)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(deleted_at) FROM deleted_rows')
+        return _plain(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def _parent_path(backup_dir, manifest):
+    """Pfad des Vorgängers eines inkrementellen Backups (relativ zum Backup gespeichert)"""
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(backup_dir)), manifest['parent']))
+
+
+def _print_statistics(output_dir, manifest):
+    file_size = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    tables = manifest['tables']
+
+    print(f"✅ Backup erfolgreich erstellt: {output_dir} ({'inkrementell' if manifest['type'] == 'incremental' else 'vollständig'})")
+    print(f"📊 Statistik:")
+    print(f"   - Users: {tables['users']['rows']}")
+    print(f"   - Profile: {tables['profiles']['rows']}")
+    print(f"   - Timerecords (Entwürfe): {tables['timerecords']['rows']}")
+    print(f"   - Submissions (Eingereicht): {tables['submissions']['rows']}")
+    if 'tombstones' in manifest:
+        print(f"   - Gelöschte Zeilen: {manifest['tombstones']['rows']}")
+    print(f"💾 Größe: {file_size:,} Bytes ({file_size/1024:.2f} KB, komprimiert)")
+
+
+def _finish_backup(tmp_dir, output_dir, manifest):
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.rename(tmp_dir, output_dir)
+
+
+def backup_database(output_dir=None, fetch_size=BACKUP_FETCH_SIZE, parent=None):
+    """
+    Erstellt ein Backup aller Daten (Streaming, konsistenter Snapshot).
+
+    Args:
+        parent: Vorgänger-Backup - dann inkrementell, nur Änderungen seit dessen Watermarks
+
+    Das Backup wird in <output_dir>.tmp geschrieben und erst nach dem
+    Manifest umbenannt - ein abgebrochenes Backup sieht nie vollständig aus.
+
+    Returns:
+        str: Pfad des Backup-Verzeichnisses
+    """
+    parent_manifest = read_manifest(parent) if parent else None
+    if parent_manifest:
+        age = datetime.now() - datetime.fromisoformat(parent_manifest['created_at'])
+        if age > timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            raise ValueError(f"Vorgänger ist älter als {TOMBSTONE_RETENTION_DAYS} Tage - bitte vollständiges Backup erstellen")
+
+    if not output_dir:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f'backup_{timestamp}.json'
-    
-    backup_data = {
+        name = f'backup_{timestamp}' + ('_inkrementell' if parent else '')
+        output_dir = os.path.join(os.path.dirname(os.path.normpath(parent)), name) if parent else name
+
+    if os.path.exists(output_dir):
+        raise FileExistsError(f"Backup-Verzeichnis existiert bereits: {output_dir}")
+
+    tmp_dir = f'{output_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {
+        'format': BACKUP_FORMAT,
+        'version': BACKUP_FORMAT_VERSION,
+        'type': 'incremental' if parent_manifest else 'full',
         'created_at': datetime.now().isoformat(),
         'database_type': 'PostgreSQL' if USE_POSTGRES else 'SQLite',
-        'tables': {}
+        'snapshot': 'repeatable_read' if USE_POSTGRES else 'read_transaction',
+        'tables': {},
+        'watermarks': {},
     }
-    
-    with get_db() as cursor:
-        # 1. Users
-        cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users')
-        users = cursor.fetchall()
-        if USE_POSTGRES:
-            backup_data['tables']['users'] = [dict(row) for row in users]
-        else:
-            backup_data['tables']['users'] = [
-                {
-                    'id': row[0],
-                    'username': row[1],
-                    'pfarrei': row[2],
-                    'email': row[3],
-                    'is_admin': bool(row[4]),
-                    'is_approved': bool(row[5])
-                }
-                for row in users
-            ]
-        
-        # 2. Profile
+    if parent_manifest:
+        manifest['parent'] = os.path.relpath(os.path.abspath(parent), os.path.dirname(os.path.abspath(output_dir)))
+
+    try:
+        conn = _open_snapshot()
         try:
-            cursor.execute('SELECT user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz FROM profiles')
-            profiles = cursor.fetchall()
-            if USE_POSTGRES:
-                backup_data['tables']['profiles'] = [dict(row) for row in profiles]
+            for table, (columns, _) in BACKUP_TABLES.items():
+                since = parent_manifest['watermarks'].get(table) if parent_manifest else None
+                filename = f'{table}.ndjson.gz'
+                rows, checksum, watermark = _dump_table(conn, table, os.path.join(tmp_dir, filename),
+                                                        fetch_size, watermark=since)
+                manifest['tables'][table] = {'file': filename, 'rows': rows, 'sha256': checksum, 'columns': columns}
+                manifest['watermarks'][table] = watermark
+                logger.info(f"Backup {table}: {rows} Zeilen")
+
+            if parent_manifest:
+                rows, checksum, watermark = _dump_tombstones(conn, os.path.join(tmp_dir, TOMBSTONE_FILE),
+                                                             parent_manifest['watermarks']['tombstones'], fetch_size)
+                manifest['tombstones'] = {'file': TOMBSTONE_FILE, 'rows': rows, 'sha256': checksum}
+                manifest['watermarks']['tombstones'] = watermark
             else:
-                backup_data['tables']['profiles'] = [
-                    {
-                        'user_id': row[0],
-                        'vorname': row[1],
-                        'nachname': row[2],
-                        'geburtsdatum': str(row[3]) if row[3] else None,
-                        'personalnummer': row[4],
-                        'einsatzort': row[5],
-                        'gkz': row[6]
-                    }
-                    for row in profiles
-                ]
-        except Exception as e:
-            logger.warning(f"Profile-Tabelle nicht gefunden oder leer: {e}")
-            backup_data['tables']['profiles'] = []
-        
-        # 3. Timerecords (Entwürfe)
-        cursor.execute('SELECT user_id, month_year, form_data, created_at, updated_at FROM timerecords')
-        timerecords = cursor.fetchall()
-        if USE_POSTGRES:
-            backup_data['tables']['timerecords'] = [
-                {**dict(row), 'created_at': row['created_at'].isoformat() if row.get('created_at') else None,
-                 'updated_at': row['updated_at'].isoformat() if row.get('updated_at') else None}
-                for row in timerecords
-            ]
-        else:
-            backup_data['tables']['timerecords'] = [
-                {
-                    'user_id': row[0],
-                    'month_year': row[1],
-                    'form_data': row[2],
-                    'created_at': row[3],
-                    'updated_at': row[4]
-                }
-                for row in timerecords
-            ]
-        
-        # 4. Submissions (Eingereichte Daten)
-        cursor.execute('SELECT id, user_id, month_year, form_data, submitted_at FROM submissions')
-        submissions = cursor.fetchall()
-        if USE_POSTGRES:
-            backup_data['tables']['submissions'] = [
-                {**dict(row), 'submitted_at': row['submitted_at'].isoformat() if row.get('submitted_at') else None}
-                for row in submissions
-            ]
-        else:
-            backup_data['tables']['submissions'] = [
-                {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'month_year': row[2],
-                    'form_data': row[3],
-                    'submitted_at': row[4]
-                }
-                for row in submissions
-            ]
-    
-    # Statistik
-    stats = {
-        'users': len(backup_data['tables']['users']),
-        'profiles': len(backup_data['tables']['profiles']),
-        'timerecords': len(backup_data['tables']['timerecords']),
-        'submissions': len(backup_data['tables']['submissions'])
-    }
-    
-    backup_data['statistics'] = stats
-    
-    # Speichern
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, indent=2, ensure_ascii=False)
-    
-    file_size = os.path.getsize(output_file)
-    
-    print(f"✅ Backup erfolgreich erstellt: {output_file}")
-    print(f"📊 Statistik:")
-    print(f"   - Users: {stats['users']}")
-    print(f"   - Profile: {stats['profiles']}")
-    print(f"   - Timerecords (Entwürfe): {stats['timerecords']}")
-    print(f"   - Submissions (Eingereicht): {stats['submissions']}")
-    print(f"💾 Dateigröße: {file_size:,} Bytes ({file_size/1024:.2f} KB)")
-    
-    return output_file
-
-def restore_database(backup_file):
-    """Stellt Daten aus einem Backup wieder her (VORSICHT!)"""
-    
-    if not os.path.exists(backup_file):
-        print(f"❌ Backup-Datei nicht gefunden: {backup_file}")
+                manifest['watermarks']['tombstones'] = _tombstone_watermark(conn)
+        finally:
+            _close_snapshot(conn)
+
+        _finish_backup(tmp_dir, output_dir, manifest)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    prune_tombstones(TOMBSTONE_RETENTION_DAYS)
+    _print_statistics(output_dir, manifest)
+    return output_dir
+
+
+def read_manifest(backup_dir):
+    """Lädt das Manifest eines Backups"""
+    with open(os.path.join(backup_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BACKUP_FORMAT:
+        raise ValueError(f"Kein Backup im erwarteten Format: {backup_dir}")
+    manifest.setdefault('type', 'full')
+    return manifest
+
+
+def _manifest_files(manifest):
+    """(Name, Eintrag) aller Dateien eines Backups inkl. Tombstones"""
+    files = list(manifest['tables'].items())
+    if 'tombstones' in manifest:
+        files.append(('tombstones', manifest['tombstones']))
+    return files
+
+
+def iter_backup_records(backup_dir, table, manifest=None):
+    """Liest die Datensätze einer Tabelle (oder 'tombstones') zeilenweise aus dem Backup"""
+    manifest = manifest or read_manifest(backup_dir)
+    info = dict(_manifest_files(manifest))[table]
+    with gzip.open(os.path.join(backup_dir, info['file']), 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def verify_backup(backup_dir):
+    """
+    Prüft Zeilenanzahl und Checksumme jeder Datei gegen das Manifest (streamend).
+
+    Returns:
+        dict: Tabelle -> Fehlermeldung (leer, wenn alles stimmt)
+    """
+    manifest = read_manifest(backup_dir)
+    errors = {}
+
+    for table, info in _manifest_files(manifest):
+        digest = hashlib.sha256()
+        rows = 0
+        with gzip.open(os.path.join(backup_dir, info['file']), 'rb') as f:
+            for line in f:
+                digest.update(line)
+                rows += 1
+
+        if rows != info['rows']:
+            errors[table] = f"{rows} Zeilen statt {info['rows']}"
+        elif digest.hexdigest() != info['sha256']:
+            errors[table] = "Checksumme stimmt nicht"
+
+    return errors
+
+
+def backup_chain(backup_dir):
+    """Kette vom vollen Backup bis backup_dir als Liste von (Pfad, Manifest), älteste zuerst"""
+    chain = []
+    while True:
+        manifest = read_manifest(backup_dir)
+        chain.append((backup_dir, manifest))
+        if manifest['type'] == 'full':
+            return list(reversed(chain))
+        backup_dir = _parent_path(backup_dir, manifest)
+        if not os.path.isdir(backup_dir):
+            raise FileNotFoundError(f"Vorgänger-Backup fehlt: {backup_dir}")
+
+
+def compact_backups(backup_dir, output_dir=None, fetch_size=BACKUP_FETCH_SIZE):
+    """
+    Führt ein Backup und alle Vorgänger bis zum letzten vollen Backup zu
+    einem neuen vollen Backup zusammen (Stand von backup_dir).
+
+    Zusammengeführt wird in einer temporären SQLite-Datei (Zeilen per id
+    ersetzt, Tombstones gelöscht), nicht im Speicher.
+
+    Returns:
+        str: Pfad des neuen vollen Backups
+    """
+    chain = backup_chain(backup_dir)
+    for path, _ in chain:
+        errors = verify_backup(path)
+        if errors:
+            raise ValueError(f"Backup {path} ist beschädigt: {errors}")
+
+    latest = chain[-1][1]
+    output_dir = output_dir or f'{os.path.normpath(backup_dir)}_kompakt'
+    if os.path.exists(output_dir):
+        raise FileExistsError(f"Backup-Verzeichnis existiert bereits: {output_dir}")
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        scratch = sqlite3.connect(os.path.join(scratch_dir, 'compact.db'))
+        for table in BACKUP_TABLES:
+            scratch.execute(f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, user_id INTEGER, line TEXT NOT NULL)')
+            scratch.execute(f'CREATE INDEX idx_{table}_user ON {table}(user_id)')
+
+        for path, manifest in chain:
+            for table, info in manifest['tables'].items():
+                # Volles Backup bzw. Tabelle ohne Watermark: ersetzt den bisherigen Stand komplett
+                if manifest['type'] == 'full' or BACKUP_WATERMARKS[table] is None:
+                    scratch.execute(f'DELETE FROM {table}')
+                with gzip.open(os.path.join(path, info['file']), 'rt', encoding='utf-8') as f:
+                    batch = []
+                    for line in f:
+                        line = line.rstrip('\n')
+                        if not line:
+                            continue
+                        record = json.loads(line)
+                        batch.append((record['id'], record.get('user_id'), line))
+                        if len(batch) >= fetch_size:
+                            scratch.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)', batch)
+                            batch = []
+                    scratch.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)', batch)
+
+            if 'tombstones' in manifest:
+                for tombstone in iter_backup_records(path, 'tombstones', manifest):
+                    if tombstone['table'] not in BACKUP_TABLES:
+                        continue
+                    scratch.execute(f"DELETE FROM {tombstone['table']} WHERE id = ?", (tombstone['id'],))
+                    if tombstone['table'] == 'users':
+                        for table in BACKUP_TABLES:
+                            if table != 'users':
+                                scratch.execute(f'DELETE FROM {table} WHERE user_id = ?', (tombstone['id'],))
+            scratch.commit()
+
+        manifest = {
+            'format': BACKUP_FORMAT,
+            'version': BACKUP_FORMAT_VERSION,
+            'type': 'full',
+            'created_at': latest['created_at'],
+            'compacted_at': datetime.now().isoformat(),
+            'compacted_from': [os.path.basename(os.path.normpath(path)) for path, _ in chain],
+            'database_type': latest['database_type'],
+            'snapshot': latest['snapshot'],
+            'tables': {},
+            'watermarks': latest['watermarks'],
+        }
+
+        tmp_dir = f'{output_dir}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            for table, (columns, _) in BACKUP_TABLES.items():
+                cursor = scratch.execute(f'SELECT line FROM {table} ORDER BY id')
+                chunks = iter(lambda: [row[0] for row in cursor.fetchmany(fetch_size)], [])
+                filename = f'{table}.ndjson.gz'
+                rows, checksum = _write_ndjson(os.path.join(tmp_dir, filename), chunks)
+                manifest['tables'][table] = {'file': filename, 'rows': rows, 'sha256': checksum, 'columns': columns}
+            _finish_backup(tmp_dir, output_dir, manifest)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            scratch.close()
+
+    print(f"✅ {len(chain)} Backups zusammengeführt: {output_dir}")
+    return output_dir
+
+
+# Beim Restore geleert (Kinder zuerst); abgeleitete Tabellen werden danach neu aufgebaut
+RESTORE_CLEAR_TABLES = ['timerecord_entries', 'monthly_summaries', 'submissions', 'timerecords', 'profiles', 'users']
+
+
+def _insert_rows(cursor, table, columns, rows):
+    """Schreibt einen Block Zeilen per Bulk-Insert"""
+    if USE_POSTGRES:
+        from psycopg2.extras import execute_values
+        execute_values(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=len(rows))
+    else:
+        placeholders = ', '.join('?' for _ in columns)
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def _load_table(cursor, backup_dir, manifest, table, batch_size):
+    """Lädt eine Tabelle blockweise aus dem Backup, liefert die Zeilenanzahl"""
+    columns = [name for name in manifest['tables'][table]['columns'] if name in BACKUP_TABLES[table][0]]
+    # Submissions: Filter-Metadaten werden beim Einreichen aus form_data extrahiert, nicht gesichert
+    meta_columns = users.SUBMISSION_METADATA_COLUMNS if table == 'submissions' else []
+
+    count = 0
+    batch = []
+    for record in iter_backup_records(backup_dir, table, manifest):
+        row = tuple(record.get(name) for name in columns)
+        if meta_columns:
+            meta = users.extract_submission_metadata(record.get('form_data'))
+            row += tuple(meta[name] for name in meta_columns)
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _insert_rows(cursor, table, columns + meta_columns, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        _insert_rows(cursor, table, columns + meta_columns, batch)
+        count += len(batch)
+    return count
+
+
+def _reset_sequences(cursor):
+    """Setzt die SERIAL-Sequenzen hinter die höchste wiederhergestellte id"""
+    if not USE_POSTGRES:
+        # AUTOINCREMENT: sqlite_sequence folgt explizit eingefügten ids von selbst
+        return
+    for table in BACKUP_TABLES:
+        cursor.execute(f"""SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                                         COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table}""")
+
+
+def _restore_into(cursor, backup_dir, manifest, batch_size):
+    """Ersetzt alle Daten durch das Backup (in der Transaktion des Aufrufers)"""
+    if USE_POSTGRES:
+        cursor.execute(f"TRUNCATE {', '.join(RESTORE_CLEAR_TABLES)}, deleted_rows RESTART IDENTITY CASCADE")
+    else:
+        for table in RESTORE_CLEAR_TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute('DELETE FROM submissions_fts')
+
+    counts = {table: _load_table(cursor, backup_dir, manifest, table, batch_size) for table in BACKUP_TABLES}
+
+    # Abgeleitete Daten aus den wiederhergestellten Zeilen neu aufbauen
+    users.backfill_timerecord_hashes(cursor, batch_size)
+    users.backfill_submission_search(cursor, batch_size)
+    users.backfill_timerecord_entries(cursor, batch_size)
+    users.rebuild_monthly_summaries(cursor, batch_size)
+
+    # Das Leeren hat (SQLite-Trigger) Tombstones erzeugt; ältere Inkremente passen ohnehin nicht mehr
+    cursor.execute('DELETE FROM deleted_rows')
+    return counts
+
+
+def restore_database(backup_dir, dry_run=False, assume_yes=False, batch_size=BACKUP_FETCH_SIZE):
+    """
+    Stellt alle Daten aus einem Backup wieder her (VORSICHT!)
+
+    Vorhandene Daten werden in einer Transaktion geleert und per Bulk-Insert
+    neu geladen (wiederholbar mit gleichem Ergebnis). Inkrementelle Backups
+    werden vorher mit ihrer Kette zusammengeführt.
+
+    Args:
+        dry_run: alles ausführen und am Ende zurückrollen
+        assume_yes: ohne Rückfrage
+
+    Returns:
+        dict: Tabelle -> wiederhergestellte Zeilen, False bei Abbruch oder Fehler
+    """
+
+    if not os.path.isdir(backup_dir):
+        print(f"❌ Backup-Verzeichnis nicht gefunden: {backup_dir}")
         return False
-    
-    with open(backup_file, 'r', encoding='utf-8') as f:
-        backup_data = json.load(f)
-    
-    print(f"⚠️  WARNUNG: Restore überschreibt vorhandene Daten!")
-    print(f"📅 Backup vom: {backup_data['created_at']}")
-    print(f"💾 Datenbank-Typ: {backup_data['database_type']}")
+
+    manifest = read_manifest(backup_dir)
+    if manifest['type'] != 'full':
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            compacted = compact_backups(backup_dir, os.path.join(scratch_dir, 'kompakt'))
+            return restore_database(compacted, dry_run=dry_run, assume_yes=assume_yes, batch_size=batch_size)
+
+    errors = verify_backup(backup_dir)
+    if errors:
+        for table, error in errors.items():
+            print(f"❌ {table}: {error}")
+        return False
+
+    if dry_run:
+        print(f"🧪 Probelauf: Restore wird ausgeführt und zurückgerollt")
+    else:
+        print(f"⚠️  WARNUNG: Restore überschreibt vorhandene Daten!")
+    print(f"📅 Backup vom: {manifest['created_at']}")
+    print(f"💾 Datenbank-Typ: {manifest['database_type']}")
     print(f"📊 Enthält:")
-    for table, count in backup_data['statistics'].items():
-        print(f"   - {table}: {count}")
-    
-    confirm = input("\n❓ Wirklich wiederherstellen? (ja/nein): ")
-    if confirm.lower() != 'ja':
-        print("❌ Abgebrochen.")
+    for table, info in manifest['tables'].items():
+        print(f"   - {table}: {info['rows']}")
+
+    if not dry_run and not assume_yes:
+        confirm = input("\n❓ Wirklich wiederherstellen? (ja/nein): ")
+        if confirm.lower() != 'ja':
+            print("❌ Abgebrochen.")
+            return False
+
+    started = datetime.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        counts = _restore_into(cursor, backup_dir, manifest, batch_size)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            # setval ist nicht transaktional - erst nach erfolgreichem Commit
+            _reset_sequences(cursor)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Restore fehlgeschlagen: {e}")
+        print(f"❌ Restore fehlgeschlagen, Datenbank unverändert: {e}")
         return False
-    
-    # Hier würde die eigentliche Restore-Logik stehen
-    # Aus Sicherheitsgründen nicht automatisch implementiert
-    print("⚠️  Restore-Funktion muss manuell implementiert werden")
-    print("💡 Tipp: Nutze das Backup als Referenz für manuelle Wiederherstellung")
-    
-    return True
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    users.invalidate_user_cache()
+    seconds = (datetime.now() - started).total_seconds()
+    print(f"{'✅ Probelauf erfolgreich' if dry_run else '✅ Restore abgeschlossen'} in {seconds:.1f}s:")
+    for table, rows in counts.items():
+        print(f"   - {table}: {rows}")
+    if not dry_run:
+        print("💡 Tipp: Jetzt ein neues volles Backup erstellen - ältere Inkremente bauen nicht darauf auf")
+    return counts
+
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     if len(sys.argv) > 1:
         if sys.argv[1] == 'backup':
             output = sys.argv[2] if len(sys.argv) > 2 else None
             backup_database(output)
+        elif sys.argv[1] == 'incremental':
+            if len(sys.argv) > 2:
+                backup_database(sys.argv[3] if len(sys.argv) > 3 else None, parent=sys.argv[2])
+            else:
+                print("❌ Bitte Vorgänger-Backup angeben: python backup_database.py incremental <verzeichnis>")
+        elif sys.argv[1] == 'compact':
+            if len(sys.argv) > 2:
+                compact_backups(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+            else:
+                print("❌ Bitte letztes Backup der Kette angeben: python backup_database.py compact <verzeichnis>")
+        elif sys.argv[1] == 'verify':
+            if len(sys.argv) > 2:
+                errors = verify_backup(sys.argv[2])
+                for table, error in errors.items():
+                    print(f"❌ {table}: {error}")
+                print("✅ Backup ist vollständig" if not errors else "❌ Backup ist beschädigt")
+                sys.exit(1 if errors else 0)
+            else:
+                print("❌ Bitte Backup-Verzeichnis angeben: python backup_database.py verify <verzeichnis>")
         elif sys.argv[1] == 'restore':
             if len(sys.argv) > 2:
-                restore_database(sys.argv[2])
+                options = sys.argv[3:]
+                result = restore_database(sys.argv[2], dry_run='--dry-run' in options, assume_yes='--yes' in options)
+                sys.exit(0 if result else 1)
             else:
-                print("❌ Bitte Backup-Datei angeben: python backup_database.py restore <datei>")
+                print("❌ Bitte Backup-Verzeichnis angeben: python backup_database.py restore <verzeichnis>")
         else:
-            print("❌ Unbekannter Befehl. Nutze: backup oder restore")
+            print("❌ Unbekannter Befehl. Nutze: backup, incremental, compact, verify oder restore")
     else:
         # Standard: Backup erstellen
         backup_database()
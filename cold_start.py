@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kaltstart-Report: misst Import und ersten Request in frischen Prozessen
+
+Jeder Lauf startet einen neuen Python-Prozess (wie nach dem Herunterfahren
+der Instanz), importiert die App und schickt einen Request über den
+Test-Client. Ausgegeben werden Medianwerte in ms:
+    import         Modul-Import und create_app()
+    first_request  erster Request (inkl. Schema-Check/DB-Pool)
+    ttfb           Prozessstart bis Antwort des ersten Requests
+    second_request zweiter Request (warm, zum Vergleich)
+
+Aufruf:
+    python cold_start.py [läufe] [pfad]
+    python cold_start.py 5 /login
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import zeitaufzeichnungWeb
+app = zeitaufzeichnungWeb.create_app()
+imported = time.perf_counter()
+client = app.test_client()
+client.get(sys.argv[1])
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "first_request": (first - imported) * 1000,
+    "ttfb": (first - started) * 1000,
+    "second_request": (second - first) * 1000,
+}))
+'''
+
+
+def measure(runs=5, path='/login'):
+    """Führt runs Kaltstarts aus, liefert die Medianwerte pro Phase (ms)"""
+    # Eigene Rate-Limit-Zähler, damit die Messung keine echten Limits verbraucht
+    env = dict(os.environ, LOG_LEVEL='WARNING', RATELIMIT_STORAGE_URI='memory://')
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _PROBE, path], env=env, check=True,
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {phase: round(statistics.median(run[phase] for run in results), 1) for phase in results[0]}
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    path = sys.argv[2] if len(sys.argv) > 2 else '/login'
+    report = measure(runs, path)
+    print(f"Kaltstart ({runs} Läufe, Median, GET {path}):")
+    for phase, ms in report.items():
+        print(f"   - {phase}: {ms:.1f} ms")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Connection Pool für PostgreSQL mit Wartezeit, Pre-Ping und Recycling
+
+psycopg2s ThreadedConnectionPool wirft sofort, wenn alle Verbindungen
+vergeben sind, und gibt auch Verbindungen heraus, die der Server längst
+geschlossen hat (Neustart, Idle-Timeout). Dieser Pool:
+
+- lässt Anfragen bis zu DB_POOL_TIMEOUT Sekunden auf eine freie Verbindung
+  warten (danach PoolTimeout statt sofortigem Fehler)
+- prüft Verbindungen, die länger als DB_POOL_PING_AFTER Sekunden unbenutzt
+  waren, vor der Herausgabe mit SELECT 1 und ersetzt tote Verbindungen
+- schließt Verbindungen nach DB_POOL_MAX_AGE Sekunden Lebensdauer bzw.
+  DB_POOL_MAX_IDLE Sekunden Leerlauf (über DB_POOL_MIN hinaus)
+- zählt Kennzahlen (stats()) für /health und Logs
+
+Ist die Datenbank nicht erreichbar, wird DatabaseUnavailable geworfen -
+die App antwortet dann mit 503 statt 500.
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '20'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+DB_POOL_MAX_AGE = float(os.environ.get('DB_POOL_MAX_AGE', '1800'))
+DB_POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', '300'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '1'))
+
+
+class DatabaseUnavailable(Exception):
+    """Datenbank nicht erreichbar oder ausgelastet (vorübergehend, HTTP 503)"""
+
+
+class PoolTimeout(DatabaseUnavailable):
+    """Keine freie Verbindung innerhalb der Wartezeit"""
+
+
+class ResilientPool:
+    """Thread-sicherer Pool mit begrenzter Warteschlange, Pre-Ping und Recycling"""
+
+    def __init__(self, connect, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 max_age=DB_POOL_MAX_AGE, max_idle=DB_POOL_MAX_IDLE, ping_after=DB_POOL_PING_AFTER):
+        self._connect = connect
+        self.minconn = max(0, min(minconn, maxconn))
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, created_at, last_used)], zuletzt benutzte am Ende
+        self._created = {}       # id(conn) -> created_at der ausgegebenen Verbindungen
+        self._size = 0           # offene + gerade entstehende Verbindungen
+        self._waiting = 0
+        self._counters = dict.fromkeys(('connects', 'connect_errors', 'timeouts', 'ping_failures',
+                                        'recycled', 'discarded', 'waits'), 0)
+
+        # Grundbestand vorab öffnen; ist die Datenbank noch nicht da, eben beim ersten Zugriff
+        for _ in range(self.minconn):
+            self._size += 1
+            try:
+                conn = self._open()
+            except DatabaseUnavailable:
+                break
+            self._idle.append((conn, time.monotonic(), time.monotonic()))
+
+    def _open(self):
+        """Öffnet eine Verbindung für einen bereits in _size reservierten Platz"""
+        try:
+            conn = self._connect()
+        except Exception as e:
+            with self._cond:
+                self._size -= 1
+                self._counters['connect_errors'] += 1
+                self._cond.notify()
+            logger.error(f"Datenbankverbindung fehlgeschlagen: {e}")
+            raise DatabaseUnavailable(f"Datenbank nicht erreichbar: {e}") from e
+        with self._cond:
+            self._counters['connects'] += 1
+        return conn
+
+    def _close(self, conn, reason):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._counters[reason] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _ping(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        # Ohne Autocommit hat das SELECT eine Transaktion begonnen
+        conn.rollback()
+
+    def getconn(self):
+        """
+        Liefert eine geprüfte Verbindung, wartet höchstens timeout Sekunden.
+
+        Raises:
+            PoolTimeout: alle maxconn Verbindungen blieben belegt
+            DatabaseUnavailable: neue Verbindung ließ sich nicht öffnen
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            candidate = None
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        logger.warning(f"DB-Pool ausgelastet: {self.stats()}")
+                        raise PoolTimeout(f"Keine freie Datenbankverbindung nach {self.timeout:.0f}s")
+                    self._waiting += 1
+                    self._counters['waits'] += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    # Platz reservieren, Verbindung außerhalb des Locks öffnen
+                    self._size += 1
+
+            if candidate is None:
+                conn = self._open()
+                with self._cond:
+                    self._created[id(conn)] = time.monotonic()
+                return conn
+
+            conn, created_at, last_used = candidate
+            now = time.monotonic()
+            if getattr(conn, 'closed', 0) or now - created_at > self.max_age:
+                self._close(conn, 'recycled')
+                continue
+            if now - last_used > self.ping_after:
+                try:
+                    self._ping(conn)
+                except Exception as e:
+                    logger.warning(f"Tote DB-Verbindung verworfen: {e}")
+                    self._close(conn, 'ping_failures')
+                    continue
+
+            with self._cond:
+                self._created[id(conn)] = created_at
+            return conn
+
+    def putconn(self, conn, close=False):
+        """Gibt eine Verbindung zurück; kaputte oder abgelaufene werden geschlossen"""
+        with self._cond:
+            created_at = self._created.pop(id(conn), time.monotonic())
+
+        if not close and not getattr(conn, 'closed', 0):
+            try:
+                # Offene Transaktion nicht an den nächsten Request vererben
+                conn.rollback()
+            except Exception:
+                close = True
+        else:
+            close = True
+
+        if close:
+            self._close(conn, 'discarded')
+            return
+
+        now = time.monotonic()
+        with self._cond:
+            self._idle.append((conn, created_at, now))
+            expired = self._expired_idle(now)
+            self._cond.notify()
+        for stale in expired:
+            self._close(stale, 'recycled')
+
+    def _expired_idle(self, now):
+        """Entfernt (unter Lock) Verbindungen jenseits max_idle, soweit über minconn"""
+        expired = []
+        keep = []
+        # Älteste Nutzung zuerst - die am längsten unbenutzten gehen zuerst
+        for entry in self._idle:
+            if now - entry[2] > self.max_idle and self._size - len(expired) > self.minconn:
+                expired.append(entry[0])
+            else:
+                keep.append(entry)
+        self._idle = keep
+        return expired
+
+    def closeall(self):
+        """Schließt alle freien Verbindungen (z.B. beim Herunterfahren)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn, 'discarded')
+
+    def stats(self):
+        """Kennzahlen: Größe, frei, belegt, wartend und Zähler seit Start"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'max': self.maxconn,
+                **self._counters,
+            }
@@ -1,11 +1,14 @@
 import os
+import time
+import atexit
 import smtplib
 import logging
+import threading
+from contextlib import contextmanager
 from email.message import EmailMessage
 
 logger = logging.getLogger(__name__)
 
-
 class MailServiceError(Exception):
     """Custom Exception für Mail-Service Fehler"""
     pass
@@ -18,27 +21,211 @@ def _get_env(name: str) -> str:
     return value
 
 
-def send_pdf_mail(pdf_path: str, recipient: str, filename: str = None) -> None:
+class SMTPSession:
+    """
+    Hält authentifizierte SMTP-Verbindungen über mehrere Sendungen offen.
+    
+    - Verbindungen werden erst beim Versand aufgebaut (STARTTLS + Login)
+    - Jeder sendende Thread nimmt sich eine freie Verbindung aus dem Pool,
+      das SMTP-Gespräch selbst läuft ohne Lock (parallele Sendungen)
+    - Wiederverwendete Verbindungen werden vor MAIL FROM per NOOP geprüft und
+      bei Bedarf ersetzt; Fehler während des Versands werden nicht wiederholt,
+      der Server kann die Nachricht schon angenommen haben (keine Duplikate)
+    - Höchstens pool_size Verbindungen bleiben im Leerlauf offen; ein
+      einziger Aufräum-Thread schließt sie nach idle_timeout Sekunden
+    """
+    
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 idle_timeout: float = 60, timeout: float = 30, pool_size: int = 4):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []  # (Verbindung, zuletzt benutzt), zuletzt benutzte am Ende
+        self._reaper = None
+        self._closed = threading.Event()
+        self._lock = threading.Lock()  # nur für Pool-Zustand, nie während SMTP
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        logger.info(f"SMTP-Verbindung zu {self.host}:{self.port} aufgebaut")
+        return server
+    
+    @staticmethod
+    def _disconnect(server) -> None:
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    @staticmethod
+    def _is_alive(server) -> bool:
+        """NOOP vor dem Versand: tote Verbindung erkennen, solange noch nichts gesendet ist"""
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def _acquire(self) -> smtplib.SMTP:
+        """Freie, lebende Verbindung aus dem Pool oder eine neue"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                candidate, last_used = self._idle.pop()
+            # Prüfung außerhalb des Locks - andere Threads senden derweil weiter
+            if time.monotonic() - last_used < self.idle_timeout and self._is_alive(candidate):
+                return candidate
+            logger.info("SMTP-Verbindung vom Server getrennt oder zu lange unbenutzt, verbinde neu")
+            self._disconnect(candidate)
+        return self._connect()
+    
+    def _release(self, server) -> None:
+        """Gibt die Verbindung in den Pool zurück (oder schließt sie)"""
+        with self._lock:
+            if not self._closed.is_set() and len(self._idle) < self.pool_size:
+                self._idle.append((server, time.monotonic()))
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap, name="smtp-idle-reaper", daemon=True)
+                    self._reaper.start()
+                return
+        self._disconnect(server)
+    
+    def _reap(self) -> None:
+        """Schließt regelmäßig Verbindungen, die länger als idle_timeout unbenutzt sind"""
+        interval = max(min(self.idle_timeout / 2, 30), 0.05)
+        while not self._closed.wait(interval):
+            with self._lock:
+                now = time.monotonic()
+                stale = [server for server, last_used in self._idle if now - last_used >= self.idle_timeout]
+                self._idle = [(server, last_used) for server, last_used in self._idle
+                              if now - last_used < self.idle_timeout]
+            for server in stale:
+                self._disconnect(server)
+            if stale:
+                logger.info(f"{len(stale)} SMTP-Verbindung(en) wegen Inaktivität geschlossen")
+    
+    @contextmanager
+    def _checkout(self):
+        """Verbindung für einen Versand; in unbekanntem Zustand wird sie verworfen"""
+        server = self._acquire()
+        try:
+            yield server
+        except Exception:
+            self._disconnect(server)
+            raise
+        else:
+            self._release(server)
+    
+    def send_message(self, msg: EmailMessage) -> None:
+        """
+        Sendet eine Nachricht über eine bestehende (oder eine neue) Verbindung.
+        
+        Bricht die Verbindung während des Versands ab, wird nicht erneut
+        gesendet - der Fehler geht an den Aufrufer.
+        """
+        with self._checkout() as server:
+            server.send_message(msg)
+    
+    def send_messages(self, messages) -> list:
+        """
+        Sendet viele Nachrichten über eine Verbindung.
+        
+        Abgelehnte Einzelnachrichten brechen den Stapel nicht ab.
+        
+        Returns:
+            list: (nachricht, fehler) für jede nicht zugestellte Nachricht
+        """
+        messages = list(messages)
+        failed = []
+        with self._checkout() as server:
+            for msg in messages:
+                try:
+                    server.send_message(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPDataError) as e:
+                    logger.error(f"Nachricht an {msg['To']} abgelehnt: {e}")
+                    failed.append((msg, e))
+        
+        logger.info(f"{len(messages) - len(failed)} von {len(messages)} Nachrichten versendet")
+        return failed
+    
+    def close(self) -> None:
+        """Schließt alle freien Verbindungen und beendet den Aufräum-Thread"""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._disconnect(server)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_smtp_session() -> SMTPSession:
+    """
+    Liefert die gemeinsame SMTP-Session des Prozesses.
+    
+    Konfiguration aus SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD und
+    SMTP_IDLE_TIMEOUT (Sekunden, Standard: 60). Ändert sich die
+    Konfiguration, wird die alte Verbindung geschlossen.
+    """
+    global _session
+    
+    smtp_host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
+    smtp_port = int((os.getenv("SMTP_PORT") or "587").strip())
+    smtp_user = _get_env("SMTP_USER")
+    smtp_password = _get_env("SMTP_PASSWORD")
+    idle_timeout = float((os.getenv("SMTP_IDLE_TIMEOUT") or "60").strip())
+    
+    with _session_lock:
+        config = (smtp_host, smtp_port, smtp_user, smtp_password, idle_timeout)
+        if _session is None or (_session.host, _session.port, _session.user,
+                                _session.password, _session.idle_timeout) != config:
+            if _session is not None:
+                _session.close()
+            _session = SMTPSession(smtp_host, smtp_port, smtp_user, smtp_password, idle_timeout=idle_timeout)
+        return _session
+
+
+@atexit.register
+def _close_smtp_session() -> None:
+    if _session is not None:
+        _session.close()
+
+
+def send_pdf_mail(pdf_path: str = None, recipient: str = None, filename: str = None,
+                  pdf_data: bytes = None) -> None:
     """
     Sendet PDF-Datei per E-Mail
     
     Args:
-        pdf_path: Pfad zur PDF-Datei
+        pdf_path: Pfad zur PDF-Datei (alternativ pdf_data)
         recipient: E-Mail-Empfänger (oder mehrere kommagetrennt)
         filename: Optionaler Dateiname für Anhang
+        pdf_data: PDF als bytes (ohne Umweg über das Dateisystem)
         
     Raises:
         MailServiceError: Bei Fehlern beim E-Mail-Versand
     """
     try:
-        smtp_host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
-        smtp_port = int((os.getenv("SMTP_PORT") or "587").strip())
-
-        smtp_user = _get_env("SMTP_USER")
-        smtp_password = _get_env("SMTP_PASSWORD")
+        session = get_smtp_session()
+        smtp_user = session.user
 
         # Unterstütze mehrere Empfänger (kommagetrennt)
-        recipients = [r.strip() for r in recipient.split(",") if r.strip()]
+        recipients = [r.strip() for r in (recipient or "").split(",") if r.strip()]
         
         if not recipients:
             raise MailServiceError("Keine gültigen Empfänger angegeben")
@@ -52,10 +239,11 @@ def send_pdf_mail(pdf_path: str, recipient: str, filename: str = None) -> None:
             "Hallo,\n\nanbei deine Zeitaufzeichnung als PDF.\n\nViele Grüße\nZeitaufzeichnung Web"
         )
 
-        with open(pdf_path, "rb") as f:
-            pdf_data = f.read()
+        if pdf_data is None:
+            with open(pdf_path, "rb") as f:
+                pdf_data = f.read()
 
-        attach_name = filename or os.path.basename(pdf_path)
+        attach_name = filename or (os.path.basename(pdf_path) if pdf_path else "Zeitaufzeichnung.pdf")
 
         msg.add_attachment(
             pdf_data,
@@ -64,10 +252,7 @@ def send_pdf_mail(pdf_path: str, recipient: str, filename: str = None) -> None:
             filename=attach_name,
         )
 
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        session.send_message(msg)
             
         logger.info(f"PDF erfolgreich versendet an {len(recipients)} Empfänger")
         
@@ -85,27 +270,26 @@ def send_pdf_mail(pdf_path: str, recipient: str, filename: str = None) -> None:
         raise MailServiceError(f"E-Mail-Versand fehlgeschlagen: {e}")
 
 
-def send_csv_mail(csv_path: str, recipient: str, filename: str = None) -> None:
+def send_csv_mail(csv_path: str = None, recipient: str = None, filename: str = None,
+                  csv_data: bytes = None) -> None:
     """
     Sendet CSV-Datei per E-Mail
     
     Args:
-        csv_path: Pfad zur CSV-Datei
+        csv_path: Pfad zur CSV-Datei (alternativ csv_data)
         recipient: E-Mail-Empfänger (oder mehrere kommagetrennt)
         filename: Optionaler Dateiname für Anhang
+        csv_data: CSV als bytes (ohne Umweg über das Dateisystem)
         
     Raises:
         MailServiceError: Bei Fehlern beim E-Mail-Versand
     """
     try:
-        smtp_host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
-        smtp_port = int((os.getenv("SMTP_PORT") or "587").strip())
-
-        smtp_user = _get_env("SMTP_USER")
-        smtp_password = _get_env("SMTP_PASSWORD")
+        session = get_smtp_session()
+        smtp_user = session.user
 
         # Unterstütze mehrere Empfänger (kommagetrennt)
-        recipients = [r.strip() for r in recipient.split(",") if r.strip()]
+        recipients = [r.strip() for r in (recipient or "").split(",") if r.strip()]
         
         if not recipients:
             raise MailServiceError("Keine gültigen Empfänger angegeben")
@@ -119,10 +303,11 @@ def send_csv_mail(csv_path: str, recipient: str, filename: str = None) -> None:
             "Hallo,\n\nanbei die Zeitaufzeichnungsdaten als CSV-Datei.\n\nViele Grüße\nZeitaufzeichnung Web"
         )
 
-        with open(csv_path, "rb") as f:
-            csv_data = f.read()
+        if csv_data is None:
+            with open(csv_path, "rb") as f:
+                csv_data = f.read()
 
-        attach_name = filename or os.path.basename(csv_path)
+        attach_name = filename or (os.path.basename(csv_path) if csv_path else "Zeitaufzeichnung.csv")
 
         msg.add_attachment(
             csv_data,
@@ -131,10 +316,7 @@ def send_csv_mail(csv_path: str, recipient: str, filename: str = None) -> None:
             filename=attach_name,
         )
 
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        session.send_message(msg)
             
         logger.info(f"CSV erfolgreich versendet an {len(recipients)} Empfänger")
         
@@ -164,11 +346,8 @@ def send_reset_mail(email: str, reset_url: str) -> None:
         MailServiceError: Bei Fehlern beim E-Mail-Versand
     """
     try:
-        smtp_host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
-        smtp_port = int((os.getenv("SMTP_PORT") or "587").strip())
-
-        smtp_user = _get_env("SMTP_USER")
-        smtp_password = _get_env("SMTP_PASSWORD")
+        session = get_smtp_session()
+        smtp_user = session.user
 
         msg = EmailMessage()
         msg["Subject"] = "Zeitaufzeichnung – Passwort zurücksetzen"
@@ -192,10 +371,7 @@ Zeitaufzeichnung Web
 """
         )
 
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        session.send_message(msg)
             
         logger.info(f"Reset-Mail erfolgreich versendet an {email}")
         
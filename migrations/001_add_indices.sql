@@ -1,5 +1,65 @@
--- Datenbank-Indizes für Performance-Optimierung
--- Anwendung: psql DATABASE_URL < migrations/001_add_indices.sql
+-- Grundtabellen und Datenbank-Indizes für Performance-Optimierung
+-- Anwendung: python schema.py (führt ausstehende Migrationen aus und protokolliert sie)
+-- SQLite-Gegenstück: migrations/sqlite/001_add_indices.sql
+
+-- Grundtabellen: gab es schon vor den versionierten Migrationen, daher IF NOT EXISTS
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    pfarrei TEXT NOT NULL,
+    email VARCHAR(255),
+    is_admin BOOLEAN DEFAULT FALSE,
+    is_approved BOOLEAN DEFAULT FALSE,
+    reset_token TEXT,
+    reset_token_expiry TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS timerecords (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    month_year VARCHAR(10) NOT NULL,
+    form_data TEXT NOT NULL,
+    status VARCHAR(20) DEFAULT 'draft',
+    submitted_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, month_year)
+);
+
+-- Ältere Tabellen ohne Status
+ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'draft';
+ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS submitted_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS submissions (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    month_year VARCHAR(10) NOT NULL,
+    form_data TEXT NOT NULL,
+    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL UNIQUE,
+    vorname VARCHAR(255),
+    nachname VARCHAR(255),
+    geburtsdatum DATE,
+    personalnummer VARCHAR(255),
+    einsatzort VARCHAR(255),
+    gkz VARCHAR(255),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Ältere Profile: Kirchengemeinde/Tätigkeit stehen im Formular, nicht im Profil
+ALTER TABLE profiles DROP COLUMN IF EXISTS kirchengemeinde;
+ALTER TABLE profiles DROP COLUMN IF EXISTS taetigkeit;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS personalnummer VARCHAR(255);
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS einsatzort VARCHAR(255);
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS gkz VARCHAR(255);
 
 -- Submissions: Schneller Zugriff nach Einreichungsdatum
 CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at ON submissions(submitted_at DESC);
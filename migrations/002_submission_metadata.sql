@@ -0,0 +1,38 @@
+-- Metadaten-Spalten für Submissions (aus form_data extrahiert)
+-- Anwendung: python schema.py
+-- Backfill direkt in SQL; schema.py trägt danach noch fehlende Werte per Python nach.
+
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS vorname VARCHAR(255);
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS nachname VARCHAR(255);
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS taetigkeit VARCHAR(255);
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS kirchengemeinde VARCHAR(255);
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS gottesdienste_count INTEGER;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS arbeitszeiten_count INTEGER;
+
+-- Backfill: nur Zeilen, die noch nicht befüllt wurden
+-- Gottesdienste/Arbeitszeiten sind JSON-Strings innerhalb von form_data
+-- (Fallback auf _gottesdienste_list/_arbeitszeiten_list wie in extract_submission_metadata)
+UPDATE submissions SET
+    vorname = COALESCE(TRIM(form_data::json ->> 'Vorname'), ''),
+    nachname = COALESCE(TRIM(form_data::json ->> 'Nachname'), ''),
+    taetigkeit = COALESCE(TRIM(form_data::json ->> 'Tätigkeit'), ''),
+    kirchengemeinde = COALESCE(TRIM(form_data::json ->> 'Kath. Kirchengemeinde'), ''),
+    gottesdienste_count = CASE
+        WHEN LEFT(LTRIM(COALESCE(NULLIF(form_data::json ->> 'Gottesdienste', ''), form_data::json ->> '_gottesdienste_list')), 1) = '['
+        THEN json_array_length((COALESCE(NULLIF(form_data::json ->> 'Gottesdienste', ''), form_data::json ->> '_gottesdienste_list'))::json)
+        ELSE 0
+    END,
+    arbeitszeiten_count = CASE
+        WHEN LEFT(LTRIM(COALESCE(NULLIF(form_data::json ->> 'Arbeitszeiten', ''), form_data::json ->> '_arbeitszeiten_list')), 1) = '['
+        THEN json_array_length((COALESCE(NULLIF(form_data::json ->> 'Arbeitszeiten', ''), form_data::json ->> '_arbeitszeiten_list'))::json)
+        ELSE 0
+    END
+WHERE gottesdienste_count IS NULL;
+
+-- Indizes für die Admin-Filter
+CREATE INDEX IF NOT EXISTS idx_submissions_month_year ON submissions(month_year);
+CREATE INDEX IF NOT EXISTS idx_submissions_taetigkeit ON submissions(taetigkeit);
+CREATE INDEX IF NOT EXISTS idx_submissions_kirchengemeinde ON submissions(kirchengemeinde);
+CREATE INDEX IF NOT EXISTS idx_submissions_name ON submissions(nachname, vorname);
+
+-- ANALYZE submissions;
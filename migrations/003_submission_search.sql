@@ -0,0 +1,17 @@
+-- Volltextindex für die Admin-Suche (Name, E-Mail, Username, Kirchengemeinde)
+-- Anwendung: python schema.py
+-- Voraussetzung: 002_submission_metadata.sql
+-- Das Dokument wird wie in users.build_search_document normalisiert:
+-- kleingeschrieben, alles außer Buchstaben/Ziffern wird zu Leerzeichen.
+
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+UPDATE submissions s SET search_vector = to_tsvector('simple', regexp_replace(
+    lower(concat_ws(' ', u.username, u.email, s.vorname, s.nachname, s.kirchengemeinde)),
+    '[^[:alnum:]]+', ' ', 'g'))
+FROM users u
+WHERE u.id = s.user_id AND s.search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_submissions_search ON submissions USING GIN(search_vector);
+
+-- ANALYZE submissions;
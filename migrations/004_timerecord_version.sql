@@ -0,0 +1,4 @@
+-- Versionszähler für Zeitaufzeichnungen (Merge-Patch-Autosave)
+-- Anwendung: python schema.py
+
+ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
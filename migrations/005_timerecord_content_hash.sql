@@ -0,0 +1,8 @@
+-- Content-Hash für Zeitaufzeichnungen (ETag, unveränderte Speicherungen überspringen)
+-- Anwendung: python schema.py
+
+ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+UPDATE timerecords
+SET content_hash = encode(sha256(convert_to(form_data, 'UTF8')), 'hex')
+WHERE content_hash IS NULL;
@@ -0,0 +1,29 @@
+-- Normalisierte Gottesdienst-/Arbeitszeit-Einträge (abgeleitet aus form_data)
+-- Anwendung: python schema.py
+-- Aufgebaut wird die Tabelle danach von schema.py aus allen Zeitaufzeichnungen
+-- und Submissions (users.backfill_timerecord_entries).
+
+CREATE TABLE IF NOT EXISTS timerecord_entries (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    month_year VARCHAR(10) NOT NULL,
+    timerecord_id INTEGER,
+    submission_id INTEGER,
+    kind VARCHAR(20) NOT NULL,
+    entry_date DATE,
+    kirchort VARCHAR(255),
+    beginn VARCHAR(5),
+    ende VARCHAR(5),
+    satz NUMERIC(10, 2),
+    minutes INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (timerecord_id) REFERENCES timerecords(id) ON DELETE CASCADE,
+    FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_entries_user_date ON timerecord_entries(user_id, entry_date);
+CREATE INDEX IF NOT EXISTS idx_entries_kirchort_date ON timerecord_entries(kirchort, entry_date);
+CREATE INDEX IF NOT EXISTS idx_entries_timerecord ON timerecord_entries(timerecord_id);
+CREATE INDEX IF NOT EXISTS idx_entries_submission ON timerecord_entries(submission_id);
+
+-- ANALYZE timerecord_entries;
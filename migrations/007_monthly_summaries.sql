@@ -0,0 +1,23 @@
+-- Monatssummen pro User, Monat, Tätigkeit und Kirchengemeinde (Reporting)
+-- Anwendung: python schema.py
+-- Gefüllt wird die Tabelle von der App: nach dem Anlegen aus allen
+-- Submissions (users.rebuild_monthly_summaries), danach bei jedem
+-- Einreichen/Löschen in derselben Transaktion.
+
+CREATE TABLE IF NOT EXISTS monthly_summaries (
+    user_id INTEGER NOT NULL,
+    month_year VARCHAR(10) NOT NULL,
+    year INTEGER NOT NULL,
+    taetigkeit VARCHAR(255) NOT NULL,
+    kirchengemeinde VARCHAR(255) NOT NULL,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    gottesdienste INTEGER NOT NULL DEFAULT 0,
+    arbeitszeiten INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    satz_total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month_year, taetigkeit, kirchengemeinde),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_monthly_summaries_year ON monthly_summaries(year);
@@ -0,0 +1,34 @@
+-- Tombstone-Log für inkrementelle Backups (backup_database.py incremental)
+-- Anwendung: python schema.py
+-- Jede gelöschte Zeile der gesicherten Tabellen (auch per ON DELETE CASCADE)
+-- wird per Trigger protokolliert; alte Einträge räumt das Backup-Script auf.
+
+CREATE TABLE IF NOT EXISTS deleted_rows (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION record_deleted_row() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_deleted ON users;
+CREATE TRIGGER trg_users_deleted AFTER DELETE ON users
+    FOR EACH ROW EXECUTE PROCEDURE record_deleted_row();
+
+DROP TRIGGER IF EXISTS trg_profiles_deleted ON profiles;
+CREATE TRIGGER trg_profiles_deleted AFTER DELETE ON profiles
+    FOR EACH ROW EXECUTE PROCEDURE record_deleted_row();
+
+DROP TRIGGER IF EXISTS trg_timerecords_deleted ON timerecords;
+CREATE TRIGGER trg_timerecords_deleted AFTER DELETE ON timerecords
+    FOR EACH ROW EXECUTE PROCEDURE record_deleted_row();
+
+DROP TRIGGER IF EXISTS trg_submissions_deleted ON submissions;
+CREATE TRIGGER trg_submissions_deleted AFTER DELETE ON submissions
+    FOR EACH ROW EXECUTE PROCEDURE record_deleted_row();
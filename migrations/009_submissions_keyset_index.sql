@@ -0,0 +1,10 @@
+-- Zusammengesetzter Index für die Keyset-Pagination der Admin-Übersicht
+-- Anwendung: python schema.py
+-- (submitted_at, id) < (?, ?) wird damit zum Range-Scan; der einspaltige
+-- Index aus 001_add_indices.sql ist darin enthalten und entfällt.
+
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at_id ON submissions(submitted_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_submissions_submitted_at;
+
+-- ANALYZE submissions;
@@ -0,0 +1,65 @@
+-- Grundtabellen und Datenbank-Indizes (SQLite-Gegenstück zu migrations/001_add_indices.sql)
+-- Anwendung: python schema.py
+
+-- Grundtabellen: gab es schon vor den versionierten Migrationen, daher IF NOT EXISTS
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    pfarrei TEXT NOT NULL,
+    email TEXT,
+    is_admin INTEGER DEFAULT 0,
+    is_approved INTEGER DEFAULT 0,
+    reset_token TEXT,
+    reset_token_expiry TEXT
+);
+
+CREATE TABLE IF NOT EXISTS timerecords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    month_year TEXT NOT NULL,
+    form_data TEXT NOT NULL,
+    status TEXT DEFAULT 'draft',
+    submitted_at TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, month_year)
+);
+
+-- Ältere Tabellen ohne Status (vorhandene Spalten überspringt schema.py)
+ALTER TABLE timerecords ADD COLUMN status TEXT DEFAULT 'draft';
+ALTER TABLE timerecords ADD COLUMN submitted_at TEXT;
+
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    month_year TEXT NOT NULL,
+    form_data TEXT NOT NULL,
+    submitted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL UNIQUE,
+    vorname TEXT,
+    nachname TEXT,
+    geburtsdatum TEXT,
+    personalnummer TEXT,
+    einsatzort TEXT,
+    gkz TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Ältere Profile ohne die neuen Felder
+ALTER TABLE profiles ADD COLUMN personalnummer TEXT;
+ALTER TABLE profiles ADD COLUMN einsatzort TEXT;
+ALTER TABLE profiles ADD COLUMN gkz TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at ON submissions(submitted_at DESC);
+CREATE INDEX IF NOT EXISTS idx_timerecords_lookup ON timerecords(user_id, month_year);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_profiles_user_id ON profiles(user_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_id ON submissions(user_id);
@@ -0,0 +1,15 @@
+-- Metadaten-Spalten für Submissions (aus form_data extrahiert)
+-- Anwendung: python schema.py; den Backfill übernimmt users.backfill_submission_metadata
+
+ALTER TABLE submissions ADD COLUMN vorname TEXT;
+ALTER TABLE submissions ADD COLUMN nachname TEXT;
+ALTER TABLE submissions ADD COLUMN taetigkeit TEXT;
+ALTER TABLE submissions ADD COLUMN kirchengemeinde TEXT;
+ALTER TABLE submissions ADD COLUMN gottesdienste_count INTEGER;
+ALTER TABLE submissions ADD COLUMN arbeitszeiten_count INTEGER;
+
+-- Indizes für die Admin-Filter
+CREATE INDEX IF NOT EXISTS idx_submissions_month_year ON submissions(month_year);
+CREATE INDEX IF NOT EXISTS idx_submissions_taetigkeit ON submissions(taetigkeit);
+CREATE INDEX IF NOT EXISTS idx_submissions_kirchengemeinde ON submissions(kirchengemeinde);
+CREATE INDEX IF NOT EXISTS idx_submissions_name ON submissions(nachname, vorname);
@@ -0,0 +1,4 @@
+-- Volltextindex für die Admin-Suche: FTS5-Schattentabelle (rowid = submissions.id)
+-- Anwendung: python schema.py; den Aufbau übernimmt users.backfill_submission_search
+
+CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(document);
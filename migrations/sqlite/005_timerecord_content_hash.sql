@@ -0,0 +1,4 @@
+-- Content-Hash für Zeitaufzeichnungen (ETag, unveränderte Speicherungen überspringen)
+-- Anwendung: python schema.py; fehlende Hashes trägt users.backfill_timerecord_hashes nach
+
+ALTER TABLE timerecords ADD COLUMN content_hash TEXT;
@@ -0,0 +1,25 @@
+-- Normalisierte Gottesdienst-/Arbeitszeit-Einträge (abgeleitet aus form_data)
+-- Anwendung: python schema.py; aufgebaut wird die Tabelle von users.backfill_timerecord_entries
+
+CREATE TABLE IF NOT EXISTS timerecord_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    month_year TEXT NOT NULL,
+    timerecord_id INTEGER,
+    submission_id INTEGER,
+    kind TEXT NOT NULL,
+    entry_date TEXT,
+    kirchort TEXT,
+    beginn TEXT,
+    ende TEXT,
+    satz REAL,
+    minutes INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (timerecord_id) REFERENCES timerecords(id) ON DELETE CASCADE,
+    FOREIGN KEY (submission_id) REFERENCES submissions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_entries_user_date ON timerecord_entries(user_id, entry_date);
+CREATE INDEX IF NOT EXISTS idx_entries_kirchort_date ON timerecord_entries(kirchort, entry_date);
+CREATE INDEX IF NOT EXISTS idx_entries_timerecord ON timerecord_entries(timerecord_id);
+CREATE INDEX IF NOT EXISTS idx_entries_submission ON timerecord_entries(submission_id);
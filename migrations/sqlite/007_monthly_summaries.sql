@@ -0,0 +1,20 @@
+-- Monatssummen pro User, Monat, Tätigkeit und Kirchengemeinde (Reporting)
+-- Anwendung: python schema.py; gefüllt von users.rebuild_monthly_summaries
+
+CREATE TABLE IF NOT EXISTS monthly_summaries (
+    user_id INTEGER NOT NULL,
+    month_year TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    taetigkeit TEXT NOT NULL,
+    kirchengemeinde TEXT NOT NULL,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    gottesdienste INTEGER NOT NULL DEFAULT 0,
+    arbeitszeiten INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    satz_total REAL NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month_year, taetigkeit, kirchengemeinde),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_monthly_summaries_year ON monthly_summaries(year);
@@ -0,0 +1,31 @@
+-- Tombstone-Log für inkrementelle Backups (backup_database.py incremental)
+-- Anwendung: python schema.py
+-- Jede gelöschte Zeile der gesicherten Tabellen (auch per ON DELETE CASCADE)
+-- wird per Trigger protokolliert; alte Einträge räumt das Backup-Script auf.
+
+CREATE TABLE IF NOT EXISTS deleted_rows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_users_deleted AFTER DELETE ON users
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES ('users', OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_profiles_deleted AFTER DELETE ON profiles
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES ('profiles', OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_timerecords_deleted AFTER DELETE ON timerecords
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES ('timerecords', OLD.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_submissions_deleted AFTER DELETE ON submissions
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES ('submissions', OLD.id);
+END;
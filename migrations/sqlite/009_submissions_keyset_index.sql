@@ -0,0 +1,6 @@
+-- Zusammengesetzter Index für die Keyset-Pagination der Admin-Übersicht
+-- Anwendung: python schema.py
+
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at_id ON submissions(submitted_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_submissions_submitted_at;
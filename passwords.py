@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Passwort-Hashing mit bcrypt
+
+- Kosten-Faktor wird beim App-Start in einem Hintergrund-Thread per Benchmark
+  auf die Ziel-Latenz (BCRYPT_TARGET_MS) kalibriert oder fest über BCRYPT_COST
+  gesetzt; bis die Kalibrierung fertig ist, gilt BCRYPT_DEFAULT_COST - kein
+  Login wartet auf den Benchmark
+- Der Faktor steht im Hash selbst ($2b$<cost>$...), Hashes mit niedrigerem
+  Faktor werden beim Login transparent hochgestuft (needs_rehash), nie herab -
+  Worker mit unterschiedlich kalibriertem Faktor wechseln sich so nicht ab
+- Hashing läuft in einem begrenzten Thread-Pool, damit viele gleichzeitige
+  Logins nicht alle Request-Threads blockieren; ist er BCRYPT_TIMEOUT Sekunden
+  lang ausgelastet, wird PasswordHashTimeout geworfen (App: 503 statt 500)
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_MIN_COST = 10
+BCRYPT_MAX_COST = 16
+# Übergangswert, solange die Kalibrierung läuft
+BCRYPT_DEFAULT_COST = 12
+BCRYPT_TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', '250'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '2'))
+BCRYPT_TIMEOUT = float(os.environ.get('BCRYPT_TIMEOUT', '10'))
+# Einzelmessungen schwanken (Kaltstart, Nachbarprozesse) - der Median ist stabil
+BCRYPT_CALIBRATION_RUNS = 5
+
+_cost = None
+_cost_lock = threading.Lock()
+_calibration = None
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+
+
+class PasswordHashTimeout(Exception):
+    """Hashing-Pool ausgelastet, Ergebnis nicht innerhalb von BCRYPT_TIMEOUT (vorübergehend)"""
+
+
+def calibrate_cost(target_ms: float = BCRYPT_TARGET_MS) -> int:
+    """
+    Misst mehrere Hashes mit Minimal-Kosten und rechnet den Median auf die
+    Ziel-Latenz hoch (jede Stufe verdoppelt die Rechenzeit).
+    """
+    timings = []
+    for _ in range(BCRYPT_CALIBRATION_RUNS):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'kalibrierung', bcrypt.gensalt(BCRYPT_MIN_COST))
+        timings.append((time.perf_counter() - start) * 1000)
+    elapsed_ms = statistics.median(timings)
+
+    cost = BCRYPT_MIN_COST + int(math.floor(math.log2(max(target_ms / max(elapsed_ms, 0.001), 1))))
+    cost = max(BCRYPT_MIN_COST, min(cost, BCRYPT_MAX_COST))
+    logger.info(f"bcrypt kalibriert: Kosten {cost} (Kosten {BCRYPT_MIN_COST} = {elapsed_ms:.0f} ms, Ziel {target_ms:.0f} ms)")
+    return cost
+
+
+def _configured_cost():
+    """Fester Kosten-Faktor aus BCRYPT_COST oder None"""
+    configured = (os.environ.get('BCRYPT_COST') or '').strip()
+    if configured:
+        return max(4, min(int(configured), 31))
+    return None
+
+
+def _calibrate_in_background():
+    global _cost
+
+    try:
+        cost = calibrate_cost()
+    except Exception as e:
+        logger.warning(f"bcrypt-Kalibrierung fehlgeschlagen, bleibe bei Kosten {BCRYPT_DEFAULT_COST}: {e}")
+        cost = BCRYPT_DEFAULT_COST
+    with _cost_lock:
+        _cost = cost
+
+
+def start_calibration():
+    """
+    Legt den Kosten-Faktor fest, ohne den Aufrufer zu blockieren: BCRYPT_COST
+    sofort, sonst Benchmark in einem Daemon-Thread (einmal pro Prozess).
+    Wird von create_app() aufgerufen, damit kein Request-Thread misst.
+    """
+    global _cost, _calibration
+
+    with _cost_lock:
+        if _cost is not None or _calibration is not None:
+            return
+        configured = _configured_cost()
+        if configured is not None:
+            _cost = configured
+            logger.info(f"bcrypt Kosten aus BCRYPT_COST: {_cost}")
+            return
+        _calibration = threading.Thread(target=_calibrate_in_background, name='bcrypt-calibration', daemon=True)
+        _calibration.start()
+
+
+def is_calibrated() -> bool:
+    """True, sobald der Kosten-Faktor feststeht"""
+    return _cost is not None
+
+
+def get_cost() -> int:
+    """Aktueller Kosten-Faktor (BCRYPT_COST, kalibriert oder BCRYPT_DEFAULT_COST solange die Kalibrierung läuft)"""
+    if _cost is None:
+        start_calibration()
+        if _cost is None:
+            return BCRYPT_DEFAULT_COST
+    return _cost
+
+
+def hash_cost(password_hash: str) -> int:
+    """Liest den Kosten-Faktor aus einem bcrypt-Hash ($2b$12$... -> 12)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+def _hash(password: str, cost: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(cost)).decode('utf-8')
+
+
+def _check(password: str, password_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Kein gültiger bcrypt-Hash
+        return False
+
+
+def _run(fn, *args):
+    """Führt fn im Hashing-Pool aus und wartet höchstens BCRYPT_TIMEOUT Sekunden"""
+    future = _executor.submit(fn, *args)
+    try:
+        return future.result(timeout=BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        # Noch wartende Arbeit verwerfen - niemand holt das Ergebnis mehr ab
+        future.cancel()
+        logger.warning(f"bcrypt-Pool ausgelastet: kein Ergebnis nach {BCRYPT_TIMEOUT:.0f}s")
+        raise PasswordHashTimeout(f"Passwort-Prüfung nicht innerhalb von {BCRYPT_TIMEOUT:.0f}s möglich") from None
+
+
+def hash_password(password: str) -> str:
+    """Hasht ein Passwort mit dem aktuellen Kosten-Faktor (im Thread-Pool)"""
+    return _run(_hash, password, get_cost())
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    """Prüft ein Passwort gegen einen Hash (im Thread-Pool)"""
+    if not password or not password_hash:
+        return False
+    return _run(_check, password, password_hash)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True, wenn der Hash mit einem niedrigeren als dem aktuellen Kosten-Faktor erstellt wurde"""
+    if not is_calibrated():
+        # Erst nach der Kalibrierung hochstufen, sonst ggf. zweimal
+        return False
+    return hash_cost(password_hash) < get_cost()
@@ -2,12 +2,23 @@
 # -*- coding: utf-8 -*-
 
 # pdf_service.py
+from __future__ import annotations
+
+import io
+import os
 import json
 import logging
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from pypdf import PdfReader, PdfWriter
+from typing import TYPE_CHECKING
 from utils import generate_filename, format_date_german
 
+if TYPE_CHECKING:
+    from pypdf import PdfReader, PdfWriter
+
 logger = logging.getLogger(__name__)
 
 TEMPLATE = "Zeitaufzeichnung_Gfb_-_Kuester__Chorleiter_Organisten.pdf"
@@ -181,14 +192,139 @@ def apply_arbeitszeiten_to_pdf_fields(fields: dict, arbeitszeiten_json: str) ->
     return fields
 
 
-def create_pdf(form_data: dict, output_path: str):
+# ============= Template-Cache =============
+# Das Template wird pro Prozess nur einmal von der Platte gelesen. Jeder Thread hält
+# einen eigenen geparsten PdfReader (PdfReader ist nicht thread-safe), aus dem pro
+# Render geklont wird. Der Feld->Seiten-Index wird einmal beim Laden berechnet.
+
+_template_lock = threading.Lock()
+_template_data = None
+_field_pages = None
+_thread_local = threading.local()
+
+
+def _qualified_field_name(annotation) -> str:
+    """
+    Voll qualifizierter Feldname eines Widgets (über die /Parent-Kette).
+
+    Beginnt immer beim Widget selbst: Ein eigenes /T gehört zum Namen, auch
+    wenn /FT erst vom Elternfeld geerbt wird; reine Kind-Widgets ohne /T
+    tragen nichts bei.
+    """
+    node = annotation
+    parts = []
+    while node is not None:
+        if "/T" in node:
+            parts.append(str(node["/T"]))
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return ".".join(reversed(parts))
+
+
+def _build_field_page_index(reader: PdfReader) -> dict:
+    """Ermittelt, auf welchen Seiten welche AcroForm-Felder liegen"""
+    field_pages = {}
+    for page_index, page in enumerate(reader.pages):
+        for annotation in page.get("/Annots", []):
+            annotation = annotation.get_object()
+            if annotation.get("/Subtype") != "/Widget":
+                continue
+            name = _qualified_field_name(annotation)
+            if name:
+                field_pages.setdefault(name, set()).add(page_index)
+    return field_pages
+
+
+def mapped_field_names() -> set:
+    """Alle PDF-Feldnamen, die der Service beschreibt"""
+    names = set(PDF_FIELD_MAP.values())
+    names.update(name for fields in DAY_TO_FIELDS.values() for name in fields)
+    names.update(("Markierfeld 1", "Markierfeld 1_2"))
+    return names
+
+
+def _load_template():
+    """
+    Lädt das Template einmal pro Prozess (erst beim ersten PDF, nicht beim Start)
+    und baut den Feld->Seiten-Index.
+
+    Raises:
+        RuntimeError: Wenn Felder aus PDF_FIELD_MAP/DAY_TO_FIELDS im Template fehlen
+    """
+    global _template_data, _field_pages
+
+    if _template_data is None:
+        with _template_lock:
+            if _template_data is None:
+                from pypdf import PdfReader
+                with open(TEMPLATE, "rb") as f:
+                    data = f.read()
+                field_pages = _build_field_page_index(PdfReader(io.BytesIO(data)))
+                verify_template_fields(field_pages)
+                _field_pages = field_pages
+                _template_data = data
+                logger.info(f"PDF-Template geladen: {TEMPLATE} ({len(_field_pages)} Felder)")
+    return _template_data, _field_pages
+
+
+def _template_reader() -> PdfReader:
+    """Geparster Template-Reader des aktuellen Threads"""
+    from pypdf import PdfReader
+
+    reader = getattr(_thread_local, "reader", None)
+    if reader is None:
+        data, _ = _load_template()
+        reader = PdfReader(io.BytesIO(data))
+        _thread_local.reader = reader
+    return reader
+
+
+def verify_template_fields(field_pages: dict) -> None:
+    """
+    Template-Check beim Laden (_load_template): Jeder gemappte Feldname muss
+    im Template existieren, sonst wird das Template nicht übernommen.
+
+    Raises:
+        RuntimeError: Wenn Felder aus PDF_FIELD_MAP/DAY_TO_FIELDS im Template fehlen
+    """
+    missing = sorted(mapped_field_names() - set(field_pages))
+    if missing:
+        raise RuntimeError(f"PDF-Template {TEMPLATE} enthält folgende Felder nicht: {', '.join(missing)}")
+
+
+def create_pdf(form_data: dict, output=None):
     """
     form_data: dict mit Keys wie im HTML-Form (z.B. 'Nachname', 'GKZ', ...)
-    output_path: wo das fertige PDF gespeichert werden soll
+    output: Pfad oder binäres Datei-Objekt (z.B. BytesIO), in das das PDF
+            geschrieben wird. Ohne output wird das PDF im Speicher gerendert
+            und als bytes zurückgegeben.
     """
-    reader = PdfReader(TEMPLATE)
-    writer = PdfWriter()
-    writer.append(reader)
+    writer = _build_pdf(form_data)
+
+    if output is None:
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "wb") as f:
+            writer.write(f)
+    else:
+        writer.write(output)
+    return None
+
+
+def render_pdf_bytes(form_data: dict) -> bytes:
+    """Rendert ein PDF komplett im Speicher (Worker-Funktion für den Prozess-Pool)"""
+    return create_pdf(form_data)
+
+
+def _build_pdf(form_data: dict) -> PdfWriter:
+    """Klont das Template und füllt alle Felder aus form_data"""
+    from pypdf import PdfWriter
+
+    _, field_pages = _load_template()
+    writer = PdfWriter(clone_from=_template_reader())
 
     werte_pdf = {}
 
@@ -228,9 +364,114 @@ def create_pdf(form_data: dict, output_path: str):
     else:
         logger.debug("Keine Tätigkeit ausgewählt - weder Gottesdienste noch Arbeitszeiten")
 
-    # In alle Seiten schreiben (pypdf setzt pro Seite nur die Felder, die dort existieren)
-    for page in writer.pages:
-        writer.update_page_form_field_values(page, werte_pdf)
+    # Nur die Seiten anfassen, auf denen die gesetzten Felder liegen
+    werte_pro_seite = {}
+    for field, value in werte_pdf.items():
+        for page_index in field_pages.get(field, ()):
+            werte_pro_seite.setdefault(page_index, {})[field] = value
+
+    for page_index in sorted(werte_pro_seite):
+        writer.update_page_form_field_values(writer.pages[page_index], werte_pro_seite[page_index])
+
+    return writer
+
+
+# ============= Massen-Export (Prozess-Pool) =============
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Lazy erzeugter Prozess-Pool für das Rendern vieler PDFs.
+
+    "spawn" statt "fork", damit keine Locks/DB-Verbindungen eines
+    multi-threaded Web-Workers in die Kindprozesse kopiert werden.
+    Größe über PDF_EXPORT_WORKERS (Standard: Anzahl CPUs).
+    """
+    global _process_pool
+
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                workers = int(os.environ.get("PDF_EXPORT_WORKERS") or os.cpu_count() or 1)
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_load_template,
+                )
+                logger.info(f"PDF-Prozess-Pool gestartet ({workers} Worker)")
+    return _process_pool
+
+
+def render_pdfs_parallel(forms):
+    """
+    Rendert viele PDFs parallel im Prozess-Pool.
+
+    Args:
+        forms: Liste von (key, form_data)
+
+    Yields:
+        (key, pdf_bytes, error) in Reihenfolge der Fertigstellung
+    """
+    pool = _get_process_pool()
+    futures = {pool.submit(render_pdf_bytes, form_data): key for key, form_data in forms}
+    try:
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                logger.error(f"PDF-Rendering fehlgeschlagen für {key}: {e}")
+                yield key, None, e
+    finally:
+        # Client hat abgebrochen: noch nicht gestartete Jobs verwerfen
+        for future in futures:
+            future.cancel()
+
+
+class _ZipStreamBuffer:
+    """Nicht-seekbarer Schreibpuffer, aus dem fertige ZIP-Bytes abgeholt werden"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_pdf_zip(files):
+    """
+    Rendert PDFs parallel und streamt sie als ZIP, jedes sobald es fertig ist.
+
+    Args:
+        files: Liste von (dateiname, form_data)
+
+    Yields:
+        bytes: ZIP-Daten in Stücken
+    """
+    buffer = _ZipStreamBuffer()
+    errors = []
+
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, pdf_bytes, error in render_pdfs_parallel(files):
+            if error is not None:
+                errors.append(f"{filename}: {error}")
+                continue
+            archive.writestr(filename, pdf_bytes)
+            yield buffer.drain()
+
+        if errors:
+            archive.writestr("FEHLER.txt", "PDFs konnten nicht erstellt werden:\n" + "\n".join(errors))
 
-    with open(output_path, "wb") as f:
-        writer.write(f)
+    yield buffer.drain()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite-Storage für flask-limiter, geteilt von allen Workern eines Hosts
+
+Mit storage_uri="memory://" zählt jeder gunicorn-Worker für sich, ein Limit
+wie "5 per minute" gilt dann effektiv N-mal. Diese Storage legt die Zähler
+in einer SQLite-Datei ab (WAL, atomare Upserts), die alle Prozesse teilen und
+die einen Neustart übersteht.
+
+Registriert das Schema sqlite:// bei limits:
+    sqlite:///absoluter/pfad/ratelimit.db
+    sqlite://relativer/pfad/ratelimit.db
+
+Unterstützt die Fixed-Window-Strategie (Standard von flask-limiter).
+
+Benchmark:
+    python ratelimit_storage.py
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+from limits.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATELIMIT_DB = os.path.join(tempfile.gettempdir(), 'zeitaufzeichnung_ratelimit.db')
+
+# Abgelaufene Zähler werden nach so vielen incr()-Aufrufen aufgeräumt
+CLEANUP_INTERVAL = 1000
+
+
+def default_storage_uri() -> str:
+    """Storage-URI aus RATELIMIT_STORAGE_URI, sonst SQLite-Datei im Temp-Verzeichnis"""
+    return os.environ.get('RATELIMIT_STORAGE_URI') or f"sqlite://{DEFAULT_RATELIMIT_DB}"
+
+
+class SQLiteStorage(Storage):
+    """Rate-Limit-Zähler in einer SQLite-Datei (prozessübergreifend, atomar)"""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = uri.split('://', 1)[1] or DEFAULT_RATELIMIT_DB
+        self.busy_timeout_ms = int(options.get('busy_timeout_ms', 5000))
+        self._local = threading.local()
+        self._incr_calls = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        """Eine Verbindung pro Thread (nach fork neu, z.B. gunicorn --preload)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={self.busy_timeout_ms}')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS limits (
+                    key TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    expiry REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        """Erhöht den Zähler atomar; ein abgelaufenes Fenster beginnt neu"""
+        conn = self._connection()
+        now = time.time()
+
+        # BEGIN IMMEDIATE: Schreibsperre vor dem Upsert, Lesen danach sieht genau diesen Stand
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('''
+                INSERT INTO limits (key, count, expiry) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    count = CASE WHEN limits.expiry <= ? THEN excluded.count ELSE limits.count + excluded.count END,
+                    expiry = CASE WHEN limits.expiry <= ? THEN excluded.expiry ELSE limits.expiry END
+            ''', (key, amount, now + expiry, now, now))
+            count = conn.execute('SELECT count FROM limits WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._incr_calls += 1
+        if self._incr_calls % CLEANUP_INTERVAL == 0:
+            conn.execute('DELETE FROM limits WHERE expiry <= ?', (now,))
+        return count
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            'SELECT count FROM limits WHERE key = ? AND expiry > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expiry FROM limits WHERE key = ? AND expiry > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._connection().execute('DELETE FROM limits').rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute('DELETE FROM limits WHERE key = ?', (key,))
+
+
+def _benchmark(iterations: int = 20000) -> None:
+    """Misst den Overhead pro Limit-Check (Fixed Window: incr + get_expiry)"""
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import FixedWindowRateLimiter
+
+    path = os.path.join(tempfile.gettempdir(), f'ratelimit_bench_{os.getpid()}.db')
+    item = parse("1000000 per minute")
+
+    for uri in ("memory://", f"sqlite://{path}"):
+        limiter = FixedWindowRateLimiter(storage_from_string(uri))
+        limiter.hit(item, "warmup")
+        start = time.perf_counter()
+        for i in range(iterations):
+            limiter.hit(item, "bench", str(i % 50))
+        elapsed = time.perf_counter() - start
+        print(f"{uri.split('://')[0]:>7}: {elapsed / iterations * 1e6:7.1f} µs pro Check ({iterations} Checks)")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    _benchmark()
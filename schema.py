@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Versionierte Schema-Migrationen
+
+Jede Migration hat eine fortlaufende Nummer und wird genau einmal ausgeführt;
+angewendete Versionen stehen in schema_migrations. Beim Start prüft die App
+nur die höchste Version (eine Abfrage) und führt kein DDL aus, solange das
+Schema aktuell ist.
+
+Die SQL-Dateien sind die einzige Schemadefinition: migrations/00N_<name>.sql
+für PostgreSQL, migrations/sqlite/00N_<name>.sql für SQLite (gleiche Nummern
+und Namen). Nach dem SQL einer Version laufen ihre Backfills aus DATA_STEPS
+(abgeleitete Daten, die sich nicht in SQL berechnen lassen). SQL, Backfills
+und der Eintrag in schema_migrations bilden eine Transaktion - eine
+fehlgeschlagene Migration wird nie als angewendet eingetragen.
+
+Ältere Installationen ohne schema_migrations durchlaufen alle Versionen:
+PostgreSQL-Dateien sind mit IF NOT EXISTS idempotent, in SQLite (ohne
+ADD COLUMN IF NOT EXISTS) überspringt der Runner bereits vorhandene Spalten.
+
+Neue Schemaänderung: beide SQL-Dateien mit der nächsten Nummer anlegen,
+bei Bedarf einen Backfill in DATA_STEPS eintragen.
+
+Aufruf:
+    python schema.py            ausstehende Migrationen anwenden
+    python schema.py status     aktuelle und erwartete Version anzeigen
+"""
+
+import re
+import sys
+import logging
+import sqlite3
+from pathlib import Path
+
+import users
+from users import get_db_connection, release_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Schlüssel für pg_advisory_lock: beim gleichzeitigen Start mehrerer Worker
+# migriert nur einer, die anderen warten und finden danach alles erledigt vor
+MIGRATION_LOCK_KEY = 7041987
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+_MIGRATION_FILE_RE = re.compile(r'^(\d{3})_(\w+)\.sql$')
+
+
+def load_migrations(directory=None):
+    """(Version, Name) aller SQL-Dateien eines Verzeichnisses, aufsteigend"""
+    directory = Path(directory or MIGRATIONS_DIR)
+    found = []
+    for path in directory.glob('*.sql'):
+        match = _MIGRATION_FILE_RE.match(path.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2)))
+    return sorted(found)
+
+
+def migration_path(version, name):
+    """SQL-Datei einer Version für die aktive Datenbank"""
+    directory = MIGRATIONS_DIR if users.USE_POSTGRES else MIGRATIONS_DIR / 'sqlite'
+    return directory / f'{version:03d}_{name}.sql'
+
+
+def _backfill_submission_metadata(cursor):
+    backfilled = users.backfill_submission_metadata(cursor)
+    if backfilled:
+        logger.info(f"Submission-Metadaten nachgetragen für {backfilled} Einträge")
+
+
+def _backfill_submission_search(cursor):
+    indexed = users.backfill_submission_search(cursor)
+    if indexed:
+        logger.info(f"Suchindex aufgebaut für {indexed} Submissions")
+
+
+def _backfill_timerecord_hashes(cursor):
+    backfilled = users.backfill_timerecord_hashes(cursor)
+    if backfilled:
+        logger.info(f"Content-Hash für {backfilled} Zeitaufzeichnungen nachgetragen")
+
+
+def _backfill_timerecord_entries(cursor):
+    # Nur in eine leere Tabelle (ältere Installationen haben sie schon gefüllt)
+    cursor.execute('SELECT 1 FROM timerecord_entries LIMIT 1')
+    if cursor.fetchone() is None:
+        timerecords, submissions = users.backfill_timerecord_entries(cursor)
+        logger.info(f"Einträge aufgebaut für {timerecords} Zeitaufzeichnungen und {submissions} Submissions")
+
+
+def _rebuild_monthly_summaries(cursor):
+    rebuilt = users.rebuild_monthly_summaries(cursor)
+    logger.info(f"Monatssummen aufgebaut aus {rebuilt} Submissions")
+
+
+# Backfills pro Version, laufen nach deren SQL im selben Cursor (Transaktion)
+DATA_STEPS = {
+    2: [_backfill_submission_metadata],
+    3: [_backfill_submission_search],
+    5: [_backfill_timerecord_hashes],
+    6: [_backfill_timerecord_entries],
+    7: [_rebuild_monthly_summaries],
+}
+
+# Reihenfolge und Nummern nie ändern, nur anhängen
+MIGRATIONS = load_migrations()
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def split_sql(script):
+    """
+    Zerlegt ein SQLite-Script in einzelne Statements.
+
+    sqlite3.complete_statement erkennt auch Trigger (BEGIN ... END;), an
+    denen ein einfaches Trennen an ';' scheitern würde.
+    """
+    statements = []
+    buffer = ''
+    for line in script.splitlines():
+        if not buffer and (not line.strip() or line.strip().startswith('--')):
+            continue
+        buffer += line + '\n'
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+def execute_sql(cursor, script):
+    """
+    Führt ein Migrations-Script im Cursor (ohne Commit) aus.
+
+    PostgreSQL: das ganze Script in einem Aufruf (auch $$-Funktionsrümpfe).
+    SQLite: Statement für Statement; ADD COLUMN einer vorhandenen Spalte wird
+    übersprungen (Gegenstück zu ADD COLUMN IF NOT EXISTS).
+    """
+    if users.USE_POSTGRES:
+        cursor.execute(script)
+        return
+    for statement in split_sql(script):
+        try:
+            cursor.execute(statement)
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' not in str(e):
+                raise
+
+
+def _init_version_table(cursor):
+    if users.USE_POSTGRES:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    else:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+
+def current_version():
+    """Höchste angewendete Version (0 ohne schema_migrations)"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        c.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations')
+        return c.fetchone()[0]
+    except Exception:
+        # Tabelle fehlt: Datenbank wurde noch nie versioniert migriert
+        conn.rollback()
+        return 0
+    finally:
+        c.close()
+        release_db_connection(conn)
+
+
+def migrate():
+    """
+    Wendet alle ausstehenden Migrationen in Reihenfolge an.
+
+    PostgreSQL: serialisiert über einen Advisory Lock. SQLite: pro Version eine
+    Transaktion mit sofortiger Schreibsperre, danach wird erneut geprüft.
+
+    Returns:
+        list: Versionen, die dieser Aufruf angewendet hat
+    """
+    conn = get_db_connection()
+    c = conn.cursor()
+    applied = []
+
+    try:
+        if users.USE_POSTGRES:
+            c.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_KEY,))
+        _init_version_table(c)
+        conn.commit()
+
+        # Nach dem Lock erneut lesen - ein anderer Worker kann inzwischen migriert haben
+        c.execute('SELECT version FROM schema_migrations')
+        done = {row[0] for row in c.fetchall()}
+        conn.commit()
+
+        ph = '%s' if users.USE_POSTGRES else '?'
+        for version, name in MIGRATIONS:
+            if version in done:
+                continue
+            if not users.USE_POSTGRES:
+                # Schreibsperre sofort, sonst liefe das DDL außerhalb der Transaktion
+                c.execute('BEGIN IMMEDIATE')
+                c.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,))
+                if c.fetchone():
+                    # Paralleler Prozess war schneller
+                    conn.commit()
+                    continue
+            logger.info(f"Schema-Migration {version:03d} ({name}) wird angewendet")
+            execute_sql(c, migration_path(version, name).read_text(encoding='utf-8'))
+            for step in DATA_STEPS.get(version, []):
+                step(c)
+            c.execute(f'INSERT INTO schema_migrations (version, name) VALUES ({ph}, {ph}) ON CONFLICT (version) DO NOTHING',
+                      (version, name))
+            conn.commit()
+            applied.append(version)
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Schema-Migration fehlgeschlagen: {e}")
+        raise
+    finally:
+        if users.USE_POSTGRES:
+            c.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,))
+            conn.commit()
+        c.close()
+        release_db_connection(conn)
+
+    if applied:
+        logger.info(f"Schema auf Version {SCHEMA_VERSION} (angewendet: {applied})")
+    return applied
+
+
+def ensure_schema():
+    """Beim Start: eine Versionsabfrage, Migrationen nur wenn das Schema veraltet ist"""
+    version = current_version()
+    if version >= SCHEMA_VERSION:
+        return []
+    logger.info(f"Schema-Version {version}, erwartet {SCHEMA_VERSION}")
+    return migrate()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        print(f"Schema-Version: {current_version()} (erwartet: {SCHEMA_VERSION})")
+    else:
+        applied = migrate()
+        print(f"✅ Angewendet: {applied}" if applied else "✅ Schema ist aktuell")
@@ -43,6 +43,7 @@ function addArbeitszeit() {
     return;
   }
 
+  az.id = window.newEntryId ? window.newEntryId() : String(Date.now());
   window.arbeitszeiten.push(az);
   saveArbeitszeiten();
   updateAZListe();
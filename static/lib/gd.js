@@ -47,6 +47,7 @@ function addGottesdienst() {
     return;
   }
 
+  gd.id = window.newEntryId ? window.newEntryId() : String(Date.now());
   window.gottesdienste.push(gd);
   window.saveTimesForEntry && window.saveTimesForEntry(gd.kirchort, gd.datum, gd.beginn, gd.ende, gd.satz);
   saveGottesdienste();
@@ -31,10 +31,13 @@ function getSelectedMonthYear() {
 
 // ========== SERVER-BASIERTE SPEICHERUNG (OHNE LocalStorage für Daten) ==========
 
-async function saveAllFormData() {
-  const monthYear = getSelectedMonthYear();
-  
-  // Sammle alle Formulardaten
+// Zuletzt gespeicherter/geladener Stand pro Monat - Basis für Merge Patches
+const savedSnapshots = {};
+// ETag des Server-Stands pro Monat - If-Match beim vollständigen Speichern
+const savedEtags = {};
+
+// Sammelt alle Formularfelder und Listen als flaches Objekt
+function collectFormData() {
   const formData = {};
   document.querySelectorAll('input, select, textarea').forEach(el => {
     if (el.name && el.name !== 'csrf_token' && el.name !== 'action') {
@@ -45,34 +48,154 @@ async function saveAllFormData() {
   // Listen direkt aus window-Objekten holen (nicht aus LocalStorage!)
   if (window.gottesdienste && window.gottesdienste.length > 0) {
     formData['_gottesdienste_list'] = JSON.stringify(window.gottesdienste);
-    console.log('📦 Gottesdienste zum Speichern:', window.gottesdienste.length);
   }
   
   if (window.arbeitszeiten && window.arbeitszeiten.length > 0) {
     formData['_arbeitszeiten_list'] = JSON.stringify(window.arbeitszeiten);
-    console.log('📦 Arbeitszeiten zum Speichern:', window.arbeitszeiten.length);
   }
   
-  console.log('💾 Speichere Daten:', { monthYear, fieldCount: Object.keys(formData).length });
+  return formData;
+}
+
+// Stabile id pro Gottesdienst/Arbeitszeit - Schlüssel für eintragsweise Patches
+function newEntryId() {
+  return Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+}
+
+// Einträge ohne id (ältere Daten) bekommen eine; der erste Patch überträgt sie einmal komplett
+function ensureEntryIds(list) {
+  (list || []).forEach(entry => {
+    if (entry && !entry.id) entry.id = newEntryId();
+  });
+  return list;
+}
+
+// Listenfelder (JSON-Strings) werden im Patch als Objekt pro Eintrag adressiert,
+// Schlüssel wie utils.keyed_entries auf dem Server: id, sonst "#<Position>"
+const LIST_FIELDS = ['_gottesdienste_list', '_arbeitszeiten_list'];
+
+function keyedEntries(value) {
+  let list = [];
+  try {
+    list = JSON.parse(value || '[]');
+  } catch (e) {
+    list = [];
+  }
+  const keyed = {};
+  (Array.isArray(list) ? list : []).forEach((entry, index) => {
+    keyed[entry && entry.id ? String(entry.id) : `#${index}`] = entry;
+  });
+  return keyed;
+}
+
+function isPlainObject(value) {
+  return value !== null && typeof value === 'object' && !Array.isArray(value);
+}
+
+// JSON Merge Patch (RFC 7396): nur geänderte Felder, null = Feld entfernt.
+// Eine geänderte Liste kostet so nur die betroffenen Einträge statt der ganzen Liste.
+function buildMergePatch(previous, current) {
+  const patch = {};
+  Object.keys(current).forEach(name => {
+    if (previous[name] === current[name]) return;
+    let value = current[name];
+    if (LIST_FIELDS.includes(name) && typeof value === 'string' && typeof previous[name] === 'string') {
+      value = buildMergePatch(keyedEntries(previous[name]), keyedEntries(value));
+    } else if (isPlainObject(previous[name]) && isPlainObject(value)) {
+      value = buildMergePatch(previous[name], value);
+    } else {
+      patch[name] = value;
+      return;
+    }
+    if (Object.keys(value).length > 0) patch[name] = value;
+  });
+  Object.keys(previous).forEach(name => {
+    if (!(name in current)) patch[name] = null;
+  });
+  return patch;
+}
+
+// Versteckte Felder "Gottesdienste"/"Arbeitszeiten" spiegeln die Listen als Ganzes -
+// sie bleiben aus dem Patch, der Server baut sie aus den Listenfeldern neu auf
+const LIST_MIRRORS = ['Gottesdienste', 'Arbeitszeiten'];
+
+function buildFormPatch(previous, current) {
+  const strip = data => {
+    const copy = Object.assign({}, data);
+    LIST_MIRRORS.forEach(name => delete copy[name]);
+    return copy;
+  };
+  return buildMergePatch(strip(previous), strip(current));
+}
+
+async function saveAllFormData() {
+  const monthYear = getSelectedMonthYear();
+  const formData = collectFormData();
+  const snapshot = savedSnapshots[monthYear];
   
   try {
-    const response = await fetch(`/api/timerecords/${monthYear}`, {
-      method: 'POST',
-      headers: {
+    let response = null;
+    
+    // Bekannter Server-Stand: nur die Änderungen senden
+    if (snapshot) {
+      const patch = buildFormPatch(snapshot, formData);
+      const changed = Object.keys(patch).length;
+      if (changed === 0) {
+        console.log('ℹ️ Keine Änderungen seit dem letzten Speichern');
+        return;
+      }
+      
+      console.log('💾 Speichere Änderungen:', { monthYear, changedFields: changed });
+      response = await fetch(`/api/timerecords/${monthYear}`, {
+        method: 'PATCH',
+        headers: {
+          'Content-Type': 'application/merge-patch+json',
+          'X-CSRFToken': getCsrfToken()
+        },
+        body: JSON.stringify(patch)
+      });
+      if (!response.ok) {
+        console.warn('⚠️ Patch abgelehnt, speichere vollständig:', response.status);
+        // Datensatz existiert nicht mehr: ohne If-Match neu anlegen
+        if (response.status === 404) delete savedEtags[monthYear];
+      }
+    }
+    
+    // Erstes Speichern oder Patch fehlgeschlagen: vollständig speichern
+    if (!response || !response.ok) {
+      console.log('💾 Speichere Daten:', { monthYear, fieldCount: Object.keys(formData).length });
+      const headers = {
         'Content-Type': 'application/json',
         'X-CSRFToken': getCsrfToken()
-      },
-      body: JSON.stringify({
-        form_data: JSON.stringify(formData)
-      })
-    });
+      };
+      // Nur überschreiben, was zuletzt geladen/gespeichert wurde (kein Lost Update aus zweitem Tab)
+      if (savedEtags[monthYear]) headers['If-Match'] = savedEtags[monthYear];
+      response = await fetch(`/api/timerecords/${monthYear}`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({
+          form_data: JSON.stringify(formData)
+        })
+      });
+      
+      if (response.status === 412) {
+        console.warn('⚠️ Server-Stand wurde zwischenzeitlich geändert, lade neu');
+        alert('Die Daten für diesen Monat wurden in einem anderen Fenster geändert und werden neu geladen.');
+        await loadAllFormData();
+        return;
+      }
+    }
     
     const result = await response.json();
     if (result.success) {
+      savedSnapshots[monthYear] = formData;
+      const etag = response.headers.get('ETag');
+      if (etag) savedEtags[monthYear] = etag;
+      if (result.unchanged) console.log('ℹ️ Server-Stand war bereits aktuell');
       // Speichere Server-Timestamp im LocalStorage
       const timestampKey = `za_timestamp_${monthYear}`;
       localStorage.setItem(timestampKey, result.updated_at || new Date().toISOString());
-      console.log('✅ Daten gespeichert, Timestamp:', result.updated_at);
+      console.log('✅ Daten gespeichert, Version:', result.version, 'Timestamp:', result.updated_at);
     } else {
       console.error('❌ Fehler beim Speichern:', result.message);
     }
@@ -97,6 +220,8 @@ async function loadAllFormData() {
     
     console.log('✅ Server-Daten gefunden');
     const formData = JSON.parse(result.record.form_data);
+    savedSnapshots[monthYear] = formData;
+    savedEtags[monthYear] = response.headers.get('ETag');
     
     console.log('✅ Daten geladen:', { 
       fieldCount: Object.keys(formData).length,
@@ -109,7 +234,7 @@ async function loadAllFormData() {
       // Listen-Daten
       if (name === '_gottesdienste_list') {
         try {
-          window.gottesdienste = JSON.parse(formData[name]);
+          window.gottesdienste = ensureEntryIds(JSON.parse(formData[name]));
           console.log('✅ Gottesdienste geladen:', window.gottesdienste.length);
           // Rendern
           window.updateListe && window.updateListe();
@@ -122,7 +247,7 @@ async function loadAllFormData() {
       
       if (name === '_arbeitszeiten_list') {
         try {
-          window.arbeitszeiten = JSON.parse(formData[name]);
+          window.arbeitszeiten = ensureEntryIds(JSON.parse(formData[name]));
           console.log('✅ Arbeitszeiten geladen:', window.arbeitszeiten.length);
           // Rendern
           window.updateAZListe && window.updateAZListe();
@@ -248,6 +373,7 @@ function saveTimesForEntry(kirchort, datum, beginn, ende, satz) {
 window.getCsrfToken = getCsrfToken;
 window.getCurrentMonthYear = getCurrentMonthYear;
 window.getSelectedMonthYear = getSelectedMonthYear;
+window.newEntryId = newEntryId;
 window.saveAllFormData = saveAllFormData;
 window.loadAllFormData = loadAllFormData;
 window.startAutoSave = startAutoSave;
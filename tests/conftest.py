@@ -11,14 +11,20 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import os
+
+# Fester, niedriger bcrypt-Faktor: keine Kalibrierung im Hintergrund während der Tests
+os.environ.setdefault('BCRYPT_COST', '4')
+
 import pytest
-from zeitaufzeichnungWeb import app as flask_app
-from users import init_db, init_timerecords_table, init_submissions_table, init_profile_table
+from zeitaufzeichnungWeb import create_app
+from schema import ensure_schema
 
 
 @pytest.fixture
 def app():
     """Flask-App für Tests"""
+    flask_app = create_app()
     flask_app.config.update({
         "TESTING": True,
         "WTF_CSRF_ENABLED": False,  # CSRF für Tests deaktivieren
@@ -26,10 +32,7 @@ def app():
     })
     
     # Datenbank-Tabellen initialisieren
-    init_db()
-    init_timerecords_table()
-    init_submissions_table()
-    init_profile_table()
+    ensure_schema()
     
     yield flask_app
 
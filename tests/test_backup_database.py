@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für backup_database.py (mit temporärer SQLite-Datenbank)
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def temp_db(monkeypatch, tmp_path):
+    """Temporäre Datenbank mit allen Tabellen"""
+    import users
+    monkeypatch.setattr(users, 'DATABASE', str(tmp_path / "backup_test.db"))
+    monkeypatch.setattr(users, 'USE_POSTGRES', False)
+    users.invalidate_user_cache()
+
+    import schema
+    schema.ensure_schema()
+    return tmp_path
+
+
+def _fill(count):
+    from users import create_user, save_timerecord, submit_timerecord, save_profile
+    user = create_user("backuptest", "TestPass123", "Test Pfarrei", email="backup@example.com", is_admin=True)
+    save_profile(user.id, "Anna", "Müller", "1980-01-01", "42", "St. Marien", "123")
+    for i in range(count):
+        arbeitszeiten = [{"kirchort": "St. Marien", "datum": f"{2000 + i // 12}-{i % 12 + 1:02d}-03",
+                          "beginn": "09:00", "ende": "11:30", "satz": "12,50"}]
+        form_data = json.dumps({"Vorname": "Anna", "Notiz": f"Zeile {i}\nmit Umbruch",
+                                "_arbeitszeiten_list": json.dumps(arbeitszeiten)})
+        save_timerecord(user.id, f"{i % 12 + 1:02d}-{2000 + i // 12}", form_data)
+        submit_timerecord(user.id, f"{i % 12 + 1:02d}-{2000 + i // 12}", form_data)
+    return user
+
+
+class TestBackup:
+    """Tests für das Streaming-Backup"""
+
+    def test_backup_manifest_and_records(self, temp_db):
+        """Test: Manifest enthält Zeilen und Checksummen, Datensätze sind lesbar"""
+        from backup_database import backup_database, read_manifest, iter_backup_records, verify_backup
+
+        user = _fill(25)
+        backup_dir = backup_database(str(temp_db / "backup"), fetch_size=7)
+
+        manifest = read_manifest(backup_dir)
+        assert {table: info['rows'] for table, info in manifest['tables'].items()} == \
+            {'users': 1, 'profiles': 1, 'timerecords': 25, 'submissions': 25}
+        assert verify_backup(backup_dir) == {}
+        assert not os.path.exists(f"{backup_dir}.tmp")
+
+        (record,) = iter_backup_records(backup_dir, 'users')
+        assert record['id'] == user.id and record['is_admin'] is True
+        assert record['password_hash'].startswith('$2')
+
+        timerecords = list(iter_backup_records(backup_dir, 'timerecords'))
+        assert [r['id'] for r in timerecords] == sorted(r['id'] for r in timerecords)
+        assert json.loads(timerecords[3]['form_data'])['Notiz'] == "Zeile 3\nmit Umbruch"
+
+    def test_verify_detects_corruption(self, temp_db):
+        """Test: Veränderte Tabellen-Datei fällt bei der Prüfung auf"""
+        from backup_database import backup_database, verify_backup
+
+        _fill(3)
+        backup_dir = backup_database(str(temp_db / "backup"))
+
+        path = os.path.join(backup_dir, 'submissions.ndjson.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = f.readlines()
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.writelines(lines[:1] + [lines[1].replace('Zeile', 'Zeiie')] + lines[2:])
+
+        assert set(verify_backup(backup_dir)) == {'submissions'}
+        with pytest.raises(FileExistsError):
+            backup_database(backup_dir)
+
+    def test_incremental_contains_changes_and_tombstones(self, temp_db, monkeypatch):
+        """Test: Inkrement enthält nur geänderte/neue Zeilen und die Löschungen"""
+        import backup_database
+        from backup_database import backup_database as backup, read_manifest, iter_backup_records, verify_backup
+        from users import get_db, save_timerecord, submit_timerecord, delete_submission, delete_timerecord
+
+        monkeypatch.setattr(backup_database, 'WATERMARK_OVERLAP', backup_database.timedelta(0))
+        user = _fill(5)
+        with get_db() as cursor:
+            cursor.execute("UPDATE timerecords SET updated_at = '2020-01-01 00:00:00'")
+            cursor.execute("UPDATE profiles SET updated_at = '2020-01-01 00:00:00'")
+            cursor.execute("UPDATE submissions SET submitted_at = '2020-01-01 00:00:00'")
+            cursor.execute("SELECT id FROM submissions ORDER BY id")
+            submission_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM timerecords WHERE month_year = '02-2000'")
+            deleted_timerecord = cursor.fetchone()[0]
+        full = backup(str(temp_db / "voll"))
+
+        save_timerecord(user.id, "01-2000", json.dumps({"Vorname": "Anna", "Notiz": "geändert"}))
+        submit_timerecord(user.id, "06-2001", json.dumps({"Vorname": "Anna"}))
+        delete_timerecord(user.id, "02-2000")
+        delete_submission(submission_ids[0])
+
+        incremental = backup(parent=full)
+        assert os.path.dirname(incremental) == os.path.dirname(full)
+        manifest = read_manifest(incremental)
+        assert manifest['type'] == 'incremental' and manifest['parent'] == 'voll'
+        assert verify_backup(incremental) == {}
+
+        assert manifest['tables']['profiles']['rows'] == 0
+        assert {r['month_year'] for r in iter_backup_records(incremental, 'timerecords')} == {'01-2000'}
+        assert [r['month_year'] for r in iter_backup_records(incremental, 'submissions')] == ['06-2001']
+        assert {(t['table'], t['id']) for t in iter_backup_records(incremental, 'tombstones')} == \
+            {('timerecords', deleted_timerecord), ('submissions', submission_ids[0])}
+
+    def test_incremental_catches_late_commits(self, temp_db):
+        """Test: Submission/Tombstone mit kleinerer id, aber später committet, landet im nächsten Inkrement"""
+        from backup_database import backup_database as backup, compact_backups, read_manifest, iter_backup_records
+        from users import get_db
+
+        user = _fill(3)
+        with get_db() as cursor:
+            # Eine größere id ist schon sichtbar, wenn das erste Backup läuft ...
+            cursor.execute("""INSERT INTO submissions (id, user_id, month_year, form_data)
+                              VALUES (50, ?, '09-2024', '{}')""", (user.id,))
+            cursor.execute("""INSERT INTO deleted_rows (id, table_name, row_id)
+                              VALUES (50, 'timerecords', 9999)""")
+        full = backup(str(temp_db / "voll"))
+        watermarks = read_manifest(full)['watermarks']
+
+        # ... die kleineren ids committen erst danach, mit Zeitstempel aus dem Transaktionsbeginn
+        with get_db() as cursor:
+            cursor.execute("""INSERT INTO submissions (id, user_id, month_year, form_data, submitted_at)
+                              VALUES (20, ?, '10-2024', '{}', datetime(?, '-1 minute'))""",
+                           (user.id, watermarks['submissions']))
+            cursor.execute("DELETE FROM submissions WHERE id = 1")
+            cursor.execute("UPDATE deleted_rows SET id = 20, deleted_at = datetime(?, '-1 minute') WHERE id = 51",
+                           (watermarks['tombstones'],))
+        incremental = backup(str(temp_db / "inkrement"), parent=full)
+
+        assert 20 in {r['id'] for r in iter_backup_records(incremental, 'submissions')}
+        assert ('submissions', 1) in {(t['table'], t['id']) for t in iter_backup_records(incremental, 'tombstones')}
+
+        compacted = compact_backups(incremental)
+        fresh = backup(str(temp_db / "frisch"))
+        assert list(iter_backup_records(compacted, 'submissions')) == list(iter_backup_records(fresh, 'submissions'))
+
+    def test_compact_matches_full_backup(self, temp_db):
+        """Test: Zusammengeführte Kette entspricht einem frischen vollen Backup"""
+        from backup_database import backup_database as backup, compact_backups, read_manifest, iter_backup_records, verify_backup
+        from users import create_user, save_timerecord, submit_timerecord, save_profile, delete_submission, delete_user_account
+
+        user = _fill(4)
+        other = create_user("zweiter", "TestPass123", "Test Pfarrei", email="zweiter@example.com")
+        save_profile(other.id, "Bernd", "Schulz", "1970-01-01", "7", "St. Josef", "456")
+        submit_timerecord(other.id, "03-2024", json.dumps({"Vorname": "Bernd"}))
+        first = backup(str(temp_db / "b1"))
+
+        save_timerecord(user.id, "01-2000", json.dumps({"Vorname": "Anna", "Notiz": "neu"}))
+        delete_user_account(other.id)
+        second = backup(str(temp_db / "b2"), parent=first)
+
+        submit_timerecord(user.id, "07-2024", json.dumps({"Vorname": "Anna"}))
+        delete_submission(1)
+        third = backup(str(temp_db / "b3"), parent=second)
+
+        compacted = compact_backups(third)
+        fresh = backup(str(temp_db / "frisch"))
+
+        manifest = read_manifest(compacted)
+        assert manifest['type'] == 'full' and manifest['compacted_from'] == ['b1', 'b2', 'b3']
+        assert manifest['watermarks'] == read_manifest(third)['watermarks']
+        assert verify_backup(compacted) == {}
+        for table in ('users', 'profiles', 'timerecords', 'submissions'):
+            assert list(iter_backup_records(compacted, table)) == list(iter_backup_records(fresh, table)), table
+
+
+class TestRestore:
+    """Tests für den Bulk-Restore"""
+
+    def test_restore_roundtrip_and_idempotent(self, temp_db):
+        """Test: Restore stellt den Stand des Backups wieder her, auch wiederholt"""
+        from backup_database import backup_database, restore_database, iter_backup_records
+        from users import create_user, get_db, get_yearly_report, get_timerecord_entries, save_timerecord, delete_user_account
+
+        user = _fill(6)
+        with get_db() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM submissions_fts")
+            indexed = cursor.fetchone()[0]
+        report = get_yearly_report(2000)
+        entries = get_timerecord_entries(user_id=user.id)
+        assert len(entries) == 6 and report['rows']
+        original = backup_database(str(temp_db / "original"))
+
+        other = create_user("spaeter", "TestPass123", "Test Pfarrei", email="spaeter@example.com")
+        save_timerecord(user.id, "01-2000", json.dumps({"Vorname": "Anna", "Notiz": "überschrieben"}))
+        delete_user_account(user.id)
+
+        for _ in range(2):
+            counts = restore_database(original, assume_yes=True, batch_size=4)
+            assert counts == {'users': 1, 'profiles': 1, 'timerecords': 6, 'submissions': 6}
+
+        restored = backup_database(str(temp_db / "wiederhergestellt"))
+        for table in counts:
+            assert list(iter_backup_records(restored, table)) == list(iter_backup_records(original, table)), table
+
+        assert get_yearly_report(2000) == report
+        assert get_timerecord_entries(user_id=user.id) == entries
+        with get_db() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM submissions_fts")
+            assert cursor.fetchone()[0] == indexed
+            cursor.execute("SELECT COUNT(*) FROM deleted_rows")
+            assert cursor.fetchone()[0] == 0
+        assert create_user("neu", "TestPass123", "Test Pfarrei").id > max(user.id, other.id)
+
+    def test_restore_dry_run_leaves_data(self, temp_db):
+        """Test: Probelauf lädt alles, ändert aber nichts"""
+        from backup_database import backup_database, restore_database
+        from users import create_user, get_all_users
+
+        _fill(2)
+        backup_dir = backup_database(str(temp_db / "backup"))
+        create_user("zusaetzlich", "TestPass123", "Test Pfarrei")
+
+        assert restore_database(backup_dir, dry_run=True)['users'] == 1
+        assert len(get_all_users()) == 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für db_pool.py (ResilientPool)
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from db_pool import ResilientPool, DatabaseUnavailable, PoolTimeout
+
+
+@pytest.fixture
+def connect(tmp_path):
+    """Verbindungsfabrik auf eine temporäre SQLite-Datei (zählt geöffnete Verbindungen)"""
+    opened = []
+
+    def factory():
+        conn = sqlite3.connect(str(tmp_path / "pool_test.db"), check_same_thread=False)
+        opened.append(conn)
+        return conn
+    factory.opened = opened
+    return factory
+
+
+class TestResilientPool:
+    """Tests für Wartezeit, Pre-Ping und Recycling"""
+
+    def test_reuses_connections(self, connect):
+        """Test: Zurückgegebene Verbindung wird wiederverwendet, Kennzahlen stimmen"""
+        pool = ResilientPool(connect, minconn=1, maxconn=2, ping_after=60)
+        assert len(connect.opened) == 1
+
+        conn = pool.getconn()
+        assert pool.stats()['in_use'] == 1
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+
+        stats = pool.stats()
+        assert stats['size'] == 1 and stats['idle'] == 0 and stats['connects'] == 1
+
+    def test_timeout_when_saturated(self, connect):
+        """Test: Volle Pools werfen nach der Wartezeit PoolTimeout (ein DatabaseUnavailable)"""
+        pool = ResilientPool(connect, minconn=0, maxconn=1, timeout=0.05)
+        pool.getconn()
+
+        with pytest.raises(DatabaseUnavailable):
+            pool.getconn()
+        assert pool.stats()['timeouts'] == 1
+
+    def test_waiter_gets_released_connection(self, connect):
+        """Test: Wartende Anfrage bekommt die Verbindung, sobald sie frei wird"""
+        pool = ResilientPool(connect, minconn=0, maxconn=1, timeout=5, ping_after=60)
+        conn = pool.getconn()
+
+        releaser = threading.Timer(0.05, pool.putconn, args=(conn,))
+        releaser.start()
+        assert pool.getconn() is conn
+        releaser.join()
+        assert pool.stats()['waits'] >= 1
+
+        pool.timeout = 0
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+
+    def test_pre_ping_replaces_dead_connection(self, connect):
+        """Test: Tote Verbindung im Leerlauf wird beim Herausgeben ersetzt"""
+        pool = ResilientPool(connect, minconn=1, maxconn=1, ping_after=0)
+        dead = connect.opened[0]
+        dead.close()
+        time.sleep(0.01)
+
+        conn = pool.getconn()
+        assert conn is not dead
+        conn.execute('SELECT 1')
+        assert pool.stats()['ping_failures'] == 1
+
+    def test_max_age_recycles(self, connect):
+        """Test: Zu alte Verbindungen werden geschlossen und neu geöffnet"""
+        pool = ResilientPool(connect, minconn=1, maxconn=1, max_age=0)
+        old = connect.opened[0]
+        time.sleep(0.01)
+
+        assert pool.getconn() is not old
+        assert pool.stats()['recycled'] == 1
+
+    def test_max_idle_shrinks_to_minconn(self, connect):
+        """Test: Überzählige Verbindungen im Leerlauf werden bis minconn geschlossen"""
+        pool = ResilientPool(connect, minconn=1, maxconn=3, max_idle=0, ping_after=60)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        time.sleep(0.01)
+        pool.putconn(second)
+
+        assert pool.stats()['size'] == 1
+
+    def test_connect_failure(self):
+        """Test: Nicht erreichbare Datenbank wird zu DatabaseUnavailable, Platz bleibt frei"""
+        def refuse():
+            raise OSError("connection refused")
+
+        pool = ResilientPool(refuse, minconn=1, maxconn=1)
+        with pytest.raises(DatabaseUnavailable):
+            pool.getconn()
+
+        stats = pool.stats()
+        assert stats['size'] == 0 and stats['connect_errors'] == 2
+
+    def test_broken_connection_is_discarded(self, connect):
+        """Test: putconn verwirft Verbindungen, die nicht mehr zurückgesetzt werden können"""
+        pool = ResilientPool(connect, minconn=0, maxconn=1)
+        conn = pool.getconn()
+        conn.close()
+        pool.putconn(conn)
+
+        stats = pool.stats()
+        assert stats['size'] == 0 and stats['discarded'] == 1
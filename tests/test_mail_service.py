@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für mail_service.py (mit lokalem SMTP-Ersatz statt echtem Server)
+"""
+
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+import mail_service
+from mail_service import SMTPSession, send_reset_mail, send_pdf_mail
+
+
+class FakeSMTP:
+    """Minimaler Ersatz für smtplib.SMTP, zählt Verbindungen und Nachrichten"""
+
+    connections = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.logins = 0
+        self.closed = False
+        self.fail_next = None
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected("Verbindung geschlossen")
+        return 250, b"OK"
+
+    def send_message(self, msg):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected("Verbindung geschlossen")
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        self.sent.append(msg)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.connections = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def _message(to):
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg["From"] = "absender@example.com"
+    msg["To"] = to
+    msg.set_content("Hallo")
+    return msg
+
+
+class TestSMTPSession:
+    """Tests für die wiederverwendete SMTP-Verbindung"""
+
+    def test_connection_is_reused(self, fake_smtp):
+        """Test: Mehrere Sendungen laufen über eine Verbindung mit einem Login"""
+        session = SMTPSession("localhost", 25, "user", "pw")
+        for i in range(3):
+            session.send_message(_message(f"empfaenger{i}@example.com"))
+        session.close()
+
+        assert len(fake_smtp.connections) == 1
+        assert fake_smtp.connections[0].logins == 1
+        assert len(fake_smtp.connections[0].sent) == 3
+
+    def test_reconnect_after_disconnect(self, fake_smtp):
+        """Test: Abgebrochene Verbindung wird transparent neu aufgebaut"""
+        session = SMTPSession("localhost", 25, "user", "pw")
+        session.send_message(_message("a@example.com"))
+        fake_smtp.connections[0].closed = True  # Server hat die Verbindung getrennt
+
+        session.send_message(_message("b@example.com"))
+        session.close()
+
+        assert len(fake_smtp.connections) == 2
+        assert len(fake_smtp.connections[1].sent) == 1
+
+    def test_no_resend_after_disconnect_mid_send(self, fake_smtp):
+        """Test: Abbruch nach Beginn des Versands wird nicht wiederholt (keine doppelte Zustellung)"""
+        session = SMTPSession("localhost", 25, "user", "pw")
+        session.send_message(_message("a@example.com"))
+        first = fake_smtp.connections[0]
+
+        deliver = first.send_message
+
+        def accepted_then_dropped(msg):
+            # Server hat DATA angenommen, die Verbindung reißt vor der Antwort ab
+            deliver(msg)
+            first.closed = True
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        first.send_message = accepted_then_dropped
+
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            session.send_message(_message("b@example.com"))
+        assert [msg["To"] for conn in fake_smtp.connections for msg in conn.sent] == ["a@example.com", "b@example.com"]
+        assert len(fake_smtp.connections) == 1
+
+        # Die abgebrochene Verbindung kam nicht zurück in den Pool
+        session.send_message(_message("c@example.com"))
+        session.close()
+        assert len(fake_smtp.connections) == 2
+        assert [msg["To"] for msg in fake_smtp.connections[1].sent] == ["c@example.com"]
+
+    def test_idle_connection_is_closed(self, fake_smtp):
+        """Test: Nach dem Idle-Timeout wird vor dem nächsten Versand neu verbunden"""
+        session = SMTPSession("localhost", 25, "user", "pw", idle_timeout=0)
+        session.send_message(_message("a@example.com"))
+        session.send_message(_message("b@example.com"))
+        session.close()
+
+        assert len(fake_smtp.connections) == 2
+        assert fake_smtp.connections[0].closed
+
+    def test_parallel_sends_use_separate_connections(self, fake_smtp, monkeypatch):
+        """Test: Gleichzeitige Sendungen warten nicht aufeinander (kein Lock über SMTP)"""
+        both_sending = threading.Barrier(2, timeout=5)
+        deliver = FakeSMTP.send_message
+
+        def send_together(self, msg):
+            both_sending.wait()
+            deliver(self, msg)
+        monkeypatch.setattr(FakeSMTP, "send_message", send_together)
+
+        session = SMTPSession("localhost", 25, "user", "pw")
+        errors = []
+
+        def send(to):
+            try:
+                session.send_message(_message(to))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=send, args=(f"p{i}@example.com",)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        session.close()
+
+        assert errors == []
+        assert len(fake_smtp.connections) == 2
+        assert all(conn.closed for conn in fake_smtp.connections)
+
+    def test_single_reaper_closes_idle_connection(self, fake_smtp):
+        """Test: Ein einziger Aufräum-Thread statt eines Timers pro Nachricht"""
+        session = SMTPSession("localhost", 25, "user", "pw", idle_timeout=0.1)
+        session.send_message(_message("a@example.com"))
+        reaper = session._reaper
+        threads_before = threading.active_count()
+        for i in range(5):
+            session.send_message(_message(f"b{i}@example.com"))
+
+        assert session._reaper is reaper and reaper.is_alive()
+        assert threading.active_count() == threads_before
+
+        deadline = time.monotonic() + 5
+        while not fake_smtp.connections[0].closed and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert fake_smtp.connections[0].closed
+        assert len(fake_smtp.connections) == 1
+
+        session.close()
+        reaper.join(timeout=5)
+        assert not reaper.is_alive()
+
+    def test_send_messages_batch(self, fake_smtp):
+        """Test: Batch über eine Verbindung, abgelehnte Nachricht bricht nicht ab"""
+        session = SMTPSession("localhost", 25, "user", "pw")
+        session.send_message(_message("warmup@example.com"))
+        fake_smtp.connections[0].fail_next = smtplib.SMTPRecipientsRefused({"x@example.com": (550, b"unbekannt")})
+
+        failed = session.send_messages([_message(f"e{i}@example.com") for i in range(5)])
+        session.close()
+
+        assert len(fake_smtp.connections) == 1
+        assert len(failed) == 1
+        assert len(fake_smtp.connections[0].sent) == 1 + 4
+
+    def test_module_session_shared(self, fake_smtp, monkeypatch):
+        """Test: send_reset_mail nutzt die gemeinsame Session des Prozesses"""
+        monkeypatch.setenv("SMTP_HOST", "localhost")
+        monkeypatch.setenv("SMTP_USER", "user@example.com")
+        monkeypatch.setenv("SMTP_PASSWORD", "pw")
+        monkeypatch.setattr(mail_service, "_session", None)
+
+        send_reset_mail("a@example.com", "https://example.com/reset/1")
+        send_reset_mail("b@example.com", "https://example.com/reset/2")
+        mail_service.get_smtp_session().close()
+
+        assert len(fake_smtp.connections) == 1
+        assert len(fake_smtp.connections[0].sent) == 2
+
+    def test_send_pdf_mail_from_bytes(self, fake_smtp, monkeypatch):
+        """Test: PDF wird direkt aus bytes angehängt (kein Dateisystem)"""
+        monkeypatch.setenv("SMTP_USER", "user@example.com")
+        monkeypatch.setenv("SMTP_PASSWORD", "pw")
+        monkeypatch.setattr(mail_service, "_session", None)
+
+        send_pdf_mail(pdf_data=b"%PDF-1.7 test", recipient="a@example.com", filename="TEST.pdf")
+        mail_service.get_smtp_session().close()
+
+        attachment = next(fake_smtp.connections[0].sent[0].iter_attachments())
+        assert attachment.get_filename() == "TEST.pdf"
+        assert attachment.get_content() == b"%PDF-1.7 test"
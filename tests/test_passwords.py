@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für passwords.py
+"""
+
+import passwords
+from passwords import hash_password, check_password, needs_rehash, hash_cost, calibrate_cost
+
+
+class TestPasswords:
+    """Tests für Hashing, Kalibrierung und Rehash-Erkennung"""
+
+    def test_hash_and_check(self, monkeypatch):
+        """Test: Hash enthält den Kosten-Faktor und lässt sich prüfen"""
+        monkeypatch.setattr(passwords, "_cost", 4)
+        password_hash = hash_password("TestPass123")
+
+        assert hash_cost(password_hash) == 4
+        assert check_password("TestPass123", password_hash)
+        assert not check_password("Falsch123", password_hash)
+        assert not check_password("TestPass123", "kein-bcrypt-hash")
+
+    def test_needs_rehash(self, monkeypatch):
+        """Test: Nur ein niedrigerer Kosten-Faktor erfordert Rehash (kein Herabstufen)"""
+        monkeypatch.setattr(passwords, "_cost", 5)
+        old_hash = hash_password("TestPass123")
+        assert not needs_rehash(old_hash)
+
+        monkeypatch.setattr(passwords, "_cost", 6)
+        assert needs_rehash(old_hash)
+        # Worker mit niedriger kalibriertem Faktor lässt den stärkeren Hash stehen
+        monkeypatch.setattr(passwords, "_cost", 4)
+        assert not needs_rehash(old_hash)
+
+    def test_calibration_uses_median(self, monkeypatch):
+        """Test: Ein Ausreißer bei der Kalibrierung verschiebt den Faktor nicht"""
+        timings = iter([0, 100, 0, 10, 0, 10, 0, 400, 0, 10])
+        monkeypatch.setattr(passwords.time, "perf_counter", lambda: next(timings) / 1000)
+        monkeypatch.setattr(passwords.bcrypt, "hashpw", lambda *args: b'')
+        monkeypatch.setattr(passwords.bcrypt, "gensalt", lambda cost: b'')
+
+        # Median 10 ms bei Kosten 10 -> Ziel 80 ms ist drei Stufen höher
+        assert calibrate_cost(target_ms=80) == passwords.BCRYPT_MIN_COST + 3
+
+    def test_calibrate_cost_bounds(self):
+        """Test: Kalibrierung bleibt innerhalb der erlaubten Grenzen"""
+        assert calibrate_cost(target_ms=0) == passwords.BCRYPT_MIN_COST
+        assert calibrate_cost(target_ms=10 ** 9) == passwords.BCRYPT_MAX_COST
+
+    def test_saturated_pool_times_out(self, monkeypatch):
+        """Test: Ausgelasteter Hashing-Pool wirft PasswordHashTimeout, wartende Arbeit wird verworfen"""
+        import threading
+        import pytest
+        from passwords import PasswordHashTimeout
+
+        monkeypatch.setattr(passwords, "BCRYPT_TIMEOUT", 0.05)
+        release = threading.Event()
+        blockers = [passwords._executor.submit(release.wait) for _ in range(passwords.BCRYPT_WORKERS)]
+        checked = []
+        monkeypatch.setattr(passwords, "_check", lambda *args: checked.append(args) or True)
+        try:
+            with pytest.raises(PasswordHashTimeout):
+                check_password("TestPass123", "$2b$04$hash")
+        finally:
+            release.set()
+            for blocker in blockers:
+                blocker.result()
+        passwords._executor.submit(lambda: None).result()
+        assert checked == []
+
+    def test_calibration_runs_in_background(self, monkeypatch):
+        """Test: Kalibrierung blockiert keinen Aufrufer, bis dahin gilt der Übergangswert ohne Rehash"""
+        import threading
+
+        release = threading.Event()
+        monkeypatch.delenv("BCRYPT_COST", raising=False)
+        monkeypatch.setattr(passwords, "_cost", None)
+        monkeypatch.setattr(passwords, "_calibration", None)
+        monkeypatch.setattr(passwords, "calibrate_cost", lambda: release.wait(5) and 11)
+
+        passwords.start_calibration()
+        assert passwords.get_cost() == passwords.BCRYPT_DEFAULT_COST
+        assert not needs_rehash("$2b$04$hash")
+
+        release.set()
+        passwords._calibration.join(5)
+        assert passwords.get_cost() == 11
+        assert needs_rehash("$2b$04$hash")
+
+    def test_configured_cost_skips_calibration(self, monkeypatch):
+        """Test: BCRYPT_COST gilt sofort, ohne Hintergrund-Thread"""
+        monkeypatch.setenv("BCRYPT_COST", "9")
+        monkeypatch.setattr(passwords, "_cost", None)
+        monkeypatch.setattr(passwords, "_calibration", None)
+
+        passwords.start_calibration()
+        assert passwords._calibration is None
+        assert passwords.get_cost() == 9
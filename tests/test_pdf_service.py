@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für pdf_service.py
+"""
+
+import io
+import json
+import zipfile
+from pypdf import PdfReader
+
+import pdf_service
+from pdf_service import create_pdf, mapped_field_names, verify_template_fields, stream_pdf_zip, DAY_TO_FIELDS
+
+
+class TestPdfTemplate:
+    """Tests für Template-Cache und Feld-Index"""
+    
+    def test_all_mapped_fields_exist(self):
+        """Test: Template-Check findet alle gemappten Felder im Template"""
+        _, field_pages = pdf_service._load_template()
+        verify_template_fields(field_pages)
+        assert mapped_field_names() <= set(field_pages)
+    
+    def test_missing_field_fails_on_load(self, monkeypatch):
+        """Test: Fehlt ein gemapptes Feld, schlägt das Laden des Templates fehl"""
+        import pytest
+        monkeypatch.setattr(pdf_service, '_template_data', None)
+        monkeypatch.setattr(pdf_service, '_field_pages', None)
+        monkeypatch.setitem(pdf_service.PDF_FIELD_MAP, 'Unbekannt', 'Gibt es nicht')
+        
+        with pytest.raises(RuntimeError, match='Gibt es nicht'):
+            pdf_service._load_template()
+        assert pdf_service._template_data is None
+    
+    def test_field_page_index(self):
+        """Test: Grunddaten liegen auf Seite 1, Tagesfelder auf den Folgeseiten"""
+        _, field_pages = pdf_service._load_template()
+        assert field_pages["Textfeld 2"] == {0}
+        assert 0 not in field_pages[DAY_TO_FIELDS[1][0]]
+    
+    def test_qualified_field_name(self):
+        """Test: Eigenes /T zählt auch ohne /FT, Kind-Widgets ohne /T erben den Namen"""
+        from pypdf.generic import DictionaryObject, NameObject, TextStringObject
+        parent = DictionaryObject({NameObject("/T"): TextStringObject("Gruppe"),
+                                   NameObject("/FT"): NameObject("/Tx")})
+        named = DictionaryObject({NameObject("/T"): TextStringObject("Feld"),
+                                  NameObject("/Parent"): parent})
+        kid = DictionaryObject({NameObject("/Parent"): named})
+
+        assert pdf_service._qualified_field_name(parent) == "Gruppe"
+        assert pdf_service._qualified_field_name(named) == "Gruppe.Feld"
+        assert pdf_service._qualified_field_name(kid) == "Gruppe.Feld"
+    
+    def test_create_pdf_fills_fields(self, tmp_path):
+        """Test: Gerendertes PDF enthält Grunddaten, Gottesdienste und Checkboxen"""
+        output = tmp_path / "out.pdf"
+        create_pdf({
+            'Nachname': 'Müller',
+            'Tätigkeit': 'Organist',
+            'Mehrarbeit_auszahlen': 'Nein',
+            'Gottesdienste': json.dumps([{'datum': '2025-01-05', 'kirchort': 'St. Peter',
+                                          'beginn': '10:00', 'ende': '11:00', 'satz': '25'}]),
+        }, str(output))
+        
+        fields = PdfReader(str(output)).get_fields()
+        kirchort, beginn, _ = DAY_TO_FIELDS[5]
+        assert fields['Textfeld 1']['/V'] == 'Müller'
+        assert fields[kirchort]['/V'] == 'St. Peter (25,00 €)'
+        assert fields[beginn]['/V'] == '10:00'
+        assert fields['Markierfeld 1_2']['/V'] == '/Yes'
+
+    def test_create_pdf_in_memory(self):
+        """Test: Ohne Ausgabepfad liefert create_pdf bytes, Datei-Objekte werden beschrieben"""
+        pdf_data = create_pdf({'Nachname': 'Müller'})
+        assert pdf_data.startswith(b"%PDF")
+        
+        buffer = io.BytesIO()
+        assert create_pdf({'Nachname': 'Müller'}, buffer) is None
+        fields = PdfReader(io.BytesIO(buffer.getvalue())).get_fields()
+        assert fields[pdf_service.PDF_FIELD_MAP['Nachname']]['/V'] == 'Müller'
+
+    def test_stream_pdf_zip(self):
+        """Test: Massen-Export liefert ein gültiges ZIP mit einem PDF pro Eintrag"""
+        files = [
+            ("MUELLER,HANS,2025,01.pdf", {'Nachname': 'Müller', 'Vorname': 'Hans'}),
+            ("SCHMIDT,ANNA,2025,01.pdf", {'Nachname': 'Schmidt', 'Vorname': 'Anna'}),
+        ]
+        data = b"".join(stream_pdf_zip(files))
+        
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert sorted(archive.namelist()) == sorted(name for name, _ in files)
+            fields = PdfReader(io.BytesIO(archive.read("SCHMIDT,ANNA,2025,01.pdf"))).get_fields()
+            assert fields[pdf_service.PDF_FIELD_MAP['Nachname']]['/V'] == 'Schmidt'
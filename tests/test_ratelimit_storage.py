@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für ratelimit_storage.py
+"""
+
+import time
+from multiprocessing import get_context
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from ratelimit_storage import SQLiteStorage
+
+
+def _hit_many(uri, count, results):
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse("5 per minute")
+    results.put(sum(limiter.hit(item, "login", "127.0.0.1") for _ in range(count)))
+
+
+class TestSQLiteStorage:
+    """Tests für die geteilte Rate-Limit-Storage"""
+
+    def test_incr_and_expiry(self, tmp_path):
+        """Test: Zähler steigen atomar und beginnen nach Ablauf neu"""
+        storage = storage_from_string(f"sqlite://{tmp_path / 'limits.db'}")
+        assert isinstance(storage, SQLiteStorage)
+
+        assert storage.incr("k", expiry=1) == 1
+        assert storage.incr("k", expiry=1) == 2
+        assert storage.get("k") == 2
+        assert storage.get_expiry("k") > time.time()
+
+        time.sleep(1.05)
+        assert storage.get("k") == 0
+        assert storage.incr("k", expiry=60) == 1
+
+        storage.clear("k")
+        assert storage.get("k") == 0
+        assert storage.check()
+
+    def test_limit_shared_across_processes(self, tmp_path):
+        """Test: '5 per minute' gilt über alle Worker-Prozesse hinweg"""
+        uri = f"sqlite://{tmp_path / 'limits.db'}"
+        ctx = get_context("spawn")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_hit_many, args=(uri, 5, results)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        assert sum(results.get() for _ in workers) == 5
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit-Tests für schema.py (versionierte Migrationen)
+"""
+
+import shutil
+
+import pytest
+
+import schema
+
+
+@pytest.fixture
+def empty_db(monkeypatch, tmp_path):
+    """Leere temporäre SQLite-Datenbank"""
+    import users
+    monkeypatch.setattr(users, 'DATABASE', str(tmp_path / "schema_test.db"))
+    monkeypatch.setattr(users, 'USE_POSTGRES', False)
+    users.invalidate_user_cache()
+    return tmp_path
+
+
+@pytest.fixture
+def migrations_copy(monkeypatch, tmp_path):
+    """Kopie von migrations/ zum Anhängen weiterer Versionen"""
+    target = tmp_path / 'migrations'
+    shutil.copytree(schema.MIGRATIONS_DIR, target)
+    monkeypatch.setattr(schema, 'MIGRATIONS_DIR', target)
+    return target
+
+
+class TestSchema:
+    """Tests für den Migrations-Runner"""
+
+    def test_migrate_once(self, empty_db, monkeypatch):
+        """Test: Erster Start migriert alles, danach läuft kein SQL mehr"""
+        from users import get_db
+
+        assert schema.current_version() == 0
+        assert schema.ensure_schema() == [version for version, _ in schema.MIGRATIONS]
+        assert schema.current_version() == schema.SCHEMA_VERSION
+
+        with get_db() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_users_email'")
+            assert cursor.fetchone()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_submissions_deleted'")
+            assert cursor.fetchone()
+
+        def fail(cursor, script):
+            raise AssertionError("DDL bei aktuellem Schema")
+        monkeypatch.setattr(schema, 'execute_sql', fail)
+        assert schema.ensure_schema() == []
+        assert schema.migrate() == []
+
+    def test_pending_migration(self, empty_db, migrations_copy, monkeypatch):
+        """Test: Neue Migration wird genau einmal angewendet, eine fehlerhafte komplett zurückgerollt"""
+        from users import get_db
+
+        schema.ensure_schema()
+        pending = migrations_copy / 'sqlite' / '099_neu.sql'
+        pending.write_text("CREATE TABLE halb (id INTEGER);\nSELECT * FROM gibt_es_nicht;\n", encoding='utf-8')
+        monkeypatch.setattr(schema, 'MIGRATIONS', schema.MIGRATIONS + [(99, 'neu')])
+        monkeypatch.setattr(schema, 'SCHEMA_VERSION', 99)
+
+        with pytest.raises(Exception):
+            schema.ensure_schema()
+        assert schema.current_version() == schema.MIGRATIONS[-2][0]
+        with get_db() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'halb'")
+            assert cursor.fetchone() is None
+
+        pending.write_text("-- Neue Tabelle\nCREATE TABLE neu (id INTEGER);\n", encoding='utf-8')
+        assert schema.ensure_schema() == [99]
+        assert schema.ensure_schema() == []
+
+    def test_legacy_database_without_versions(self, empty_db):
+        """Test: Ältere SQLite-Datenbank (Spalten schon da, kein schema_migrations) wird nachgezogen"""
+        from users import get_db
+
+        with get_db() as cursor:
+            cursor.execute("""CREATE TABLE timerecords (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                              month_year TEXT NOT NULL, form_data TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 1,
+                              UNIQUE(user_id, month_year))""")
+            cursor.execute("INSERT INTO timerecords (user_id, month_year, form_data) VALUES (1, '01-2026', '{}')")
+
+        assert schema.ensure_schema() == [version for version, _ in schema.MIGRATIONS]
+        with get_db() as cursor:
+            cursor.execute('SELECT status, content_hash FROM timerecords')
+            status, content_hash = cursor.fetchone()
+        assert status == 'draft' and content_hash
+
+    def test_failing_step_is_not_recorded(self, empty_db, monkeypatch):
+        """Test: Fehler in einem Backfill rollt die Version zurück, der nächste Start holt sie nach"""
+        import json
+        import users
+
+        schema.ensure_schema()
+        user = users.create_user("schematest", "TestPass123", "Test Pfarrei", email="schema@example.com")
+        gottesdienste = [{"kirchort": "St. Marien", "datum": "2026-03-01", "beginn": "09:30", "ende": "10:45"}]
+        users.save_timerecord(user.id, "03-2026", json.dumps({"_gottesdienste_list": json.dumps(gottesdienste)}))
+        # Stand vor Migration 6 herstellen
+        with users.get_db() as cursor:
+            cursor.execute('DROP TABLE timerecord_entries')
+            cursor.execute('DELETE FROM schema_migrations WHERE version >= 6')
+
+        def broken(cursor, batch_size=500):
+            raise RuntimeError("Backfill kaputt")
+        original = users.backfill_timerecord_entries
+        monkeypatch.setattr(users, 'backfill_timerecord_entries', broken)
+        with pytest.raises(RuntimeError):
+            schema.ensure_schema()
+        assert schema.current_version() == 5
+        with users.get_db() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'timerecord_entries'")
+            assert cursor.fetchone() is None
+
+        monkeypatch.setattr(users, 'backfill_timerecord_entries', original)
+        assert schema.ensure_schema() == list(range(6, schema.SCHEMA_VERSION + 1))
+        assert len(users.get_timerecord_entries(user_id=user.id, submitted=False)) == 1
+
+    def test_versions_match_sql_files(self):
+        """Test: Jede Version gibt es als PostgreSQL- und als SQLite-Datei mit gleichem Namen"""
+        assert schema.load_migrations(schema.MIGRATIONS_DIR) == schema.MIGRATIONS
+        assert schema.load_migrations(schema.MIGRATIONS_DIR / 'sqlite') == schema.MIGRATIONS
+        assert [version for version, _ in schema.MIGRATIONS] == list(range(1, schema.SCHEMA_VERSION + 1))
+
+    def test_split_sql_keeps_triggers(self):
+        """Test: Trigger mit BEGIN ... END; bleiben ein Statement"""
+        statements = schema.split_sql((schema.MIGRATIONS_DIR / 'sqlite' / '008_deleted_rows.sql').read_text(encoding='utf-8'))
+        assert len(statements) == 5
+        assert all(statement.rstrip().endswith('END;') for statement in statements[1:])
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests für static/lib/storage.js (Merge Patch des Formulars, läuft mit Node)
+"""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+STORAGE_JS = Path(__file__).parent.parent / "static" / "lib" / "storage.js"
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node nicht installiert")
+
+
+def build_form_patch(previous: dict, current: dict) -> dict:
+    """Ruft buildFormPatch aus storage.js mit minimalem window/document auf"""
+    script = (
+        "global.window = {}; global.document = {addEventListener() {}, querySelector() { return null; }};\n"
+        + STORAGE_JS.read_text(encoding="utf-8")
+        + f"\nprocess.stdout.write(JSON.stringify(buildFormPatch({json.dumps(previous)}, {json.dumps(current)})));\n"
+    )
+    result = subprocess.run(["node", "-"], input=script, capture_output=True, text=True, check=True, timeout=30)
+    return json.loads(result.stdout)
+
+
+def test_edit_one_entry_sends_only_that_entry():
+    """Test: Eine geänderte Arbeitszeit landet als einzelner Eintrag im Patch, nicht die ganze Liste"""
+    entries = [{"id": f"e{i}", "datum": f"2026-04-{i + 1:02d}", "beginn": "08:00", "ende": "12:00"} for i in range(20)]
+    edited = [dict(entry) for entry in entries]
+    edited[7]["ende"] = "13:00"
+
+    def form(entries):
+        serialized = json.dumps(entries, separators=(",", ":"))
+        return {"Vorname": "Anna", "Arbeitszeiten": serialized, "_arbeitszeiten_list": serialized}
+
+    patch = build_form_patch(form(entries), form(edited))
+
+    assert patch == {"_arbeitszeiten_list": {"e7": {"ende": "13:00"}}}
+    assert len(json.dumps(patch)) < 100
@@ -9,7 +9,7 @@ HINWEIS: Tests müssen mit frischer Datenbank ausgeführt werden:
 
 import pytest
 import os
-from utils import format_date_german, generate_filename
+from utils import format_date_german, generate_filename, apply_merge_patch, apply_form_patch
 
 
 class TestUtilities:
@@ -80,6 +80,38 @@ class TestUtilities:
         filename = generate_filename(data, 'csv')
         assert filename.endswith('.csv')
     
+    def test_apply_merge_patch(self):
+        """Test: JSON Merge Patch (RFC 7396) - ersetzen, löschen, rekursiv"""
+        target = {'a': '1', 'b': '2', 'nested': {'x': 1, 'y': 2}}
+        patch = {'a': 'neu', 'b': None, 'c': [1, 2], 'nested': {'y': None, 'z': 3}}
+        assert apply_merge_patch(target, patch) == {'a': 'neu', 'c': [1, 2], 'nested': {'x': 1, 'z': 3}}
+        assert target == {'a': '1', 'b': '2', 'nested': {'x': 1, 'y': 2}}  # unverändert
+    
+    def test_apply_form_patch_list_entries(self):
+        """Test: Listenfelder eintragsweise per id patchen, ganze Strings ersetzen weiter"""
+        import json
+        stored = {'Vorname': 'Anna', '_gottesdienste_list': json.dumps([
+            {'id': 'a', 'datum': '2026-04-05'}, {'id': 'b', 'datum': '2026-04-12'}, {'datum': '2026-04-19'}])}
+
+        result = apply_form_patch(stored, {'_gottesdienste_list': {
+            'a': {'datum': '2026-04-06'}, 'b': None, 'c': {'id': 'c', 'datum': '2026-04-26'}}})
+        assert json.loads(result['_gottesdienste_list']) == [
+            {'id': 'a', 'datum': '2026-04-06'}, {'datum': '2026-04-19'}, {'id': 'c', 'datum': '2026-04-26'}]
+        assert result['Vorname'] == 'Anna'
+
+        # Alte Einträge ohne id über ihre Position
+        legacy = apply_form_patch(stored, {'_gottesdienste_list': {'#2': {'id': 'd'}}})
+        assert json.loads(legacy['_gottesdienste_list'])[2] == {'id': 'd', 'datum': '2026-04-19'}
+
+        # Spiegelfeld "Gottesdienste" kommt nicht im Patch, wird aus der Liste nachgezogen
+        assert result['Gottesdienste'] == result['_gottesdienste_list']
+        assert apply_form_patch(stored, {'_gottesdienste_list': None})['Gottesdienste'] == '[]'
+        assert 'Arbeitszeiten' not in result
+
+        replaced = apply_form_patch(stored, {'_gottesdienste_list': '[]', '_arbeitszeiten_list': {'x': {'id': 'x'}}})
+        assert replaced['_gottesdienste_list'] == '[]'
+        assert json.loads(replaced['_arbeitszeiten_list']) == [{'id': 'x'}]
+    
     def test_generate_filename_missing_data(self):
         """Test: Fehlende Daten führen zu UNKNOWN"""
         data = {'Monat/Jahr': '12/2025'}
@@ -104,12 +136,11 @@ class TestDatabaseIntegration:
         import users
         monkeypatch.setattr(users, 'DATABASE', str(db_path))
         monkeypatch.setattr(users, 'USE_POSTGRES', False)
+        users.invalidate_user_cache()  # IDs wiederholen sich zwischen Test-Datenbanken
         
         # Initialize tables
-        users.init_db()
-        users.init_timerecords_table()
-        users.init_submissions_table()
-        users.init_profile_table()
+        import schema
+        schema.ensure_schema()
         
         yield db_path
         
@@ -229,6 +260,419 @@ class TestDatabaseIntegration:
         # 3. Mocking der DB-Operationen
         assert True
 
+    def test_query_submissions(self, temp_db):
+        """Test: Filter, Sortierung und Pagination der Submissions in SQL"""
+        import json
+        from users import create_user, submit_timerecord, query_submissions, get_submission_filter_options
+
+        user = create_user("subtest", "TestPass123", "Test Pfarrei",
+                          email="sub@test.com", is_approved=True)
+
+        for i, (nachname, taetigkeit) in enumerate([("Zander", "Organist"), ("Albers", "Küster"), ("Meier", "Organist")]):
+            submit_timerecord(user.id, f"0{i + 1}-2026", json.dumps({
+                'Vorname': 'Eva', 'Nachname': nachname, 'Tätigkeit': taetigkeit,
+                'Kath. Kirchengemeinde': 'St. Peter'
+            }))
+
+        result = query_submissions(taetigkeit="Organist", sort="name", page=1, per_page=1)
+        assert result['total'] == 2
+        assert result['total_pages'] == 2
+        assert len(result['submissions']) == 1
+        assert json.loads(result['submissions'][0]['form_data'])['Nachname'] == "Meier"
+
+        # Seite außerhalb des Bereichs wird auf die letzte Seite begrenzt
+        result = query_submissions(taetigkeit="Organist", sort="name", page=5, per_page=1)
+        assert result['page'] == 2
+        assert json.loads(result['submissions'][0]['form_data'])['Nachname'] == "Zander"
+
+        assert query_submissions(search="albers")['total'] == 1
+        assert query_submissions(search="sub@test")['total'] == 3
+        assert query_submissions(search="100%")['total'] == 0
+        assert query_submissions(month="02-2026")['total'] == 1
+
+        months, taetigkeiten = get_submission_filter_options()
+        assert months == ["03-2026", "02-2026", "01-2026"]
+        assert taetigkeiten == ["Küster", "Organist"]
+
+    def test_submission_metadata_backfill(self, temp_db):
+        """Test: Metadaten werden beim Einreichen extrahiert und für Altbestand nachgetragen"""
+        import json
+        import sqlite3
+        import users
+        from users import create_user, submit_timerecord, extract_submission_metadata
+
+        form_data = json.dumps({
+            'Vorname': 'Eva', 'Nachname': 'Meier', 'Tätigkeit': 'Organist',
+            'Kath. Kirchengemeinde': 'St. Peter',
+            'Gottesdienste': json.dumps([{'datum': '2026-01-04'}, {'datum': '2026-01-11'}]),
+            'Arbeitszeiten': ''
+        })
+        meta = extract_submission_metadata(form_data)
+        assert meta['taetigkeit'] == 'Organist'
+        assert meta['gottesdienste_count'] == 2
+        assert meta['arbeitszeiten_count'] == 0
+
+        user = create_user("metatest", "TestPass123", "Test Pfarrei",
+                          email="meta@test.com", is_approved=True)
+        submit_timerecord(user.id, "01-2026", form_data)
+
+        # Altbestand simulieren: Metadaten fehlen
+        conn = sqlite3.connect(str(temp_db))
+        conn.execute("UPDATE submissions SET taetigkeit = NULL, gottesdienste_count = NULL")
+        conn.commit()
+        conn.close()
+
+        with users.get_db() as cursor:
+            assert users.backfill_submission_metadata(cursor) == 1
+            cursor.execute("SELECT taetigkeit, gottesdienste_count FROM submissions")
+            assert cursor.fetchone() == ('Organist', 2)
+
+    def test_submissions_cursor_pagination(self, temp_db):
+        """Test: Keyset-Pagination ist stabil, auch bei gleichem submitted_at"""
+        import json
+        from users import create_user, submit_timerecord, get_submissions_by_cursor
+
+        user = create_user("cursortest", "TestPass123", "Test Pfarrei",
+                          email="cursor@test.com", is_approved=True)
+        for i in range(5):
+            submit_timerecord(user.id, f"0{i + 1}-2026", json.dumps({'Nachname': f'N{i}'}))
+
+        first = get_submissions_by_cursor(limit=2)
+        assert [s['month_year'] for s in first['submissions']] == ["05-2026", "04-2026"]
+        assert first['prev_key'] is None
+
+        second = get_submissions_by_cursor(cursor_key=first['next_key'], limit=2)
+        assert [s['month_year'] for s in second['submissions']] == ["03-2026", "02-2026"]
+
+        last = get_submissions_by_cursor(cursor_key=second['next_key'], limit=2)
+        assert [s['month_year'] for s in last['submissions']] == ["01-2026"]
+        assert last['next_key'] is None
+
+        back = get_submissions_by_cursor(cursor_key=second['prev_key'], direction='prev', limit=2)
+        assert [s['month_year'] for s in back['submissions']] == ["05-2026", "04-2026"]
+        assert back['prev_key'] is None
+        assert back['next_key'] == first['next_key']
+
+        # Zeilenwert-Vergleich läuft als Range-Scan über den zusammengesetzten Index
+        import users
+        with users.get_db() as cursor:
+            cursor.execute("""EXPLAIN QUERY PLAN SELECT s.id FROM submissions s
+                              WHERE (s.submitted_at, s.id) < (?, ?)
+                              ORDER BY s.submitted_at DESC, s.id DESC LIMIT 3""", first['next_key'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert 'idx_submissions_submitted_at_id' in plan and 'TEMP B-TREE' not in plan
+
+    def test_submission_fulltext_search(self, temp_db):
+        """Test: Volltextsuche über Name, E-Mail und Kirchengemeinde bleibt bei Insert/Delete synchron"""
+        import json
+        from users import create_user, submit_timerecord, delete_submission, query_submissions
+
+        user = create_user("ftstest", "TestPass123", "Test Pfarrei",
+                          email="fts.user@example.com", is_approved=True)
+        submission_id = submit_timerecord(user.id, "01-2026", json.dumps({
+            'Vorname': 'Jürgen', 'Nachname': 'Größmann', 'Kath. Kirchengemeinde': 'St. Marien'
+        }))
+
+        assert query_submissions(search="größ")['total'] == 1
+        assert query_submissions(search="jürgen marien")['total'] == 1
+        assert query_submissions(search="fts.user@example")['total'] == 1
+        assert query_submissions(search="jürgen paulus")['total'] == 0
+
+        delete_submission(submission_id)
+        assert query_submissions(search="größ")['total'] == 0
+
+    
+    def test_user_cache_invalidation(self, temp_db):
+        """Test: User-Cache spart DB-Zugriffe und wird bei Änderungen invalidiert"""
+        import users
+        from users import create_user, get_user_by_id_cached, approve_user, delete_user_account
+
+        user = create_user("cachetest", "TestPass123", "Test Pfarrei", email="cache@example.com")
+        cached = get_user_by_id_cached(user.id)
+        assert cached.is_approved is False
+        assert get_user_by_id_cached(user.id) is cached  # Treffer ohne DB-Zugriff
+
+        approve_user(user.id)
+        assert get_user_by_id_cached(user.id).is_approved is True
+
+        delete_user_account(user.id)
+        assert get_user_by_id_cached(user.id) is None
+        assert user.id not in users._user_cache
+
+    
+    def test_query_layer(self, temp_db):
+        """Test: Eine SQL-Definition, pro Dialekt kompiliert; Upsert in SQLite"""
+        from users import Q_GET_TIMERECORD, save_timerecord, get_timerecord, create_user
+
+        prepare_sql, execute_sql, _ = Q_GET_TIMERECORD.compile(True)
+        assert prepare_sql.startswith("PREPARE get_timerecord AS SELECT")
+        assert "user_id = $1 AND month_year = $2" in prepare_sql
+        assert execute_sql == "EXECUTE get_timerecord (%s, %s)"
+        assert Q_GET_TIMERECORD.compile(False)[1].endswith("user_id = ? AND month_year = ?")
+
+        user = create_user("querytest", "TestPass123", "Test Pfarrei", email="query@example.com")
+        save_timerecord(user.id, "03-2026", '{"v": 1}')
+        save_timerecord(user.id, "03-2026", '{"v": 2}')
+        assert get_timerecord(user.id, "03-2026")["form_data"] == '{"v": 2}'
+
+    
+    def test_sqlite_concurrent_autosaves(self, temp_db):
+        """Test: WAL + Verbindung pro Thread - parallele Autosaves ohne 'database is locked'"""
+        import threading
+        from users import create_user, save_timerecord, get_all_timerecords, get_db_connection
+
+        assert get_db_connection().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert get_db_connection() is get_db_connection()  # wiederverwendet
+
+        user = create_user("waltest", "TestPass123", "Test Pfarrei", email="wal@example.com")
+        errors = []
+
+        def autosave(thread_no):
+            try:
+                for i in range(20):
+                    save_timerecord(user.id, f"{thread_no + 1:02d}-2026", f'{{"i": {i}}}')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=autosave, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert len(get_all_timerecords(user.id)) == 8
+
+    
+    def test_rehash_on_login(self, temp_db, monkeypatch):
+        """Test: Erfolgreicher Login bringt alten Hash auf den aktuellen Kosten-Faktor"""
+        import passwords
+        from passwords import hash_cost
+        from users import create_user, verify_password, get_user_by_email
+
+        monkeypatch.setattr(passwords, "_cost", 4)
+        create_user("rehashtest", "TestPass123", "Test Pfarrei", email="rehash@example.com")
+        assert hash_cost(get_user_by_email("rehash@example.com").password_hash) == 4
+
+        monkeypatch.setattr(passwords, "_cost", 5)
+        assert verify_password("rehashtest", "Falsch123") is None
+        assert hash_cost(get_user_by_email("rehash@example.com").password_hash) == 4
+
+        assert verify_password("rehashtest", "TestPass123") is not None
+        assert hash_cost(get_user_by_email("rehash@example.com").password_hash) == 5
+
+    
+    def test_patch_timerecord(self, temp_db):
+        """Test: Merge Patch ändert nur gesendete Felder und erhöht die Version"""
+        import json
+        from users import create_user, save_timerecord, patch_timerecord, get_timerecord
+
+        user = create_user("patchtest", "TestPass123", "Test Pfarrei", email="patch@example.com")
+        assert patch_timerecord(user.id, "04-2026", {"Vorname": "Anna"}) is None
+
+        save_timerecord(user.id, "04-2026", json.dumps({"Vorname": "Anna", "Nachname": "Muster", "Notiz": "x"}))
+        assert get_timerecord(user.id, "04-2026")["version"] == 1
+
+        record = patch_timerecord(user.id, "04-2026", {"Nachname": "Beispiel", "Notiz": None})
+        assert record["version"] == 2
+        assert json.loads(record["form_data"]) == {"Vorname": "Anna", "Nachname": "Beispiel"}
+
+        save_timerecord(user.id, "04-2026", json.dumps({"Vorname": "Berta"}))
+        assert get_timerecord(user.id, "04-2026")["version"] == 3
+
+        save_timerecord(user.id, "04-2026", json.dumps({"_arbeitszeiten_list": json.dumps([{"id": "a", "beginn": "08:00"}])}))
+        record = patch_timerecord(user.id, "04-2026", {"_arbeitszeiten_list": {"a": {"beginn": "09:00"}, "b": {"id": "b"}}})
+        assert json.loads(json.loads(record["form_data"])["_arbeitszeiten_list"]) == [{"id": "a", "beginn": "09:00"}, {"id": "b"}]
+
+    
+    def test_timerecord_etag(self, temp_db):
+        """Test: Unveränderte Speicherung schreibt nicht, If-Match verhindert Lost Updates"""
+        import json
+        from users import create_user, save_timerecord, get_timerecord, TimerecordPreconditionFailed
+
+        user = create_user("etagtest", "TestPass123", "Test Pfarrei", email="etag@example.com")
+        first = save_timerecord(user.id, "05-2026", json.dumps({"Vorname": "Anna"}))
+        assert first["written"] and first["version"] == 1
+
+        again = save_timerecord(user.id, "05-2026", json.dumps({"Vorname": "Anna"}))
+        assert not again["written"]
+        assert again["version"] == 1 and again["etag"] == first["etag"]
+        assert get_timerecord(user.id, "05-2026")["etag"] == first["etag"]
+
+        second = save_timerecord(user.id, "05-2026", json.dumps({"Vorname": "Berta"}), if_match=first["etag"])
+        assert second["written"] and second["version"] == 2
+
+        # Zweiter Tab mit veraltetem Stand
+        with pytest.raises(TimerecordPreconditionFailed) as excinfo:
+            save_timerecord(user.id, "05-2026", json.dumps({"Vorname": "Carla"}), if_match=first["etag"])
+        assert excinfo.value.current_etag == second["etag"]
+        assert json.loads(get_timerecord(user.id, "05-2026")["form_data"]) == {"Vorname": "Berta"}
+
+    
+    def test_write_behind_buffer(self, temp_db, monkeypatch):
+        """Test: Gepufferte Autosaves werden zusammengefasst und gebündelt geschrieben"""
+        import json
+        import users
+        from users import (create_user, save_timerecord, get_timerecord, get_all_timerecords,
+                           patch_timerecord, flush_timerecords, get_db)
+
+        monkeypatch.setattr(users, "TIMERECORD_WRITE_BEHIND_SECONDS", 3600)
+        user = create_user("buffertest", "TestPass123", "Test Pfarrei", email="buffer@example.com")
+
+        def stored_version(month_year):
+            with get_db() as cursor:
+                cursor.execute("SELECT version FROM timerecords WHERE user_id = ? AND month_year = ?",
+                               (user.id, month_year))
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        for i in range(5):
+            result = save_timerecord(user.id, "06-2026", json.dumps({"Vorname": f"Anna {i}"}))
+        save_timerecord(user.id, "07-2026", json.dumps({"Vorname": "Berta"}))
+
+        # Noch nichts geschrieben, Lesen kommt aus dem Puffer
+        assert stored_version("06-2026") is None
+        assert result["version"] == 1
+        assert json.loads(get_timerecord(user.id, "06-2026")["form_data"]) == {"Vorname": "Anna 4"}
+        assert [r["month_year"] for r in get_all_timerecords(user.id)] == ["07-2026", "06-2026"]
+
+        assert flush_timerecords() == 2
+        assert stored_version("06-2026") == 1
+        assert json.loads(get_timerecord(user.id, "06-2026")["form_data"]) == {"Vorname": "Anna 4"}
+
+        # Patch schreibt den gepufferten Stand vorher durch
+        save_timerecord(user.id, "06-2026", json.dumps({"Vorname": "Carla"}))
+        record = patch_timerecord(user.id, "06-2026", {"Nachname": "Muster"})
+        assert record["version"] == 3
+        assert json.loads(record["form_data"]) == {"Vorname": "Carla", "Nachname": "Muster"}
+        assert flush_timerecords() == 0
+
+    
+    def test_write_behind_conflict(self, temp_db, monkeypatch):
+        """Test: Flush überschreibt keinen zwischenzeitlichen Write eines anderen Workers"""
+        import json
+        import users
+        from users import create_user, save_timerecord, get_timerecord, flush_timerecords
+
+        user = create_user("conflicttest", "TestPass123", "Test Pfarrei", email="conflict@example.com")
+        save_timerecord(user.id, "08-2026", json.dumps({"Vorname": "Anna"}))
+
+        monkeypatch.setattr(users, "TIMERECORD_WRITE_BEHIND_SECONDS", 3600)
+        save_timerecord(user.id, "08-2026", json.dumps({"Vorname": "Gepuffert"}))
+        save_timerecord(user.id, "09-2026", json.dumps({"Vorname": "Neu gepuffert"}))
+
+        # Anderer Worker (ohne diesen Puffer) schreibt direkt
+        monkeypatch.setattr(users, "TIMERECORD_WRITE_BEHIND_SECONDS", 0)
+        save_timerecord(user.id, "08-2026", json.dumps({"Vorname": "Direkt"}))
+        save_timerecord(user.id, "09-2026", json.dumps({"Vorname": "Auch direkt"}))
+        monkeypatch.setattr(users, "TIMERECORD_WRITE_BEHIND_SECONDS", 3600)
+
+        assert flush_timerecords() == 0
+        assert json.loads(get_timerecord(user.id, "08-2026")["form_data"]) == {"Vorname": "Direkt"}
+        assert json.loads(get_timerecord(user.id, "09-2026")["form_data"]) == {"Vorname": "Auch direkt"}
+        assert users._write_buffer == {}
+
+    
+    def test_timerecord_entries(self, temp_db):
+        """Test: Gottesdienste/Arbeitszeiten landen zeilenweise in timerecord_entries"""
+        import json
+        from users import (create_user, save_timerecord, submit_timerecord, delete_submission,
+                           get_timerecord_entries, extract_timerecord_entries)
+
+        user = create_user("entrytest", "TestPass123", "Test Pfarrei", email="entry@example.com")
+        gottesdienste = [
+            {"kirchort": "St. Marien", "datum": "2026-03-01", "beginn": "09:30", "ende": "10:45", "satz": "25,50"},
+            {"kirchort": "St. Josef", "datum": "2026-03-08", "beginn": "23:30", "ende": "00:30", "satz": ""},
+        ]
+        form_data = json.dumps({"Vorname": "Anna", "_gottesdienste_list": json.dumps(gottesdienste),
+                                "_arbeitszeiten_list": json.dumps([{"datum": "kaputt", "beginn": "08:00"}])})
+
+        entries = extract_timerecord_entries(form_data)
+        assert [e["minutes"] for e in entries] == [75, 60, None]
+        assert entries[0]["satz"] == 25.5 and entries[2]["entry_date"] is None
+
+        save_timerecord(user.id, "03-2026", form_data)
+        drafts = get_timerecord_entries(user_id=user.id, submitted=False)
+        assert len(drafts) == 3
+
+        # Neues Speichern ersetzt die Einträge des Entwurfs
+        save_timerecord(user.id, "03-2026", json.dumps({"_gottesdienste_list": json.dumps(gottesdienste[:1])}))
+        assert len(get_timerecord_entries(user_id=user.id, submitted=False)) == 1
+        assert get_timerecord_entries(user_id=user.id) == []
+
+        submission_id = submit_timerecord(user.id, "03-2026", form_data)
+        marien = get_timerecord_entries(kirchort="St. Marien", date_from="2026-03-01", date_to="2026-03-31")
+        assert len(marien) == 1
+        assert marien[0]["submission_id"] == submission_id and marien[0]["entry_date"] == "2026-03-01"
+        assert get_timerecord_entries(user_id=user.id, date_from="2026-03-02", kind="gottesdienst")[0]["kirchort"] == "St. Josef"
+
+        delete_submission(submission_id)
+        assert get_timerecord_entries(user_id=user.id) == []
+
+    
+    def test_monthly_summaries(self, temp_db):
+        """Test: Monatssummen werden bei Einreichen/Löschen fortgeschrieben"""
+        import json
+        from users import create_user, submit_timerecord, delete_submission, get_yearly_report
+
+        anna = create_user("summe1", "TestPass123", "Test Pfarrei", email="summe1@example.com")
+        berta = create_user("summe2", "TestPass123", "Test Pfarrei", email="summe2@example.com")
+
+        def form(*gottesdienste):
+            return json.dumps({"Tätigkeit": "Organist", "Kath. Kirchengemeinde": "St. Marien",
+                               "_gottesdienste_list": json.dumps([
+                                   {"kirchort": "St. Marien", "datum": datum, "beginn": "10:00", "ende": ende, "satz": "30,00"}
+                                   for datum, ende in gottesdienste])})
+
+        first = submit_timerecord(anna.id, "01-2026", form(("2026-01-04", "11:00"), ("2026-01-11", "11:30")))
+        submit_timerecord(anna.id, "02-2026", form(("2026-02-01", "11:00")))
+        submit_timerecord(berta.id, "02-2026", form(("2026-02-08", "10:45")))
+        submit_timerecord(berta.id, "03-2025", form(("2025-03-02", "11:00")))
+
+        report = get_yearly_report(2026)
+        assert len(report["rows"]) == 3
+        assert report["total"]["gottesdienste"] == 4
+        assert report["total"]["minutes"] == 60 + 90 + 60 + 45
+        assert report["total"]["satz_total"] == 120.0
+        employees = {e["username"]: e for e in report["employees"]}
+        assert employees["summe1"]["hours"] == 3.5 and employees["summe2"]["submissions"] == 1
+
+        delete_submission(first)
+        delete_submission(first)  # doppeltes Löschen zieht nichts zweimal ab
+        report = get_yearly_report(2026, user_id=anna.id)
+        assert [row["month_year"] for row in report["rows"]] == ["02-2026"]
+        assert report["total"]["minutes"] == 60
+
+    
+    def test_submission_export(self, temp_db):
+        """Test: Export liefert eine Zeile pro Eintrag und beachtet die Admin-Filter"""
+        import csv
+        import io
+        import json
+        from users import create_user, submit_timerecord, iter_submission_export, EXPORT_COLUMNS
+        from utils import iter_csv
+
+        user = create_user("exporttest", "TestPass123", "Test Pfarrei", email="export@example.com")
+        gottesdienste = [{"kirchort": "St. Marien", "datum": f"2026-01-{day:02d}", "beginn": "10:00", "ende": "11:00"}
+                         for day in range(1, 6)]
+        submit_timerecord(user.id, "01-2026", json.dumps({"Nachname": "Muster", "Tätigkeit": "Organist",
+                                                          "_gottesdienste_list": json.dumps(gottesdienste)}))
+        submit_timerecord(user.id, "02-2026", json.dumps({"Nachname": "Muster", "Tätigkeit": "Küster"}))
+
+        rows = list(iter_submission_export(fetch_size=2))
+        assert len(rows) == 5 + 1
+        assert rows[-1][EXPORT_COLUMNS.index('Art')] is None
+
+        rows = list(iter_submission_export(month="01-2026", fetch_size=2))
+        assert [row[EXPORT_COLUMNS.index('Datum')] for row in rows] == [g["datum"] for g in gottesdienste]
+        assert list(iter_submission_export(taetigkeit="Küster"))[0][EXPORT_COLUMNS.index('Monat/Jahr')] == "02-2026"
+
+        chunks = list(iter_csv(EXPORT_COLUMNS, iter_submission_export(), chunk_rows=2))
+        assert len(chunks) == 4
+        parsed = list(csv.reader(io.StringIO(''.join(chunks))))
+        assert parsed[0] == EXPORT_COLUMNS and len(parsed) == 7
+        assert parsed[-1][EXPORT_COLUMNS.index('Kirchort')] == ''
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
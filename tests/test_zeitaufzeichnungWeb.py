@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests für App-Factory und Lazy Init in zeitaufzeichnungWeb.py
+"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import zeitaufzeichnungWeb
+from db_pool import DatabaseUnavailable
+from passwords import PasswordHashTimeout
+
+
+class TestAppFactory:
+    """Tests für create_app() und den Kaltstart-Report"""
+
+    def test_create_app_builds_new_app(self, app):
+        """Test: Import baut keine App, jeder Aufruf liefert eine neue, voll registrierte App"""
+        assert not hasattr(zeitaufzeichnungWeb, 'app')
+        other = zeitaufzeichnungWeb.create_app()
+        assert other is not app
+        assert 'csrf' in other.extensions and other.secret_key
+        assert {rule.endpoint for rule in other.url_map.iter_rules()} == \
+               {rule.endpoint for rule in app.url_map.iter_rules()} >= {'login', 'index', 'health'}
+
+    def test_lazy_init_on_first_request(self, client, monkeypatch):
+        """Test: Schema-Check läuft genau einmal beim ersten Request und wird gemessen"""
+        calls = []
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'ensure_schema', lambda: calls.append(1))
+        monkeypatch.setattr(zeitaufzeichnungWeb, '_initialized', False)
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'COLD_START', {})
+        monkeypatch.setattr(zeitaufzeichnungWeb.limiter, 'enabled', False)
+
+        assert client.get('/login').status_code == 200
+        assert client.get('/login').status_code == 200
+        assert calls == [1]
+        assert set(zeitaufzeichnungWeb.COLD_START) == {'init_ms', 'first_request_ms'}
+
+
+class TestDatabaseUnavailable:
+    """Tests für 503 bei nicht erreichbarer Datenbank und /health"""
+
+    def _fail(self):
+        raise DatabaseUnavailable("Datenbank nicht erreichbar: connection refused")
+
+    def test_unavailable_database_returns_503(self, client, monkeypatch):
+        """Test: DB-Ausfall beim Start liefert 503 mit Retry-After, danach neuer Versuch"""
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'ensure_schema', self._fail)
+        monkeypatch.setattr(zeitaufzeichnungWeb, '_initialized', False)
+        monkeypatch.setattr(zeitaufzeichnungWeb.limiter, 'enabled', False)
+
+        response = client.get('/login')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(zeitaufzeichnungWeb.RETRY_AFTER)
+
+        response = client.put('/api/timerecords/01-2025', json={})
+        assert response.status_code == 503
+        assert response.get_json()['success'] is False
+
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'ensure_schema', lambda: [])
+        assert client.get('/login').status_code == 200
+
+    def test_login_with_saturated_hashing(self, client, monkeypatch):
+        """Test: Ausgelasteter bcrypt-Pool beim Login ergibt 503 mit Hinweis statt 500"""
+        def busy(*args):
+            raise PasswordHashTimeout("Passwort-Prüfung nicht innerhalb von 10s möglich")
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'check_user_password', busy)
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'get_user_by_email', lambda email: SimpleNamespace(id=1, password_hash='$2b$04$hash'))
+        monkeypatch.setattr(zeitaufzeichnungWeb.limiter, 'enabled', False)
+
+        response = client.post('/login', data={'email': 'a@example.com', 'password': 'TestPass123'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(zeitaufzeichnungWeb.RETRY_AFTER)
+        assert 'überlastet' in response.get_data(as_text=True)
+
+    def test_health(self, client, monkeypatch):
+        """Test: /health prüft die Datenbank und liefert Pool-Kennzahlen"""
+        response = client.get('/health')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok', 'database': {'backend': 'sqlite'}}
+
+        @contextmanager
+        def broken_db():
+            self._fail()
+            yield
+
+        monkeypatch.setattr(zeitaufzeichnungWeb, 'get_db', broken_db)
+        response = client.get('/health')
+        assert response.status_code == 503
+        assert response.get_json()['status'] == 'unavailable'
@@ -2,12 +2,23 @@
 # -*- coding: utf-8 -*-
 
 import os
-import bcrypt
+import re
+import atexit
+import json
+import hashlib
+import time
+import weakref
 import secrets
 import logging
-from datetime import datetime, timedelta
+import itertools
+import threading
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
 from flask_login import UserMixin
 from contextlib import contextmanager
+from passwords import hash_password, check_password, needs_rehash
+from utils import apply_form_patch
+from db_pool import ResilientPool, DatabaseUnavailable
 
 # Logging konfigurieren
 logger = logging.getLogger(__name__)
@@ -17,42 +28,113 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 
 if DATABASE_URL:
     # PostgreSQL für Production (Render)
-    import psycopg2
-    from psycopg2 import pool
-    from psycopg2.extras import RealDictCursor
+    # psycopg2 und der Connection Pool werden erst beim ersten Zugriff geladen (Kaltstart)
     USE_POSTGRES = True
     # Render gibt manchmal postgres:// statt postgresql:// - fix das
     if DATABASE_URL.startswith('postgres://'):
         DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
-    
-    # Connection Pool für bessere Performance (5-20 Connections)
-    try:
-        connection_pool = pool.ThreadedConnectionPool(
-            minconn=5,
-            maxconn=20,
-            dsn=DATABASE_URL
-        )
-        logger.info("PostgreSQL Connection Pool erstellt (5-20 Connections)")
-    except Exception as e:
-        logger.error(f"Connection Pool Fehler: {e}")
-        connection_pool = None
 else:
-    # SQLite für lokale Entwicklung
+    # SQLite für lokale Entwicklung und kleine Installationen
     import sqlite3
     USE_POSTGRES = False
-    DATABASE = 'users.db'
-    connection_pool = None
+    DATABASE = os.environ.get('SQLITE_PATH', 'users.db')
+
+# Connection Pool (db_pool.ResilientPool, Größe/Timeouts über DB_POOL_*):
+# wird beim ersten Zugriff angelegt, damit der Kaltstart keinen Roundtrip kostet
+connection_pool = None
+_pool_lock = threading.Lock()
+
+# SQLite-Tuning (nur relevant ohne DATABASE_URL)
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+SQLITE_CACHED_STATEMENTS = 256
+
+# Eine SQLite-Verbindung pro Thread und Datenbankdatei, wird wiederverwendet
+_sqlite_local = threading.local()
+
+
+def _open_sqlite_connection(path):
+    """Öffnet eine SQLite-Verbindung mit WAL und Produktions-Pragmas"""
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=SQLITE_CACHED_STATEMENTS)
+    # WAL: Leser blockieren Schreiber nicht mehr (und umgekehrt)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # In WAL-Modus sicher, spart ein fsync pro Commit
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA foreign_keys=ON')
+    logger.info(f"SQLite-Verbindung geöffnet: {path} (WAL)")
+    return conn
+
+
+def _get_sqlite_connection():
+    """Liefert die Verbindung dieses Threads (nach fork wird neu verbunden)"""
+    connections = getattr(_sqlite_local, 'connections', None)
+    if connections is None or _sqlite_local.pid != os.getpid():
+        # Verbindungen aus dem Elternprozess nicht anfassen (gunicorn --preload)
+        connections = _sqlite_local.connections = {}
+        _sqlite_local.pid = os.getpid()
+    
+    conn = connections.get(DATABASE)
+    if conn is None:
+        conn = connections[DATABASE] = _open_sqlite_connection(DATABASE)
+    return conn
+
+
+def _get_pool():
+    """Legt den PostgreSQL-Pool beim ersten Zugriff an"""
+    global connection_pool
+    
+    if connection_pool is None:
+        with _pool_lock:
+            if connection_pool is None:
+                import psycopg2
+                # Ist die Datenbank beim Anlegen nicht erreichbar, öffnet der Pool
+                # die Verbindungen später bei Bedarf - kein Rückfall auf Einzelverbindungen
+                connection_pool = ResilientPool(lambda: psycopg2.connect(DATABASE_URL))
+                logger.info(f"PostgreSQL Connection Pool erstellt "
+                            f"({connection_pool.minconn}-{connection_pool.maxconn} Connections, "
+                            f"Wartezeit {connection_pool.timeout:.0f}s)")
+    return connection_pool
 
 
 def get_db_connection():
-    """Erstellt Datenbankverbindung (PostgreSQL mit Pooling oder SQLite)"""
+    """
+    Liefert Datenbankverbindung (PostgreSQL aus dem Pool oder SQLite pro Thread)
+    
+    Raises:
+        DatabaseUnavailable: PostgreSQL nicht erreichbar oder Pool ausgelastet
+    """
     if USE_POSTGRES:
-        if connection_pool:
-            return connection_pool.getconn()
-        else:
-            return psycopg2.connect(DATABASE_URL)
+        return _get_pool().getconn()
     else:
-        return sqlite3.connect(DATABASE)
+        return _get_sqlite_connection()
+
+
+def release_db_connection(conn):
+    """Gibt eine Verbindung aus get_db_connection() zurück"""
+    if USE_POSTGRES:
+        # Der Pool verwirft Verbindungen, die unterwegs kaputtgegangen sind
+        connection_pool.putconn(conn)
+    elif conn.in_transaction:
+        # SQLite-Verbindung bleibt offen, darf aber keine Transaktion offen halten
+        conn.rollback()
+
+
+def db_pool_stats():
+    """Kennzahlen des Connection Pools (für /health)"""
+    if not USE_POSTGRES:
+        return {'backend': 'sqlite'}
+    return {'backend': 'postgresql', **_get_pool().stats()}
+
+
+def close_sqlite_connections():
+    """Schließt die SQLite-Verbindungen des aktuellen Threads"""
+    connections = getattr(_sqlite_local, 'connections', None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
 
 
 @contextmanager
@@ -64,16 +146,19 @@ def get_db():
         yield cursor
         conn.commit()
     except Exception as e:
+        if USE_POSTGRES and getattr(conn, 'closed', 0):
+            # Verbindung ist mitten im Request weggebrochen (z.B. DB-Neustart)
+            logger.error(f"Datenbankverbindung verloren: {e}")
+            raise DatabaseUnavailable(f"Datenbankverbindung verloren: {e}") from e
         conn.rollback()
+        if USE_POSTGRES:
+            _reset_prepared_statements(conn)
         logger.error(f"Datenbankfehler: {e}")
         raise
     finally:
         cursor.close()
-        # Connection zurück zum Pool (nur bei PostgreSQL mit Pooling)
-        if USE_POSTGRES and connection_pool:
-            connection_pool.putconn(conn)
-        else:
-            conn.close()
+        # Connection zurück zum Pool (PostgreSQL) bzw. offen lassen (SQLite pro Thread)
+        release_db_connection(conn)
 
 
 class User(UserMixin):
@@ -88,193 +173,696 @@ class User(UserMixin):
         self.password_hash = password_hash
 
 
-def init_db():
-    """Erstellt die User-Tabelle, falls nicht vorhanden"""
-    conn = get_db_connection()
-    c = conn.cursor()
+# ============= Query-Layer =============
+
+class Query:
+    """
+    Eine SQL-Definition pro Operation, einmal pro Dialekt kompiliert.
+    
+    Das SQL wird mit ?-Platzhaltern geschrieben. PostgreSQL bekommt daraus ein
+    PREPARE ($1, $2, ...) und das passende EXECUTE, SQLite den Text unverändert
+    (sqlite3 hält ihn pro Verbindung als kompiliertes Statement im Cache).
+    Wo sich die Dialekte wirklich unterscheiden, gibt es eigenes SQL pro Dialekt.
+    """
+    _names = set()
+    
+    def __init__(self, name, sql, postgres=None, sqlite=None):
+        if name in Query._names:
+            raise ValueError(f"Query-Name doppelt vergeben: {name}")
+        Query._names.add(name)
+        self.name = name
+        self._sql = {True: postgres or sql, False: sqlite or sql}
+        self._compiled = {}
+    
+    def compile(self, postgres):
+        """Liefert (prepare_sql, execute_sql, plain_sql) für den Dialekt"""
+        compiled = self._compiled.get(postgres)
+        if compiled is None:
+            sql = ' '.join(self._sql[postgres].split())
+            if postgres:
+                numbers = itertools.count(1)
+                body = re.sub(r'\?', lambda m: f'${next(numbers)}', sql)
+                count = sql.count('?')
+                args = f" ({', '.join(['%s'] * count)})" if count else ''
+                compiled = (f'PREPARE {self.name} AS {body}', f'EXECUTE {self.name}{args}', sql.replace('?', '%s'))
+            else:
+                compiled = (None, sql, sql)
+            self._compiled[postgres] = compiled
+        return compiled
+
+
+# Pro PostgreSQL-Verbindung: Namen der bereits vorbereiteten Statements
+_prepared_statements = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def _statement(cursor, query):
+    """SQL einer Query für diese Verbindung (PostgreSQL mit Pool: PREPARE beim ersten Gebrauch)"""
+    prepare_sql, execute_sql, _ = query.compile(USE_POSTGRES)
+    
+    if not USE_POSTGRES:
+        return execute_sql
+    
+    with _prepared_lock:
+        prepared = _prepared_statements.setdefault(cursor.connection, set())
+    if query.name not in prepared:
+        cursor.execute(prepare_sql)
+        prepared.add(query.name)
+    return execute_sql
+
+
+def execute_query(cursor, query, params=()):
+    """Führt eine Query aus (PostgreSQL mit Pool: als Prepared Statement pro Verbindung)"""
+    cursor.execute(_statement(cursor, query), params)
+
+
+def execute_many(cursor, query, rows):
+    """Führt eine Query für viele Parameter-Tupel aus (ein Statement, mehrfach ausgeführt)"""
+    cursor.executemany(_statement(cursor, query), rows)
+
+
+def _reset_prepared_statements(conn):
+    """Verwirft alle Prepared Statements einer Verbindung (nach Rollback nicht mehr verlässlich)"""
+    with _prepared_lock:
+        had_statements = _prepared_statements.pop(conn, None)
+    if had_statements:
+        try:
+            with conn.cursor() as c:
+                c.execute('DEALLOCATE ALL')
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"DEALLOCATE ALL fehlgeschlagen: {e}")
+
+
+USER_COLUMNS = 'id, username, pfarrei, email, is_admin, is_approved'
+
+
+def _row_to_user(row, password_hash=None):
+    """Baut einen User aus einer Zeile mit USER_COLUMNS (SQLite liefert 0/1 statt bool)"""
+    return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3],
+                is_admin=bool(row[4]), is_approved=bool(row[5]), password_hash=password_hash)
+
+
+Q_USER_BY_ID = Query('user_by_id', f'SELECT {USER_COLUMNS} FROM users WHERE id = ?')
+Q_USER_BY_USERNAME = Query('user_by_username', f'SELECT {USER_COLUMNS} FROM users WHERE username = ?')
+Q_USER_LOGIN = Query('user_login', f'SELECT {USER_COLUMNS}, password_hash FROM users WHERE username = ?')
+Q_USER_BY_EMAIL = Query('user_by_email', f'SELECT {USER_COLUMNS}, password_hash FROM users WHERE email = ?')
+Q_USER_BY_RESET_TOKEN = Query('user_by_reset_token', f'SELECT {USER_COLUMNS}, reset_token_expiry FROM users WHERE reset_token = ?')
+Q_ALL_USERS = Query('all_users', f'SELECT {USER_COLUMNS} FROM users ORDER BY id DESC')
+Q_CREATE_USER = Query(
+    'create_user',
+    'INSERT INTO users (username, password_hash, pfarrei, email, is_admin, is_approved) VALUES (?, ?, ?, ?, ?, ?)',
+    postgres='INSERT INTO users (username, password_hash, pfarrei, email, is_admin, is_approved) VALUES (?, ?, ?, ?, ?, ?) RETURNING id',
+)
+Q_APPROVE_USER = Query('approve_user', 'UPDATE users SET is_approved = TRUE WHERE id = ?')
+Q_DELETE_USER = Query('delete_user', 'DELETE FROM users WHERE id = ?')
+Q_SET_RESET_TOKEN = Query('set_reset_token', 'UPDATE users SET reset_token = ?, reset_token_expiry = ? WHERE id = ?')
+Q_SET_PASSWORD = Query('set_password', 'UPDATE users SET password_hash = ?, reset_token = NULL, reset_token_expiry = NULL WHERE id = ?')
+Q_UPDATE_PASSWORD_HASH = Query('update_password_hash', 'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?')
+
+# Upsert, der unveränderte Dokumente nicht schreibt (dann liefert RETURNING keine Zeile)
+Q_SAVE_TIMERECORD = Query('save_timerecord', '''
+    INSERT INTO timerecords (user_id, month_year, form_data, content_hash, updated_at)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, month_year)
+    DO UPDATE SET form_data = excluded.form_data, content_hash = excluded.content_hash,
+                  updated_at = CURRENT_TIMESTAMP, version = timerecords.version + 1
+    WHERE timerecords.content_hash IS NULL OR timerecords.content_hash <> excluded.content_hash
+    RETURNING updated_at, version, content_hash, id
+''')
+# Schreiben nur, wenn der gespeicherte Stand dem If-Match entspricht und sich etwas ändert
+Q_SAVE_TIMERECORD_IF_MATCH = Query('save_timerecord_if_match', '''
+    UPDATE timerecords SET form_data = ?, content_hash = ?, updated_at = CURRENT_TIMESTAMP, version = version + 1
+    WHERE user_id = ? AND month_year = ? AND content_hash = ? AND content_hash <> ?
+    RETURNING updated_at, version, content_hash, id
+''')
+# Write-Behind-Flush eines Datensatzes, den es beim Puffern noch nicht gab
+Q_INSERT_TIMERECORD_IF_ABSENT = Query('insert_timerecord_if_absent', '''
+    INSERT INTO timerecords (user_id, month_year, form_data, content_hash, updated_at)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, month_year) DO NOTHING
+    RETURNING updated_at, version, content_hash, id
+''')
+Q_TIMERECORD_STATE = Query('timerecord_state', 'SELECT updated_at, version, content_hash FROM timerecords WHERE user_id = ? AND month_year = ?')
+Q_GET_TIMERECORD = Query('get_timerecord', 'SELECT form_data, updated_at, version, content_hash FROM timerecords WHERE user_id = ? AND month_year = ?')
+Q_ALL_TIMERECORDS = Query('all_timerecords', 'SELECT month_year, form_data, updated_at, version FROM timerecords WHERE user_id = ? ORDER BY month_year DESC')
+Q_UPDATE_TIMERECORD_IF_VERSION = Query('update_timerecord_if_version', '''
+    UPDATE timerecords SET form_data = ?, content_hash = ?, updated_at = CURRENT_TIMESTAMP, version = version + 1
+    WHERE user_id = ? AND month_year = ? AND version = ?
+    RETURNING updated_at, version, content_hash, id
+''')
+Q_DELETE_TIMERECORD = Query('delete_timerecord', 'DELETE FROM timerecords WHERE user_id = ? AND month_year = ?')
+
+Q_DELETE_TIMERECORD_ENTRIES = Query('delete_timerecord_entries', 'DELETE FROM timerecord_entries WHERE timerecord_id = ?')
+Q_INSERT_TIMERECORD_ENTRY = Query('insert_timerecord_entry', '''
+    INSERT INTO timerecord_entries (user_id, month_year, timerecord_id, submission_id, kind,
+                                    entry_date, kirchort, beginn, ende, satz, minutes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+''')
+
+Q_INSERT_SUBMISSION = Query(
+    'insert_submission',
+    '''INSERT INTO submissions (user_id, month_year, form_data, vorname, nachname, taetigkeit,
+                                kirchengemeinde, gottesdienste_count, arbeitszeiten_count, submitted_at)
+       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)''',
+    postgres='''INSERT INTO submissions (user_id, month_year, form_data, vorname, nachname, taetigkeit,
+                                         kirchengemeinde, gottesdienste_count, arbeitszeiten_count, submitted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) RETURNING id''',
+)
+Q_USER_CONTACT = Query('user_contact', 'SELECT username, email FROM users WHERE id = ?')
+Q_SUBMISSIONS_FOR_MONTH = Query('submissions_for_month', 'SELECT id, form_data FROM submissions WHERE month_year = ? ORDER BY nachname, vorname, id')
+Q_DELETE_SUBMISSION = Query('delete_submission', 'DELETE FROM submissions WHERE id = ? RETURNING user_id, month_year, form_data')
+Q_DELETE_SUBMISSION_FTS = Query('delete_submission_fts', 'DELETE FROM submissions_fts WHERE rowid = ?')
+Q_SUBMISSION_MONTHS = Query('submission_months', 'SELECT DISTINCT month_year FROM submissions ORDER BY month_year DESC')
+Q_ADD_MONTHLY_SUMMARY = Query('add_monthly_summary', '''
+    INSERT INTO monthly_summaries (user_id, month_year, year, taetigkeit, kirchengemeinde,
+                                   submissions, gottesdienste, arbeitszeiten, minutes, satz_total, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, month_year, taetigkeit, kirchengemeinde)
+    DO UPDATE SET submissions = monthly_summaries.submissions + excluded.submissions,
+                  gottesdienste = monthly_summaries.gottesdienste + excluded.gottesdienste,
+                  arbeitszeiten = monthly_summaries.arbeitszeiten + excluded.arbeitszeiten,
+                  minutes = monthly_summaries.minutes + excluded.minutes,
+                  satz_total = monthly_summaries.satz_total + excluded.satz_total,
+                  updated_at = CURRENT_TIMESTAMP
+''')
+Q_PRUNE_MONTHLY_SUMMARY = Query('prune_monthly_summary', '''
+    DELETE FROM monthly_summaries
+    WHERE user_id = ? AND month_year = ? AND taetigkeit = ? AND kirchengemeinde = ? AND submissions <= 0
+''')
+Q_SUBMISSION_TAETIGKEITEN = Query('submission_taetigkeiten', "SELECT DISTINCT taetigkeit FROM submissions WHERE taetigkeit <> '' ORDER BY taetigkeit")
+
+Q_GET_PROFILE = Query('get_profile', 'SELECT vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz FROM profiles WHERE user_id = ?')
+Q_SAVE_PROFILE = Query('save_profile', '''
+    INSERT INTO profiles (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        vorname = excluded.vorname,
+        nachname = excluded.nachname,
+        geburtsdatum = excluded.geburtsdatum,
+        personalnummer = excluded.personalnummer,
+        einsatzort = excluded.einsatzort,
+        gkz = excluded.gkz,
+        updated_at = CURRENT_TIMESTAMP
+''')
+
+
+def timerecord_hash(form_data):
+    """Content-Hash (SHA-256, hex) einer Zeitaufzeichnung - Basis für ETag und Unchanged-Check"""
+    return hashlib.sha256((form_data or '').encode('utf-8')).hexdigest()
+
+
+def backfill_timerecord_hashes(cursor, batch_size=500):
+    """Trägt content_hash für bestehende Zeitaufzeichnungen nach (content_hash IS NULL)"""
+    ph = '%s' if USE_POSTGRES else '?'
+    total = 0
+    
+    while True:
+        cursor.execute(f'SELECT id, form_data FROM timerecords WHERE content_hash IS NULL ORDER BY id LIMIT {ph}',
+                       (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        
+        for record_id, form_data in rows:
+            cursor.execute(f'UPDATE timerecords SET content_hash = {ph} WHERE id = {ph}',
+                           (timerecord_hash(form_data), record_id))
+        total += len(rows)
     
+    return total
+
+
+# Aus form_data extrahierte Spalten (angelegt von migrations/002_submission_metadata.sql)
+SUBMISSION_METADATA_COLUMNS = ['vorname', 'nachname', 'taetigkeit', 'kirchengemeinde',
+                               'gottesdienste_count', 'arbeitszeiten_count']
+
+
+def _count_json_list(value):
+    """Zählt die Einträge einer Liste, die als JSON-String im Formular steckt"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value or "[]")
+        except ValueError:
+            return 0
+    return len(value) if isinstance(value, list) else 0
+
+
+def extract_submission_metadata(form_data):
+    """
+    Extrahiert die indizierten Metadaten einer Submission aus form_data.
+    
+    Args:
+        form_data: Formulardaten als JSON-String oder dict
+    
+    Returns:
+        dict: vorname, nachname, taetigkeit, kirchengemeinde,
+              gottesdienste_count, arbeitszeiten_count
+    """
+    if isinstance(form_data, str):
+        try:
+            form_data = json.loads(form_data)
+        except ValueError:
+            form_data = {}
+    if not isinstance(form_data, dict):
+        form_data = {}
+    
+    return {
+        'vorname': (form_data.get('Vorname') or '').strip(),
+        'nachname': (form_data.get('Nachname') or '').strip(),
+        'taetigkeit': (form_data.get('Tätigkeit') or '').strip(),
+        'kirchengemeinde': (form_data.get('Kath. Kirchengemeinde') or '').strip(),
+        'gottesdienste_count': _count_json_list(form_data.get('Gottesdienste') or form_data.get('_gottesdienste_list')),
+        'arbeitszeiten_count': _count_json_list(form_data.get('Arbeitszeiten') or form_data.get('_arbeitszeiten_list')),
+    }
+
+
+def backfill_submission_metadata(cursor, batch_size=500):
+    """Trägt Metadaten-Spalten für bestehende Submissions nach (gottesdienste_count IS NULL)"""
+    ph = '%s' if USE_POSTGRES else '?'
+    total = 0
+    last_id = 0
+    
+    while True:
+        cursor.execute(f'''SELECT id, form_data FROM submissions
+                         WHERE gottesdienste_count IS NULL AND id > {ph}
+                         ORDER BY id LIMIT {ph}''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        
+        for submission_id, form_data in rows:
+            meta = extract_submission_metadata(form_data)
+            cursor.execute(f'''UPDATE submissions
+                             SET vorname = {ph}, nachname = {ph}, taetigkeit = {ph}, kirchengemeinde = {ph},
+                                 gottesdienste_count = {ph}, arbeitszeiten_count = {ph}
+                             WHERE id = {ph}''',
+                           (meta['vorname'], meta['nachname'], meta['taetigkeit'], meta['kirchengemeinde'],
+                            meta['gottesdienste_count'], meta['arbeitszeiten_count'], submission_id))
+        
+        total += len(rows)
+        last_id = rows[-1][0]
+    
+    return total
+
+
+def _search_tokens(text):
+    """Zerlegt Text in kleingeschriebene alphanumerische Tokens (gleich für Index und Suche)"""
+    return re.findall(r'[^\W_]+', (text or '').lower())
+
+
+def build_search_document(username, email, meta):
+    """Baut den Volltext-Dokumentstring einer Submission (Name, E-Mail, Username, Kirchengemeinde)"""
+    parts = (username, email, meta.get('vorname'), meta.get('nachname'), meta.get('kirchengemeinde'))
+    return ' '.join(token for part in parts for token in _search_tokens(part))
+
+
+def _index_submission_search(cursor, submission_id, document):
+    """Schreibt das Suchdokument einer Submission in den Volltextindex"""
     if USE_POSTGRES:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                pfarrei TEXT NOT NULL,
-                email VARCHAR(255),
-                is_admin BOOLEAN DEFAULT FALSE,
-                is_approved BOOLEAN DEFAULT FALSE,
-                reset_token TEXT,
-                reset_token_expiry TIMESTAMP
-            )
-        ''')
+        cursor.execute("UPDATE submissions SET search_vector = to_tsvector('simple', %s) WHERE id = %s",
+                       (document, submission_id))
     else:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                pfarrei TEXT NOT NULL,
-                email TEXT,
-                is_admin INTEGER DEFAULT 0,
-                is_approved INTEGER DEFAULT 0,
-                reset_token TEXT,
-                reset_token_expiry TEXT
-            )
-        ''')
-    
-    conn.commit()
-    conn.close()
-
-
-def init_timerecords_table():
-    """Erstellt die Tabelle für Zeitaufzeichnungen"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    
+        cursor.execute('DELETE FROM submissions_fts WHERE rowid = ?', (submission_id,))
+        cursor.execute('INSERT INTO submissions_fts (rowid, document) VALUES (?, ?)', (submission_id, document))
+
+
+def backfill_submission_search(cursor, batch_size=500):
+    """Baut den Volltextindex für bestehende Submissions auf, die noch nicht indiziert sind"""
+    ph = '%s' if USE_POSTGRES else '?'
     if USE_POSTGRES:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS timerecords (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                month_year VARCHAR(10) NOT NULL,
-                form_data TEXT NOT NULL,
-                status VARCHAR(20) DEFAULT 'draft',
-                submitted_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                UNIQUE(user_id, month_year)
-            )
-        ''')
+        missing = 's.search_vector IS NULL'
     else:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS timerecords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                month_year TEXT NOT NULL,
-                form_data TEXT NOT NULL,
-                status TEXT DEFAULT 'draft',
-                submitted_at TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                UNIQUE(user_id, month_year)
-            )
-        ''')
-    
-    conn.commit()
-    
-    # Migration: Füge status und submitted_at hinzu falls nicht vorhanden
+        missing = 's.id NOT IN (SELECT rowid FROM submissions_fts)'
+    total = 0
+    last_id = 0
+    
+    while True:
+        cursor.execute(f'''SELECT s.id, u.username, u.email, s.vorname, s.nachname, s.kirchengemeinde
+                         FROM submissions s
+                         JOIN users u ON s.user_id = u.id
+                         WHERE {missing} AND s.id > {ph}
+                         ORDER BY s.id LIMIT {ph}''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        
+        for submission_id, username, email, vorname, nachname, kirchengemeinde in rows:
+            meta = {'vorname': vorname, 'nachname': nachname, 'kirchengemeinde': kirchengemeinde}
+            _index_submission_search(cursor, submission_id, build_search_document(username, email, meta))
+        
+        total += len(rows)
+        last_id = rows[-1][0]
+    
+    return total
+
+
+# ============= Einträge (Gottesdienste / Arbeitszeiten) =============
+# Die Listen stecken als JSON-Strings in form_data. Für Abfragen pro Tag und
+# Kirchort werden sie beim Speichern und Einreichen zusätzlich zeilenweise in
+# timerecord_entries abgelegt (abgeleitete Daten, jederzeit neu aufbaubar).
+
+ENTRY_KINDS = {
+    'gottesdienst': ('Gottesdienste', '_gottesdienste_list'),
+    'arbeitszeit': ('Arbeitszeiten', '_arbeitszeiten_list'),
+}
+
+
+# Ohne strptime: das Zerlegen läuft beim Restore/Backfill für jeden Eintrag
+_CLOCK_RE = re.compile(r'(\d{1,2}):(\d{2})')
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _clock_minutes(value):
+    """Minuten seit Mitternacht aus "HH:MM", None wenn nicht lesbar"""
+    match = _CLOCK_RE.fullmatch(value or '')
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    return hours * 60 + minutes if hours < 24 and minutes < 60 else None
+
+
+def _entry_minutes(beginn, ende):
+    """Dauer in Minuten aus "HH:MM"-Zeiten (über Mitternacht wird umgebrochen)"""
+    start = _clock_minutes(beginn)
+    end = _clock_minutes(ende)
+    if start is None or end is None:
+        return None
+    return (end - start) % (24 * 60)
+
+
+def _entry_date(value):
+    """Datum "YYYY-MM-DD", None wenn nicht lesbar"""
+    if not _DATE_RE.fullmatch(value):
+        return None
     try:
-        if USE_POSTGRES:
-            c.execute("ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'draft'")
-            c.execute("ALTER TABLE timerecords ADD COLUMN IF NOT EXISTS submitted_at TIMESTAMP")
-        else:
-            c.execute("PRAGMA table_info(timerecords)")
-            columns = [row[1] for row in c.fetchall()]
-            if 'status' not in columns:
-                c.execute("ALTER TABLE timerecords ADD COLUMN status TEXT DEFAULT 'draft'")
-            if 'submitted_at' not in columns:
-                c.execute("ALTER TABLE timerecords ADD COLUMN submitted_at TEXT")
-        conn.commit()
-    except Exception as e:
-        print(f"Migration Warnung: {e}")
-        conn.rollback()
+        date.fromisoformat(value)
+    except ValueError:
+        return None
+    return value
+
+
+def _parse_satz(satz):
+    """Satz als Zahl ("25,50 €" -> 25.5), None wenn nicht lesbar"""
+    try:
+        return round(float(satz.replace('€', '').replace(',', '.').strip()), 2)
+    except (AttributeError, ValueError):
+        return None
+
+
+def extract_timerecord_entries(form_data):
+    """
+    Zerlegt die Gottesdienst- und Arbeitszeit-Listen aus form_data in Einträge.
+    
+    Args:
+        form_data: Formulardaten als JSON-String oder dict
     
-    conn.close()
+    Returns:
+        list: dicts mit kind, entry_date, kirchort, beginn, ende, satz, minutes
+    """
+    if isinstance(form_data, str):
+        try:
+            form_data = json.loads(form_data)
+        except ValueError:
+            form_data = {}
+    if not isinstance(form_data, dict):
+        return []
+    
+    entries = []
+    for kind, keys in ENTRY_KINDS.items():
+        items = next((form_data[key] for key in keys if form_data.get(key)), '[]')
+        if isinstance(items, str):
+            try:
+                items = json.loads(items or '[]')
+            except ValueError:
+                continue
+        if not isinstance(items, list):
+            continue
+        
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            beginn = str(item.get('beginn') or '').strip()
+            ende = str(item.get('ende') or '').strip()
+            entries.append({
+                'kind': kind,
+                'entry_date': _entry_date(str(item.get('datum') or '').strip()),
+                'kirchort': str(item.get('kirchort') or '').strip() or None,
+                'beginn': beginn or None,
+                'ende': ende or None,
+                'satz': _parse_satz(item.get('satz')),
+                'minutes': _entry_minutes(beginn, ende),
+            })
+    return entries
 
 
-def init_submissions_table():
-    """Erstellt die Submissions-Tabelle für eingereichte Zeitaufzeichnungen"""
-    conn = get_db_connection()
-    c = conn.cursor()
+def _entry_rows(user_id, month_year, form_data, timerecord_id=None, submission_id=None):
+    """Parameter-Tupel für Q_INSERT_TIMERECORD_ENTRY"""
+    return [(user_id, month_year, timerecord_id, submission_id, entry['kind'], entry['entry_date'],
+             entry['kirchort'], entry['beginn'], entry['ende'], entry['satz'], entry['minutes'])
+            for entry in extract_timerecord_entries(form_data)]
+
+
+def _insert_entries(cursor, user_id, month_year, form_data, timerecord_id=None, submission_id=None):
+    """Legt die Einträge einer Zeitaufzeichnung oder Submission an"""
+    rows = _entry_rows(user_id, month_year, form_data, timerecord_id, submission_id)
+    if rows:
+        execute_many(cursor, Q_INSERT_TIMERECORD_ENTRY, rows)
+    return len(rows)
+
+
+def _replace_timerecord_entries(cursor, timerecord_id, user_id, month_year, form_data):
+    """Ersetzt die Einträge eines Entwurfs nach dem Speichern"""
+    execute_query(cursor, Q_DELETE_TIMERECORD_ENTRIES, (timerecord_id,))
+    return _insert_entries(cursor, user_id, month_year, form_data, timerecord_id=timerecord_id)
+
+
+def backfill_timerecord_entries(cursor, batch_size=500):
+    """Baut timerecord_entries aus allen Zeitaufzeichnungen und Submissions auf"""
+    ph = '%s' if USE_POSTGRES else '?'
+    counts = []
     
-    if USE_POSTGRES:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                month_year VARCHAR(10) NOT NULL,
-                form_data TEXT NOT NULL,
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-    else:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                month_year TEXT NOT NULL,
-                form_data TEXT NOT NULL,
-                submitted_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
+    for table, column in (('timerecords', 'timerecord_id'), ('submissions', 'submission_id')):
+        total = 0
+        last_id = 0
+        while True:
+            cursor.execute(f'''SELECT id, user_id, month_year, form_data FROM {table}
+                             WHERE id > {ph} ORDER BY id LIMIT {ph}''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            # Ein Bulk-Insert pro Block statt pro Zeile
+            entries = [entry for source_id, user_id, month_year, form_data in rows
+                       for entry in _entry_rows(user_id, month_year, form_data, **{column: source_id})]
+            if entries:
+                execute_many(cursor, Q_INSERT_TIMERECORD_ENTRY, entries)
+            total += len(rows)
+            last_id = rows[-1][0]
+        counts.append(total)
+    
+    return tuple(counts)
+
+
+# ============= Monatssummen (Reporting) =============
+# Pro (User, Monat, Tätigkeit, Kirchengemeinde) eine kleine Zeile mit Summen
+# über alle eingereichten Submissions. submit_timerecord/delete_submission
+# addieren bzw. subtrahieren ihren Anteil in derselben Transaktion, Reports
+# lesen nur diese Zeilen (Index auf year).
+
+SUMMARY_COLUMNS = ['submissions', 'gottesdienste', 'arbeitszeiten', 'minutes', 'satz_total']
+
+
+def _summary_year(month_year):
+    """Jahr aus "MM-YYYY" (0, wenn nicht lesbar)"""
+    try:
+        return int(month_year.rsplit('-', 1)[1])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+def _summary_delta(form_data, sign=1):
+    """Beitrag einer Submission zu ihrer Monatssumme (sign=-1 beim Löschen)"""
+    if isinstance(form_data, str):
+        # Einmal parsen, beide Extraktoren nehmen auch dicts
+        try:
+            form_data = json.loads(form_data)
+        except ValueError:
+            form_data = {}
+    meta = extract_submission_metadata(form_data)
+    entries = extract_timerecord_entries(form_data)
+    
+    return (meta['taetigkeit'], meta['kirchengemeinde'], {
+        'submissions': sign,
+        'gottesdienste': sign * sum(1 for entry in entries if entry['kind'] == 'gottesdienst'),
+        'arbeitszeiten': sign * sum(1 for entry in entries if entry['kind'] == 'arbeitszeit'),
+        'minutes': sign * sum(entry['minutes'] or 0 for entry in entries),
+        'satz_total': sign * round(sum(entry['satz'] or 0 for entry in entries), 2),
+    })
+
+
+def _apply_summary_delta(cursor, user_id, month_year, form_data, sign=1):
+    """Addiert/subtrahiert den Anteil einer Submission (in der Transaktion des Aufrufers)"""
+    taetigkeit, kirchengemeinde, delta = _summary_delta(form_data, sign)
+    key = (user_id, month_year, taetigkeit, kirchengemeinde)
     
-    conn.commit()
-    conn.close()
+    execute_query(cursor, Q_ADD_MONTHLY_SUMMARY,
+                  key[:2] + (_summary_year(month_year),) + key[2:] + tuple(delta[column] for column in SUMMARY_COLUMNS))
+    if sign < 0:
+        execute_query(cursor, Q_PRUNE_MONTHLY_SUMMARY, key)
+
+
+def rebuild_monthly_summaries(cursor, batch_size=500):
+    """Baut monthly_summaries komplett aus den Submissions neu auf"""
+    ph = '%s' if USE_POSTGRES else '?'
+    cursor.execute('DELETE FROM monthly_summaries')
+    total = 0
+    last_id = 0
+    
+    while True:
+        cursor.execute(f'''SELECT id, user_id, month_year, form_data FROM submissions
+                         WHERE id > {ph} ORDER BY id LIMIT {ph}''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        
+        # Pro Block je Summenzeile aufaddieren, dann ein Upsert pro Zeile
+        sums = {}
+        for _, user_id, month_year, form_data in rows:
+            taetigkeit, kirchengemeinde, delta = _summary_delta(form_data)
+            key = (user_id, month_year, _summary_year(month_year), taetigkeit, kirchengemeinde)
+            current = sums.setdefault(key, dict.fromkeys(SUMMARY_COLUMNS, 0))
+            for column in SUMMARY_COLUMNS:
+                current[column] += delta[column]
+        execute_many(cursor, Q_ADD_MONTHLY_SUMMARY,
+                     [key + tuple(round(values[column], 2) if column == 'satz_total' else values[column]
+                                  for column in SUMMARY_COLUMNS)
+                      for key, values in sums.items()])
+        total += len(rows)
+        last_id = rows[-1][0]
+    
+    return total
+
+
+# ============= Tombstones (für inkrementelle Backups) =============
+# Trigger (migrations/008_deleted_rows.sql) protokollieren jede gelöschte
+# Zeile der gesicherten Tabellen (auch per ON DELETE CASCADE). Inkrementelle
+# Backups exportieren die Tombstones seit dem letzten Backup, damit
+# Löschungen beim Zusammenführen nachvollzogen werden.
+
+
+def prune_tombstones(max_age_days=90):
+    """Entfernt Tombstones, die älter sind als jedes sinnvolle Inkrement"""
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+    ph = '%s' if USE_POSTGRES else '?'
+    with get_db() as cursor:
+        cursor.execute(f'DELETE FROM deleted_rows WHERE deleted_at < {ph}', (cutoff,))
+        deleted = cursor.rowcount
+    if deleted:
+        logger.info(f"{deleted} alte Tombstones entfernt")
+    return deleted
 
 
 def get_user_by_id(user_id):
     """Lädt User anhand der ID"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users WHERE id = %s', (user_id,))
-        else:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users WHERE id = ?', (user_id,))
-        
+        execute_query(cursor, Q_USER_BY_ID, (user_id,))
         row = cursor.fetchone()
-        
-        if row:
-            if USE_POSTGRES:
-                return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=row[4], is_approved=row[5])
-            else:
-                return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=bool(row[4]), is_approved=bool(row[5]))
-    return None
+    return _row_to_user(row) if row else None
+
+
+# ============= User-Cache (für load_user) =============
+
+# Lebensdauer (Sekunden) und maximale Anzahl gecachter User pro Prozess.
+# Änderungen in diesem Prozess invalidieren sofort, andere Worker sehen sie
+# spätestens nach USER_CACHE_TTL.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1024'))
+
+_user_cache = OrderedDict()  # user_id -> (User, ablaufzeitpunkt)
+_user_cache_lock = threading.Lock()
+_user_cache_generation = 0
+
+
+def get_user_by_id_cached(user_id):
+    """Lädt User anhand der ID aus dem TTL/LRU-Cache, bei Miss aus der Datenbank"""
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[1] > now:
+            _user_cache.move_to_end(user_id)
+            return entry[0]
+        generation = _user_cache_generation
+    
+    user = get_user_by_id(user_id)
+    
+    with _user_cache_lock:
+        # Während des Ladens invalidiert? Dann das (evtl. veraltete) Ergebnis nicht cachen
+        if user is not None and generation == _user_cache_generation and USER_CACHE_SIZE > 0:
+            _user_cache[user_id] = (user, now + USER_CACHE_TTL)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+
+def invalidate_user_cache(user_id=None):
+    """Entfernt einen User (oder ohne user_id alle) aus dem Cache"""
+    global _user_cache_generation
+    
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
 
 
 def get_user_by_username(username):
     """Lädt User anhand des Usernamens"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users WHERE username = %s', (username,))
-        else:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users WHERE username = ?', (username,))
-        
+        execute_query(cursor, Q_USER_BY_USERNAME, (username,))
         row = cursor.fetchone()
-        
-        if row:
-            if USE_POSTGRES:
-                return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=row[4], is_approved=row[5])
-            else:
-                return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=bool(row[4]), is_approved=bool(row[5]))
-    return None
+    return _row_to_user(row) if row else None
 
 
 def verify_password(username, password):
     """Prüft Passwort und gibt User zurück wenn korrekt und approved"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT id, username, password_hash, pfarrei, email, is_admin, is_approved FROM users WHERE username = %s', (username,))
-        else:
-            cursor.execute('SELECT id, username, password_hash, pfarrei, email, is_admin, is_approved FROM users WHERE username = ?', (username,))
-        
+        execute_query(cursor, Q_USER_LOGIN, (username,))
         row = cursor.fetchone()
     
     if not row:
         return None
     
     # Passwort-Check
-    if bcrypt.checkpw(password.encode('utf-8'), row[2].encode('utf-8')):
-        if USE_POSTGRES:
-            return User(id=row[0], username=row[1], pfarrei=row[3], email=row[4], is_admin=row[5], is_approved=row[6])
-        else:
-            return User(id=row[0], username=row[1], pfarrei=row[3], email=row[4], is_admin=bool(row[5]), is_approved=bool(row[6]))
+    if check_user_password(row[0], row[6], password):
+        return _row_to_user(row)
     
     return None
 
 
+def check_user_password(user_id, password_hash, password):
+    """
+    Prüft das Passwort eines Users. Bei Erfolg wird ein Hash mit zu niedrigem
+    Kosten-Faktor transparent neu erstellt (hochgestuft).
+    """
+    if not check_password(password, password_hash):
+        return False
+    
+    if needs_rehash(password_hash):
+        try:
+            with get_db() as cursor:
+                # Nur ersetzen, wenn der Hash nicht zwischenzeitlich geändert wurde
+                execute_query(cursor, Q_UPDATE_PASSWORD_HASH, (hash_password(password), user_id, password_hash))
+            logger.info(f"Passwort-Hash für User {user_id} auf aktuellen Kosten-Faktor gebracht")
+        except Exception as e:
+            # Login soll am Rehash nicht scheitern
+            logger.error(f"Rehash für User {user_id} fehlgeschlagen: {e}")
+    
+    return True
+
+
 def create_user(username, password, pfarrei, email=None, is_admin=False, is_approved=False):
     """Erstellt einen neuen User mit Passwort-Validierung"""
     # Passwort-Validierung
@@ -287,21 +875,18 @@ def create_user(username, password, pfarrei, email=None, is_admin=False, is_appr
     if not any(c.isdigit() for c in password):
         raise ValueError("Passwort muss mindestens eine Zahl enthalten")
     
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(password)
     
     try:
         with get_db() as cursor:
-            if USE_POSTGRES:
-                cursor.execute('INSERT INTO users (username, password_hash, pfarrei, email, is_admin, is_approved) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id',
-                          (username, password_hash, pfarrei, email, is_admin, is_approved))
-                user_id = cursor.fetchone()[0]
-            else:
-                cursor.execute('INSERT INTO users (username, password_hash, pfarrei, email, is_admin, is_approved) VALUES (?, ?, ?, ?, ?, ?)',
-                          (username, password_hash, pfarrei, email, int(is_admin), int(is_approved)))
-                user_id = cursor.lastrowid
+            execute_query(cursor, Q_CREATE_USER, (username, password_hash, pfarrei, email, bool(is_admin), bool(is_approved)))
+            user_id = cursor.fetchone()[0] if USE_POSTGRES else cursor.lastrowid
             
+            invalidate_user_cache(user_id)
             return User(id=user_id, username=username, pfarrei=pfarrei, email=email, is_admin=is_admin, is_approved=is_approved)
-    except (psycopg2.IntegrityError if USE_POSTGRES else sqlite3.IntegrityError):
+    except Exception as e:
+        if not _is_integrity_error(e):
+            raise
         logger.warning(f"Username {username} existiert bereits")
         return None  # Username existiert bereits
 
@@ -309,51 +894,33 @@ def create_user(username, password, pfarrei, email=None, is_admin=False, is_appr
 def get_all_users():
     """Gibt alle Benutzer zurück (für Admin-Dashboard)"""
     with get_db() as cursor:
-        cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved FROM users ORDER BY id DESC')
+        execute_query(cursor, Q_ALL_USERS)
         rows = cursor.fetchall()
-        
-        if USE_POSTGRES:
-            return [User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=row[4], is_approved=row[5]) for row in rows]
-        else:
-            return [User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=bool(row[4]), is_approved=bool(row[5])) for row in rows]
+    return [_row_to_user(row) for row in rows]
 
 
 def approve_user(user_id):
     """Genehmigt einen Benutzer"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('UPDATE users SET is_approved = TRUE WHERE id = %s', (user_id,))
-        else:
-            cursor.execute('UPDATE users SET is_approved = 1 WHERE id = ?', (user_id,))
+        execute_query(cursor, Q_APPROVE_USER, (user_id,))
+    invalidate_user_cache(user_id)
     logger.info(f"User {user_id} genehmigt")
 
 
 def reject_user(user_id):
     """Löscht einen nicht genehmigten Benutzer"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
-        else:
-            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        execute_query(cursor, Q_DELETE_USER, (user_id,))
+    invalidate_user_cache(user_id)
     logger.info(f"User {user_id} abgelehnt und gelöscht")
 
 
 def get_user_by_email(email):
     """Lädt User anhand der E-Mail"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT id, username, password_hash, pfarrei, email, is_admin, is_approved FROM users WHERE email = %s', (email,))
-        else:
-            cursor.execute('SELECT id, username, password_hash, pfarrei, email, is_admin, is_approved FROM users WHERE email = ?', (email,))
-        
+        execute_query(cursor, Q_USER_BY_EMAIL, (email,))
         row = cursor.fetchone()
-        
-        if row:
-            if USE_POSTGRES:
-                return User(id=row[0], username=row[1], pfarrei=row[3], email=row[4], is_admin=row[5], is_approved=row[6], password_hash=row[2])
-            else:
-                return User(id=row[0], username=row[1], pfarrei=row[3], email=row[4], is_admin=bool(row[5]), is_approved=bool(row[6]), password_hash=row[2])
-    return None
+    return _row_to_user(row, password_hash=row[6]) if row else None
 
 
 def create_reset_token(user_id):
@@ -362,12 +929,8 @@ def create_reset_token(user_id):
     expiry = datetime.now() + timedelta(hours=1)
     
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('UPDATE users SET reset_token = %s, reset_token_expiry = %s WHERE id = %s',
-                      (token, expiry, user_id))
-        else:
-            cursor.execute('UPDATE users SET reset_token = ?, reset_token_expiry = ? WHERE id = ?',
-                      (token, expiry.isoformat(), user_id))
+        # SQLite speichert Zeitpunkte als ISO-Text
+        execute_query(cursor, Q_SET_RESET_TOKEN, (token, expiry if USE_POSTGRES else expiry.isoformat(), user_id))
     
     logger.info(f"Reset-Token erstellt für User {user_id}")
     return token
@@ -376,29 +939,18 @@ def create_reset_token(user_id):
 def get_user_by_reset_token(token):
     """Lädt User anhand des Reset-Tokens (wenn noch gültig)"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved, reset_token_expiry FROM users WHERE reset_token = %s', (token,))
-        else:
-            cursor.execute('SELECT id, username, pfarrei, email, is_admin, is_approved, reset_token_expiry FROM users WHERE reset_token = ?', (token,))
-        
+        execute_query(cursor, Q_USER_BY_RESET_TOKEN, (token,))
         row = cursor.fetchone()
-        
-        if not row:
-            return None
-        
-        # Token-Ablauf prüfen
-        if USE_POSTGRES:
-            expiry = row[6]
-        else:
-            expiry = datetime.fromisoformat(row[6])
-        
-        if datetime.now() > expiry:
-            return None  # Token abgelaufen
-        
-        if USE_POSTGRES:
-            return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=row[4], is_approved=row[5])
-        else:
-            return User(id=row[0], username=row[1], pfarrei=row[2], email=row[3], is_admin=bool(row[4]), is_approved=bool(row[5]))
+    
+    if not row:
+        return None
+    
+    # Token-Ablauf prüfen
+    expiry = row[6] if USE_POSTGRES else datetime.fromisoformat(row[6])
+    if datetime.now() > expiry:
+        return None  # Token abgelaufen
+    
+    return _row_to_user(row)
 
 
 def reset_password(user_id, new_password):
@@ -413,128 +965,502 @@ def reset_password(user_id, new_password):
     if not any(c.isdigit() for c in new_password):
         raise ValueError("Passwort muss mindestens eine Zahl enthalten")
     
-    password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(new_password)
     
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('UPDATE users SET password_hash = %s, reset_token = NULL, reset_token_expiry = NULL WHERE id = %s',
-                      (password_hash, user_id))
-        else:
-            cursor.execute('UPDATE users SET password_hash = ?, reset_token = NULL, reset_token_expiry = NULL WHERE id = ?',
-                      (password_hash, user_id))
+        execute_query(cursor, Q_SET_PASSWORD, (password_hash, user_id))
     
+    invalidate_user_cache(user_id)
     logger.info(f"Passwort zurückgesetzt für User {user_id}")
 
 
 def delete_user_account(user_id):
     """Löscht einen User-Account komplett (DSGVO Art. 17 - Recht auf Löschung)"""
-    with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
-        else:
-            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+    with _flush_lock:
+        _discard_buffered_timerecords(user_id)
+        with get_db() as cursor:
+            execute_query(cursor, Q_DELETE_USER, (user_id,))
     
+    invalidate_user_cache(user_id)
     logger.info(f"User-Account {user_id} gelöscht (DSGVO)")
 
 
 # ============= Zeitaufzeichnungen =============
 
-def save_timerecord(user_id, month_year, form_data):
-    """Speichert oder aktualisiert eine Zeitaufzeichnung"""
-    with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('''
-                INSERT INTO timerecords (user_id, month_year, form_data, updated_at)
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id, month_year)
-                DO UPDATE SET form_data = EXCLUDED.form_data, updated_at = CURRENT_TIMESTAMP
-            ''', (user_id, month_year, form_data))
+# Write-Behind-Puffer für Autosave (opt-in mit TIMERECORD_WRITE_BEHIND_SECONDS > 0):
+# Speicherungen landen zuerst im Speicher (neuester Stand pro User/Monat) und
+# werden gebündelt in einer Transaktion geschrieben. Das Intervall ist das
+# Fenster, in dem bei einem Absturz Änderungen verloren gehen können. Der Puffer
+# gilt pro Prozess - andere Worker sehen gepufferte Stände erst nach dem Flush.
+TIMERECORD_WRITE_BEHIND_SECONDS = float(os.environ.get('TIMERECORD_WRITE_BEHIND_SECONDS', '0'))
+TIMERECORD_WRITE_BEHIND_MAX_PENDING = int(os.environ.get('TIMERECORD_WRITE_BEHIND_MAX_PENDING', '500'))
+
+_write_buffer = {}  # (user_id, month_year) -> gepufferter Stand
+_write_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()  # ein Flush gleichzeitig, Löschen wartet darauf
+_flush_wakeup = threading.Event()
+_flusher_pid = None
+
+
+def _buffer_timerecord(user_id, month_year, form_data, content_hash, if_match):
+    """Legt den neuesten Stand in den Write-Behind-Puffer (Gegenstück zu save_timerecord)"""
+    key = (user_id, month_year)
+    with _write_buffer_lock:
+        entry = _write_buffer.get(key)
+    
+    base = None
+    if entry is None:
+        # Erster gepufferter Stand: Basis ist der Stand in der Datenbank
+        with get_db() as cursor:
+            execute_query(cursor, Q_TIMERECORD_STATE, (user_id, month_year))
+            row = cursor.fetchone()
+        base = {"base_updated_at": str(row[0]), "base_version": row[1], "base_hash": row[2]} if row \
+            else {"base_updated_at": None, "base_version": 0, "base_hash": None}
+    
+    with _write_buffer_lock:
+        entry = _write_buffer.get(key)
+        if entry is not None:
+            base = {name: entry[name] for name in ('base_updated_at', 'base_version', 'base_hash')}
+            current = (entry['updated_at'], entry['version'], entry['content_hash'])
+        else:
+            current = (base['base_updated_at'], base['base_version'], base['base_hash'])
+        
+        if if_match is not None and if_match != current[2]:
+            failed_etag = current[2]
         else:
-            # SQLite: Erst prüfen ob existiert
-            cursor.execute('SELECT id FROM timerecords WHERE user_id = ? AND month_year = ?', (user_id, month_year))
-            existing = cursor.fetchone()
+            failed_etag = False
+            if content_hash == current[2]:
+                return {"updated_at": current[0], "version": current[1], "etag": content_hash, "written": False}
             
-            if existing:
-                cursor.execute('UPDATE timerecords SET form_data = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ? AND month_year = ?',
-                          (form_data, user_id, month_year))
+            if content_hash == base['base_hash']:
+                # Zurück auf den gespeicherten Stand - nichts mehr zu schreiben
+                _write_buffer.pop(key, None)
+                return {"updated_at": base['base_updated_at'], "version": base['base_version'],
+                        "etag": content_hash, "written": False}
+            
+            entry = dict(base, form_data=form_data, content_hash=content_hash,
+                         updated_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                         version=base['base_version'] + 1)
+            _write_buffer[key] = entry
+            _start_flusher()
+            if len(_write_buffer) >= TIMERECORD_WRITE_BEHIND_MAX_PENDING:
+                _flush_wakeup.set()
+    
+    if failed_etag is not False:
+        raise TimerecordPreconditionFailed(failed_etag)
+    return {"updated_at": entry['updated_at'], "version": entry['version'], "etag": content_hash, "written": True}
+
+
+def _buffered_timerecord(user_id, month_year):
+    """Gepufferter (noch nicht geschriebener) Stand oder None"""
+    with _write_buffer_lock:
+        return _write_buffer.get((user_id, month_year))
+
+
+def _is_integrity_error(error):
+    if USE_POSTGRES:
+        import psycopg2
+        return isinstance(error, psycopg2.IntegrityError)
+    return isinstance(error, sqlite3.IntegrityError)
+
+
+def _write_buffered(pending):
+    """
+    Schreibt gepufferte Stände in einer Transaktion, liefert (key, entry, row)-Tripel.
+    
+    Geschrieben wird nur auf den Stand, gegen den der erste gepufferte Write
+    angenommen wurde (base_hash, wie If-Match). Hat ein anderer Worker den
+    Datensatz inzwischen geändert, wird der gepufferte Stand nicht darüber
+    geschrieben, sondern als Konflikt protokolliert und verworfen (row None).
+    """
+    written = []
+    with get_db() as cursor:
+        for (user_id, month_year), entry in pending:
+            if entry['base_hash'] is None:
+                execute_query(cursor, Q_INSERT_TIMERECORD_IF_ABSENT,
+                              (user_id, month_year, entry['form_data'], entry['content_hash']))
+            else:
+                execute_query(cursor, Q_SAVE_TIMERECORD_IF_MATCH,
+                              (entry['form_data'], entry['content_hash'], user_id, month_year,
+                               entry['base_hash'], entry['content_hash']))
+            row = cursor.fetchone()
+            if row is not None:
+                _replace_timerecord_entries(cursor, row[3], user_id, month_year, entry['form_data'])
             else:
-                cursor.execute('INSERT INTO timerecords (user_id, month_year, form_data) VALUES (?, ?, ?)',
-                          (user_id, month_year, form_data))
-    logger.info(f"Zeitaufzeichnung gespeichert für User {user_id}, Monat {month_year}")
+                execute_query(cursor, Q_TIMERECORD_STATE, (user_id, month_year))
+                row = cursor.fetchone()
+                if row is None or row[2] != entry['content_hash']:
+                    # Sonst steht schon genau dieser Stand in der Datenbank
+                    logger.warning(f"Write-Behind-Konflikt für User {user_id}, Monat {month_year}: "
+                                   f"gespeichert {row[2] if row else None}, gepuffert gegen {entry['base_hash']} - "
+                                   f"gepufferter Stand verworfen")
+                    row = None
+            written.append(((user_id, month_year), entry, row))
+    return written
 
 
-def get_timerecord(user_id, month_year):
-    """Lädt eine Zeitaufzeichnung"""
+def flush_timerecords(keys=None):
+    """
+    Schreibt den Write-Behind-Puffer (oder nur die angegebenen Keys) in die Datenbank.
+    
+    Einträge bleiben bis nach dem Commit im Puffer, damit Leser nie einen
+    älteren Stand sehen. Schlägt die gebündelte Transaktion fehl, wird einzeln
+    geschrieben; Einträge gelöschter User (Integrity-Fehler) werden verworfen,
+    alle anderen bleiben für den nächsten Flush gepuffert. Konflikte mit
+    Writes anderer Worker überschreiben nichts (siehe _write_buffered).
+    
+    Returns:
+        int: Anzahl geschriebener Einträge (ohne Konflikte und verworfene)
+    """
+    with _flush_lock:
+        with _write_buffer_lock:
+            pending = [(key, entry) for key, entry in _write_buffer.items() if keys is None or key in keys]
+        if not pending:
+            return 0
+        
+        try:
+            written = _write_buffered(pending)
+        except Exception:
+            written = []
+            for key, entry in pending:
+                try:
+                    written.extend(_write_buffered([(key, entry)]))
+                except Exception as e:
+                    if not _is_integrity_error(e):
+                        continue
+                    logger.warning(f"Gepufferte Zeitaufzeichnung verworfen für User {key[0]}, Monat {key[1]}: {e}")
+                    written.append((key, entry, None))
+        
+        with _write_buffer_lock:
+            for key, entry, row in written:
+                current = _write_buffer.get(key)
+                if current is entry:
+                    del _write_buffer[key]
+                elif current is not None and row is not None:
+                    # Während des Flushs überschrieben: neue Basis ist der gerade geschriebene Stand
+                    current.update(base_updated_at=str(row[0]), base_version=row[1], base_hash=row[2],
+                                   version=row[1] + 1)
+    
+    stored = sum(1 for _, _, row in written if row is not None)
+    logger.info(f"Write-Behind: {stored} von {len(pending)} Zeitaufzeichnungen geschrieben, "
+                f"{len(written) - stored} verworfen")
+    if len(written) < len(pending):
+        raise RuntimeError(f"{len(pending) - len(written)} Zeitaufzeichnungen konnten nicht geschrieben werden")
+    return stored
+
+
+def _flush_timerecord(user_id, month_year):
+    """Schreibt einen gepufferten Stand sofort (vor Patch und Einreichung)"""
+    if _buffered_timerecord(user_id, month_year) is not None:
+        flush_timerecords({(user_id, month_year)})
+
+
+def _discard_buffered_timerecords(user_id, month_year=None):
+    """Verwirft gepufferte Stände (vor dem Löschen, sonst würde der Flush sie wiederherstellen)"""
+    with _write_buffer_lock:
+        for key in [key for key in _write_buffer if key[0] == user_id and month_year in (None, key[1])]:
+            del _write_buffer[key]
+
+
+def _flush_loop():
+    global _flusher_pid
+    
+    while TIMERECORD_WRITE_BEHIND_SECONDS > 0:
+        _flush_wakeup.wait(TIMERECORD_WRITE_BEHIND_SECONDS)
+        _flush_wakeup.clear()
+        try:
+            flush_timerecords()
+        except Exception as e:
+            logger.error(f"Write-Behind-Flush fehlgeschlagen, Daten bleiben gepuffert: {e}")
+    _flusher_pid = None
+
+
+def _start_flusher():
+    """Startet den Flush-Thread einmal pro Prozess (nach fork neu, z.B. gunicorn --preload)"""
+    global _flusher_pid
+    
+    if _flusher_pid != os.getpid():
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name='timerecord-flush', daemon=True).start()
+
+
+@atexit.register
+def _flush_timerecords_on_exit():
+    if _write_buffer:
+        try:
+            flush_timerecords()
+        except Exception as e:
+            logger.error(f"Write-Behind-Flush beim Beenden fehlgeschlagen: {e}")
+
+
+def save_timerecord(user_id, month_year, form_data, if_match=None):
+    """
+    Speichert oder aktualisiert eine Zeitaufzeichnung.
+    
+    Unveränderte Dokumente (gleicher Content-Hash) werden nicht geschrieben.
+    Mit aktivem Write-Behind-Puffer landet der Stand zuerst im Speicher
+    (siehe TIMERECORD_WRITE_BEHIND_SECONDS).
+    
+    Args:
+        if_match: Erwarteter Content-Hash des gespeicherten Stands (If-Match),
+                  verhindert verlorene Updates aus einem zweiten Tab
+    
+    Returns:
+        dict: updated_at, version, etag und written (False wenn unverändert)
+    
+    Raises:
+        TimerecordPreconditionFailed: Gespeicherter Stand passt nicht zu if_match
+    """
+    content_hash = timerecord_hash(form_data)
+    if TIMERECORD_WRITE_BEHIND_SECONDS > 0:
+        return _buffer_timerecord(user_id, month_year, form_data, content_hash, if_match)
+    
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT form_data, updated_at FROM timerecords WHERE user_id = %s AND month_year = %s',
-                      (user_id, month_year))
+        if if_match is None:
+            execute_query(cursor, Q_SAVE_TIMERECORD, (user_id, month_year, form_data, content_hash))
         else:
-            cursor.execute('SELECT form_data, updated_at FROM timerecords WHERE user_id = ? AND month_year = ?',
-                      (user_id, month_year))
-        
+            execute_query(cursor, Q_SAVE_TIMERECORD_IF_MATCH,
+                          (form_data, content_hash, user_id, month_year, if_match, content_hash))
         row = cursor.fetchone()
+        written = row is not None
         
-        if row:
-            return {"form_data": row[0], "updated_at": str(row[1])}
+        if written:
+            _replace_timerecord_entries(cursor, row[3], user_id, month_year, form_data)
+        else:
+            # Nichts geschrieben: unverändert oder Precondition verletzt
+            execute_query(cursor, Q_TIMERECORD_STATE, (user_id, month_year))
+            row = cursor.fetchone()
+    
+    # Außerhalb von get_db: verletzte Precondition ist kein Datenbankfehler
+    if not written and (row is None or row[2] != content_hash):
+        raise TimerecordPreconditionFailed(row[2] if row else None)
+    
+    if written:
+        logger.info(f"Zeitaufzeichnung gespeichert für User {user_id}, Monat {month_year}")
+    return {"updated_at": str(row[0]), "version": row[1], "etag": row[2], "written": written}
+
+
+def get_timerecord(user_id, month_year):
+    """Lädt eine Zeitaufzeichnung (gepufferter Stand hat Vorrang)"""
+    entry = _buffered_timerecord(user_id, month_year)
+    if entry is not None:
+        return {"form_data": entry['form_data'], "updated_at": entry['updated_at'],
+                "version": entry['version'], "etag": entry['content_hash']}
+    
+    with get_db() as cursor:
+        execute_query(cursor, Q_GET_TIMERECORD, (user_id, month_year))
+        row = cursor.fetchone()
+    
+    if row:
+        return {"form_data": row[0], "updated_at": str(row[1]), "version": row[2],
+                "etag": row[3] or timerecord_hash(row[0])}
     return None
 
 
 def get_all_timerecords(user_id):
     """Lädt alle Zeitaufzeichnungen eines Users"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('SELECT month_year, form_data, updated_at FROM timerecords WHERE user_id = %s ORDER BY month_year DESC',
-                      (user_id,))
-        else:
-            cursor.execute('SELECT month_year, form_data, updated_at FROM timerecords WHERE user_id = ? ORDER BY month_year DESC',
-                      (user_id,))
-        
+        execute_query(cursor, Q_ALL_TIMERECORDS, (user_id,))
         rows = cursor.fetchall()
-        return [{"month_year": row[0], "form_data": row[1], "updated_at": str(row[2])} for row in rows]
+    records = {row[0]: {"month_year": row[0], "form_data": row[1], "updated_at": str(row[2]), "version": row[3]}
+               for row in rows}
+    
+    # Gepufferte Stände überlagern die Datenbank
+    with _write_buffer_lock:
+        buffered = [(key[1], entry) for key, entry in _write_buffer.items() if key[0] == user_id]
+    if not buffered:
+        return list(records.values())
+    for month_year, entry in buffered:
+        records[month_year] = {"month_year": month_year, "form_data": entry['form_data'],
+                               "updated_at": entry['updated_at'], "version": entry['version']}
+    return sorted(records.values(), key=lambda record: record['month_year'], reverse=True)
+
+
+class TimerecordConflict(Exception):
+    """Zeitaufzeichnung konnte nicht gepatcht werden (z.B. ungültiges gespeichertes Dokument)"""
+    pass
+
+
+class TimerecordPreconditionFailed(Exception):
+    """Gespeicherter Stand entspricht nicht dem erwarteten ETag (If-Match)"""
+    
+    def __init__(self, current_etag):
+        super().__init__("Zeitaufzeichnung wurde zwischenzeitlich geändert")
+        self.current_etag = current_etag
+
+
+def patch_timerecord(user_id, month_year, patch, if_match=None, max_attempts=5):
+    """
+    Wendet einen JSON Merge Patch (RFC 7396) auf form_data an, Listenfelder
+    auch eintragsweise (utils.apply_form_patch).
+    
+    Optimistisch in einer Transaktion: Lesen, Patch anwenden, nur schreiben
+    wenn die Version unverändert ist - sonst erneut lesen.
+    
+    Args:
+        if_match: Erwarteter Content-Hash des gespeicherten Stands (optional)
+    
+    Returns:
+        dict: Neuer Stand mit form_data, updated_at, version, etag und written
+              (None, wenn es noch keine Zeitaufzeichnung gibt)
+    
+    Raises:
+        TimerecordConflict: Gespeichertes Dokument ist kein JSON-Objekt oder
+                            die Version ändert sich dauernd
+        TimerecordPreconditionFailed: Gespeicherter Stand passt nicht zu if_match
+    """
+    _flush_timerecord(user_id, month_year)
+    
+    with get_db() as cursor:
+        for _ in range(max_attempts):
+            execute_query(cursor, Q_GET_TIMERECORD, (user_id, month_year))
+            row = cursor.fetchone()
+            
+            if row is None:
+                # Ohne Basisdokument wäre das Ergebnis unvollständig - Client speichert dann vollständig
+                return None
+            
+            stored_form_data, updated_at, version, stored_hash = row
+            stored_hash = stored_hash or timerecord_hash(stored_form_data)
+            if if_match is not None and if_match != stored_hash:
+                raise TimerecordPreconditionFailed(stored_hash)
+            
+            try:
+                stored = json.loads(stored_form_data)
+            except (TypeError, ValueError):
+                stored = None
+            if not isinstance(stored, dict):
+                raise TimerecordConflict("Gespeicherte Daten sind kein JSON-Objekt")
+            
+            document = apply_form_patch(stored, patch)
+            if document == stored:
+                # Patch ändert nichts - kein Schreibzugriff
+                return {"form_data": stored_form_data, "updated_at": str(updated_at), "version": version,
+                        "etag": stored_hash, "written": False}
+            
+            form_data = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+            execute_query(cursor, Q_UPDATE_TIMERECORD_IF_VERSION,
+                          (form_data, timerecord_hash(form_data), user_id, month_year, version))
+            result = cursor.fetchone()
+            
+            if result is not None:
+                _replace_timerecord_entries(cursor, result[3], user_id, month_year, form_data)
+                logger.info(f"Zeitaufzeichnung gepatcht für User {user_id}, Monat {month_year} (Version {result[1]})")
+                return {"form_data": form_data, "updated_at": str(result[0]), "version": result[1],
+                        "etag": result[2], "written": True}
+    
+    raise TimerecordConflict("Zeitaufzeichnung wird gerade parallel geändert")
 
 
 def delete_timerecord(user_id, month_year):
     """Löscht eine Zeitaufzeichnung"""
-    with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('DELETE FROM timerecords WHERE user_id = %s AND month_year = %s', (user_id, month_year))
-        else:
-            cursor.execute('DELETE FROM timerecords WHERE user_id = ? AND month_year = ?', (user_id, month_year))
+    with _flush_lock:
+        _discard_buffered_timerecords(user_id, month_year)
+        with get_db() as cursor:
+            execute_query(cursor, Q_DELETE_TIMERECORD, (user_id, month_year))
     logger.info(f"Zeitaufzeichnung gelöscht für User {user_id}, Monat {month_year}")
 
 
 def submit_timerecord(user_id, month_year, form_data):
-    """Erstellt eine neue Submission (Einreichung)"""
+    """Erstellt eine neue Submission (Einreichung) inkl. extrahierter Metadaten und Suchindex"""
+    # Einreichung macht den Entwurf dauerhaft
+    _flush_timerecord(user_id, month_year)
+    meta = extract_submission_metadata(form_data)
+    values = (user_id, month_year, form_data, meta['vorname'], meta['nachname'], meta['taetigkeit'],
+              meta['kirchengemeinde'], meta['gottesdienste_count'], meta['arbeitszeiten_count'])
+    
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('''INSERT INTO submissions (user_id, month_year, form_data, submitted_at) 
-                         VALUES (%s, %s, %s, NOW())''', (user_id, month_year, form_data))
-        else:
-            cursor.execute('''INSERT INTO submissions (user_id, month_year, form_data, submitted_at) 
-                         VALUES (?, ?, ?, datetime('now'))''', (user_id, month_year, form_data))
+        execute_query(cursor, Q_INSERT_SUBMISSION, values)
+        submission_id = cursor.fetchone()[0] if USE_POSTGRES else cursor.lastrowid
+        execute_query(cursor, Q_USER_CONTACT, (user_id,))
+        
+        username, email = cursor.fetchone() or (None, None)
+        _index_submission_search(cursor, submission_id, build_search_document(username, email, meta))
+        _insert_entries(cursor, user_id, month_year, form_data, submission_id=submission_id)
+        _apply_summary_delta(cursor, user_id, month_year, form_data)
     logger.info(f"Zeitaufzeichnung eingereicht von User {user_id}, Monat {month_year}")
+    return submission_id
+
+
+# Sortierungen für die Admin-Übersicht (Whitelist, da ORDER BY nicht parametrisierbar ist)
+SUBMISSION_SORT_ORDERS = {
+    'date_desc': 's.submitted_at DESC, s.id DESC',
+    'date_asc': 's.submitted_at ASC, s.id ASC',
+    'name': 's.nachname, s.vorname, s.submitted_at DESC',
+    'month': 's.month_year ASC, s.submitted_at DESC',
+}
+
+
+def _build_submission_filters(search='', month='', taetigkeit=''):
+    """Baut WHERE-Klausel und Parameter für die Submission-Filter"""
+    ph = '%s' if USE_POSTGRES else '?'
+    clauses = []
+    params = []
+
+    if search:
+        # Volltextsuche mit Präfix-Match pro Suchbegriff (alle Begriffe müssen passen)
+        tokens = _search_tokens(search)
+        if not tokens:
+            clauses.append('1 = 0')
+        elif USE_POSTGRES:
+            clauses.append(f"s.search_vector @@ to_tsquery('simple', {ph})")
+            params.append(' & '.join(f"{token}:*" for token in tokens))
+        else:
+            clauses.append(f"s.id IN (SELECT rowid FROM submissions_fts WHERE submissions_fts MATCH {ph})")
+            params.append(' AND '.join(f'"{token}"*' for token in tokens))
+
+    if month:
+        clauses.append(f"s.month_year = {ph}")
+        params.append(month)
+
+    if taetigkeit:
+        clauses.append(f"s.taetigkeit = {ph}")
+        params.append(taetigkeit)
+
+    return clauses, params
+
+
+def _where(clauses):
+    """Verbindet Filter-Klauseln zu einer WHERE-Klausel"""
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
 
+def query_submissions(search='', month='', taetigkeit='', sort='date_desc', page=1, per_page=20):
+    """
+    Lädt eine Seite eingereichter Zeitaufzeichnungen für die Admin-Übersicht.
+
+    Filter, Sortierung und Pagination laufen komplett in der Datenbank,
+    es wird nie die ganze Tabelle geladen.
+
+    Returns:
+        dict: submissions (nur die angefragte Seite), total, page, total_pages
+    """
+    ph = '%s' if USE_POSTGRES else '?'
+    clauses, params = _build_submission_filters(search, month, taetigkeit)
+    where = _where(clauses)
+    order_by = SUBMISSION_SORT_ORDERS.get(sort, SUBMISSION_SORT_ORDERS['date_desc'])
 
-def get_all_submitted_timerecords():
-    """Lädt alle eingereichten Zeitaufzeichnungen für Admin"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('''SELECT s.id, s.user_id, u.username, u.email, s.month_year, 
-                                s.form_data, s.submitted_at
+        cursor.execute(f'''SELECT COUNT(*)
                          FROM submissions s
                          JOIN users u ON s.user_id = u.id
-                         ORDER BY s.submitted_at DESC''')
-        else:
-            cursor.execute('''SELECT s.id, s.user_id, u.username, u.email, s.month_year, 
+                         {where}''', params)
+        total = cursor.fetchone()[0]
+
+        total_pages = (total + per_page - 1) // per_page
+        page = max(1, min(page, total_pages))
+
+        cursor.execute(f'''SELECT s.id, s.user_id, u.username, u.email, s.month_year,
                                 s.form_data, s.submitted_at
                          FROM submissions s
                          JOIN users u ON s.user_id = u.id
-                         ORDER BY s.submitted_at DESC''')
-        
+                         {where}
+                         ORDER BY {order_by}
+                         LIMIT {ph} OFFSET {ph}''', params + [per_page, (page - 1) * per_page])
         rows = cursor.fetchall()
-        
-        return [{
+
+    return {
+        "submissions": [{
             "id": row[0],
             "user_id": row[1],
             "username": row[2],
@@ -542,153 +1468,293 @@ def get_all_submitted_timerecords():
             "month_year": row[4],
             "form_data": row[5],
             "submitted_at": str(row[6])
-        } for row in rows]
+        } for row in rows],
+        "total": total,
+        "page": page,
+        "total_pages": total_pages,
+    }
 
 
-def delete_submission(submission_id):
-    """Löscht eine eingereichte Zeitaufzeichnung"""
+def _submission_cursor_key(row):
+    """Keyset-Schlüssel (submitted_at, id) einer Submission-Zeile"""
+    submitted_at = row[6]
+    if hasattr(submitted_at, 'isoformat'):
+        submitted_at = submitted_at.isoformat()
+    return [submitted_at, row[0]]
+
+
+def get_submissions_by_cursor(cursor_key=None, direction='next', limit=20, search='', month='', taetigkeit=''):
+    """
+    Lädt Submissions per Keyset-Pagination über (submitted_at, id).
+    
+    Im Gegensatz zu OFFSET bleiben die Kosten pro Seite konstant, egal wie
+    weit geblättert wird: der Zeilenwert-Vergleich (submitted_at, id) < (?, ?)
+    ist ein Range-Scan über idx_submissions_submitted_at_id (PostgreSQL und
+    SQLite >= 3.15), anders als eine OR-Bedingung.
+    
+    Args:
+        cursor_key: [submitted_at, id] der Grenz-Zeile oder None für die erste Seite
+        direction: 'next' (ältere Einträge) oder 'prev' (neuere Einträge)
+        limit: Anzahl Einträge pro Seite
+    
+    Returns:
+        dict: submissions, next_key, prev_key (None wenn keine weitere Seite)
+    """
+    ph = '%s' if USE_POSTGRES else '?'
+    clauses, params = _build_submission_filters(search, month, taetigkeit)
+    backwards = direction == 'prev' and cursor_key is not None
+    
+    if cursor_key is not None:
+        op = '>' if backwards else '<'
+        clauses.append(f"(s.submitted_at, s.id) {op} ({ph}, {ph})")
+        params += [cursor_key[0], cursor_key[1]]
+    
+    order = 'ASC' if backwards else 'DESC'
+    
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('DELETE FROM submissions WHERE id = %s', (submission_id,))
-        else:
-            cursor.execute('DELETE FROM submissions WHERE id = ?', (submission_id,))
-    logger.info(f"Submission {submission_id} gelöscht")
+        cursor.execute(f'''SELECT s.id, s.user_id, u.username, u.email, s.month_year,
+                                s.form_data, s.submitted_at, s.vorname, s.nachname, s.taetigkeit,
+                                s.kirchengemeinde, s.gottesdienste_count, s.arbeitszeiten_count
+                         FROM submissions s
+                         JOIN users u ON s.user_id = u.id
+                         {_where(clauses)}
+                         ORDER BY s.submitted_at {order}, s.id {order}
+                         LIMIT {ph}''', params + [limit + 1])
+        rows = cursor.fetchall()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    
+    if backwards:
+        next_key = _submission_cursor_key(rows[-1]) if rows else None
+        prev_key = _submission_cursor_key(rows[0]) if rows and has_more else None
+    else:
+        next_key = _submission_cursor_key(rows[-1]) if rows and has_more else None
+        prev_key = _submission_cursor_key(rows[0]) if rows and cursor_key is not None else None
+    
+    return {
+        "submissions": [{
+            "id": row[0],
+            "user_id": row[1],
+            "username": row[2],
+            "email": row[3],
+            "month_year": row[4],
+            "form_data": row[5],
+            "submitted_at": str(row[6]),
+            "vorname": row[7],
+            "nachname": row[8],
+            "taetigkeit": row[9],
+            "kirchengemeinde": row[10],
+            "gottesdienste_count": row[11],
+            "arbeitszeiten_count": row[12]
+        } for row in rows],
+        "next_key": next_key,
+        "prev_key": prev_key,
+    }
 
 
-def init_profile_table():
-    """Erstellt die Profile-Tabelle, falls nicht vorhanden"""
-    conn = get_db_connection()
-    c = conn.cursor()
+def get_submission_filter_options():
+    """Lädt verfügbare Monate und Tätigkeiten für die Filter der Admin-Übersicht"""
+    with get_db() as cursor:
+        execute_query(cursor, Q_SUBMISSION_MONTHS)
+        months = [row[0] for row in cursor.fetchall() if row[0]]
+        
+        execute_query(cursor, Q_SUBMISSION_TAETIGKEITEN)
+        taetigkeiten = [row[0] for row in cursor.fetchall()]
+    
+    return months, taetigkeiten
+
+
+def get_submissions_for_month(month_year):
+    """Lädt alle Submissions eines Monats (für den Massen-Export), sortiert nach Name"""
+    with get_db() as cursor:
+        execute_query(cursor, Q_SUBMISSIONS_FOR_MONTH, (month_year,))
+        rows = cursor.fetchall()
+    
+    return [{'id': row[0], 'form_data': row[1]} for row in rows]
+
+
+ENTRY_COLUMNS = ['user_id', 'month_year', 'timerecord_id', 'submission_id', 'kind',
+                 'entry_date', 'kirchort', 'beginn', 'ende', 'satz', 'minutes']
+
+
+def get_timerecord_entries(user_id=None, kirchort='', kind='', date_from='', date_to='',
+                           submitted=True, limit=1000):
+    """
+    Lädt Gottesdienst-/Arbeitszeit-Einträge über die Indizes auf
+    (user_id, entry_date) bzw. (kirchort, entry_date).
+    
+    Args:
+        submitted: True = eingereichte Einträge, False = Entwürfe
+        date_from/date_to: "YYYY-MM-DD", jeweils inklusive
+    
+    Returns:
+        list: dicts mit den Spalten aus ENTRY_COLUMNS, sortiert nach Datum und Beginn
+    """
+    ph = '%s' if USE_POSTGRES else '?'
+    clauses = ['submission_id IS NOT NULL' if submitted else 'timerecord_id IS NOT NULL']
+    params = []
+    
+    for column, value in (('user_id', user_id), ('kirchort', kirchort), ('kind', kind)):
+        if value:
+            clauses.append(f"{column} = {ph}")
+            params.append(value)
+    if date_from:
+        clauses.append(f"entry_date >= {ph}")
+        params.append(date_from)
+    if date_to:
+        clauses.append(f"entry_date <= {ph}")
+        params.append(date_to)
+    
+    with get_db() as cursor:
+        cursor.execute(f'''SELECT {', '.join(ENTRY_COLUMNS)} FROM timerecord_entries
+                         {_where(clauses)}
+                         ORDER BY entry_date, beginn, id LIMIT {ph}''', params + [limit])
+        rows = cursor.fetchall()
+    
+    entries = []
+    for row in rows:
+        entry = dict(zip(ENTRY_COLUMNS, row))
+        entry['entry_date'] = str(entry['entry_date']) if entry['entry_date'] else None
+        entry['satz'] = float(entry['satz']) if entry['satz'] is not None else None
+        entries.append(entry)
+    return entries
+
+
+def get_yearly_report(year, user_id=None):
+    """
+    Jahresreport aus monthly_summaries (ein Index-Scan über year, keine Submission wird geparst).
+    
+    Returns:
+        dict: rows (eine Zeile pro User/Monat/Tätigkeit/Kirchengemeinde),
+              employees (Summen pro User) und total (Summe über alle)
+    """
+    ph = '%s' if USE_POSTGRES else '?'
+    clauses = [f"m.year = {ph}"]
+    params = [year]
+    if user_id:
+        clauses.append(f"m.user_id = {ph}")
+        params.append(user_id)
+    
+    columns = ', '.join(f"m.{column}" for column in SUMMARY_COLUMNS)
+    with get_db() as cursor:
+        cursor.execute(f'''SELECT m.user_id, u.username, m.month_year, m.taetigkeit, m.kirchengemeinde, {columns}
+                         FROM monthly_summaries m
+                         JOIN users u ON u.id = m.user_id
+                         {_where(clauses)}
+                         ORDER BY m.user_id, m.month_year, m.taetigkeit, m.kirchengemeinde''', params)
+        rows = cursor.fetchall()
+    
+    report_rows = []
+    employees = {}
+    total = dict.fromkeys(SUMMARY_COLUMNS, 0)
+    for row in rows:
+        values = dict(zip(SUMMARY_COLUMNS, row[5:]))
+        values['satz_total'] = float(values['satz_total'])
+        report_rows.append({'user_id': row[0], 'username': row[1], 'month_year': row[2],
+                            'taetigkeit': row[3], 'kirchengemeinde': row[4], **values})
+        
+        employee = employees.setdefault(row[0], dict({'user_id': row[0], 'username': row[1]},
+                                                     **dict.fromkeys(SUMMARY_COLUMNS, 0)))
+        for column in SUMMARY_COLUMNS:
+            employee[column] += values[column]
+            total[column] += values[column]
+    
+    for summary in list(employees.values()) + [total]:
+        summary['satz_total'] = round(summary['satz_total'], 2)
+        summary['hours'] = round(summary['minutes'] / 60, 2)
+    return {'rows': report_rows, 'employees': list(employees.values()), 'total': total}
+
+
+# Zeilen pro Roundtrip beim Export (PostgreSQL: itersize des Server-Cursors, SQLite: fetchmany)
+EXPORT_FETCH_SIZE = 2000
+
+EXPORT_COLUMNS = ['Submission-ID', 'Eingereicht am', 'Benutzer', 'Monat/Jahr', 'Vorname', 'Nachname',
+                  'Tätigkeit', 'Kirchengemeinde', 'Art', 'Datum', 'Kirchort', 'Beginn', 'Ende', 'Satz', 'Minuten']
+
+
+def iter_submission_export(search='', month='', taetigkeit='', fetch_size=EXPORT_FETCH_SIZE):
+    """
+    Liefert Submissions mit den Admin-Filtern als Zeilen für den Export,
+    eine Zeile pro Eintrag (Submissions ohne Einträge mit leeren Eintrags-Spalten).
+    
+    Die Zeilen werden blockweise gelesen (PostgreSQL: benannter Server-Cursor,
+    SQLite: fetchmany auf eigener Verbindung), der Speicherbedarf hängt nicht
+    von der Anzahl der Zeilen ab. Der Generator hält die Verbindung, bis er
+    erschöpft oder geschlossen ist.
+    
+    Yields:
+        tuple: Werte in der Reihenfolge von EXPORT_COLUMNS
+    """
+    clauses, params = _build_submission_filters(search, month, taetigkeit)
+    sql = f'''SELECT s.id, s.submitted_at, u.username, s.month_year, s.vorname, s.nachname, s.taetigkeit,
+                     s.kirchengemeinde, e.kind, e.entry_date, e.kirchort, e.beginn, e.ende, e.satz, e.minutes
+              FROM submissions s
+              JOIN users u ON u.id = s.user_id
+              LEFT JOIN timerecord_entries e ON e.submission_id = s.id
+              {_where(clauses)}
+              ORDER BY s.id, e.id'''
     
     if USE_POSTGRES:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS profiles (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL UNIQUE,
-                vorname VARCHAR(255),
-                nachname VARCHAR(255),
-                geburtsdatum DATE,
-                personalnummer VARCHAR(255),
-                einsatzort VARCHAR(255),
-                gkz VARCHAR(255),
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
+        conn = get_db_connection()
+        try:
+            # Benannter Cursor: Ergebnis bleibt auf dem Server, geholt werden je itersize Zeilen
+            with conn.cursor(name=f'submission_export_{secrets.token_hex(4)}') as cursor:
+                cursor.itersize = fetch_size
+                cursor.execute(sql, params)
+                yield from cursor
+        finally:
+            conn.rollback()
+            release_db_connection(conn)
     else:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL UNIQUE,
-                vorname TEXT,
-                nachname TEXT,
-                geburtsdatum TEXT,
-                personalnummer TEXT,
-                einsatzort TEXT,
-                gkz TEXT,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-    
-    conn.commit()
-    
-    # Migration: Alte Spalten umbenennen/neue hinzufügen falls Tabelle bereits existiert
-    try:
-        if USE_POSTGRES:
-            # Prüfe ob alte Spalten existieren und migriere
-            c.execute("""
-                SELECT column_name FROM information_schema.columns 
-                WHERE table_name='profiles' AND column_name='kirchengemeinde'
-            """)
-            if c.fetchone():
-                # Alte Spalten löschen, neue hinzufügen
-                c.execute("ALTER TABLE profiles DROP COLUMN IF EXISTS kirchengemeinde")
-                c.execute("ALTER TABLE profiles DROP COLUMN IF EXISTS taetigkeit")
-                c.execute("ALTER TABLE profiles ADD COLUMN IF NOT EXISTS personalnummer VARCHAR(255)")
-                c.execute("ALTER TABLE profiles ADD COLUMN IF NOT EXISTS einsatzort VARCHAR(255)")
-                c.execute("ALTER TABLE profiles ADD COLUMN IF NOT EXISTS gkz VARCHAR(255)")
-                conn.commit()
-        else:
-            # SQLite: Prüfe ob alte Spalten existieren
-            c.execute("PRAGMA table_info(profiles)")
-            columns = [row[1] for row in c.fetchall()]
-            if 'kirchengemeinde' in columns:
-                # SQLite unterstützt kein DROP COLUMN vor Version 3.35.0
-                # Erstelle neue Tabelle und kopiere Daten
-                c.execute('''
-                    CREATE TABLE profiles_new (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL UNIQUE,
-                        vorname TEXT,
-                        nachname TEXT,
-                        geburtsdatum TEXT,
-                        personalnummer TEXT,
-                        einsatzort TEXT,
-                        gkz TEXT,
-                        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                ''')
-                c.execute('''
-                    INSERT INTO profiles_new (user_id, vorname, nachname, geburtsdatum, updated_at)
-                    SELECT user_id, vorname, nachname, geburtsdatum, updated_at FROM profiles
-                ''')
-                c.execute('DROP TABLE profiles')
-                c.execute('ALTER TABLE profiles_new RENAME TO profiles')
-                conn.commit()
-    except Exception as e:
-        print(f"Migration Warnung (kann ignoriert werden wenn Tabelle neu ist): {e}")
-        conn.rollback()
-    
-    conn.close()
+        # Eigene Verbindung: der Lese-Snapshot lebt so lange wie der Download
+        conn = _open_sqlite_connection(DATABASE)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+
+def delete_submission(submission_id):
+    """Löscht eine eingereichte Zeitaufzeichnung"""
+    with get_db() as cursor:
+        execute_query(cursor, Q_DELETE_SUBMISSION, (submission_id,))
+        deleted = cursor.fetchone()
+        if deleted is not None:
+            _apply_summary_delta(cursor, deleted[0], deleted[1], deleted[2], sign=-1)
+        if not USE_POSTGRES:
+            execute_query(cursor, Q_DELETE_SUBMISSION_FTS, (submission_id,))
+    logger.info(f"Submission {submission_id} gelöscht")
 
 
 def get_profile(user_id):
     """Lädt Profildaten eines Users"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('''SELECT vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz 
-                         FROM profiles WHERE user_id = %s''', (user_id,))
-        else:
-            cursor.execute('''SELECT vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz 
-                         FROM profiles WHERE user_id = ?''', (user_id,))
-        
+        execute_query(cursor, Q_GET_PROFILE, (user_id,))
         row = cursor.fetchone()
-        
-        if row:
-            return {
-                'vorname': row[0] or '',
-                'nachname': row[1] or '',
-                'geburtsdatum': row[2] or '',
-                'personalnummer': row[3] or '',
-                'einsatzort': row[4] or '',
-                'gkz': row[5] or ''
-            }
+    
+    if row:
+        return {
+            'vorname': row[0] or '',
+            'nachname': row[1] or '',
+            'geburtsdatum': row[2] or '',
+            'personalnummer': row[3] or '',
+            'einsatzort': row[4] or '',
+            'gkz': row[5] or ''
+        }
     return {}
 
 
 def save_profile(user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz):
     """Speichert oder aktualisiert Profildaten"""
     with get_db() as cursor:
-        if USE_POSTGRES:
-            cursor.execute('''
-                INSERT INTO profiles (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-                ON CONFLICT (user_id) 
-                DO UPDATE SET 
-                    vorname = EXCLUDED.vorname,
-                    nachname = EXCLUDED.nachname,
-                    geburtsdatum = EXCLUDED.geburtsdatum,
-                    personalnummer = EXCLUDED.personalnummer,
-                    einsatzort = EXCLUDED.einsatzort,
-                    gkz = EXCLUDED.gkz,
-                    updated_at = NOW()
-            ''', (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz))
-        else:
-            cursor.execute('''
-                INSERT OR REPLACE INTO profiles (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
-            ''', (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz))
+        execute_query(cursor, Q_SAVE_PROFILE, (user_id, vorname, nachname, geburtsdatum, personalnummer, einsatzort, gkz))
     
     logger.info(f"Profil gespeichert für User {user_id}")
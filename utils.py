@@ -4,7 +4,12 @@
 Utility-Funktionen für die Zeitaufzeichnung-App
 """
 
+import io
 import re
+import csv
+import json
+import base64
+import binascii
 from datetime import date
 
 
@@ -85,3 +90,135 @@ def format_date_german(date_str: str) -> str:
         return f"{datum_obj.day} {monate[datum_obj.month - 1]} {datum_obj.year}"
     except Exception:
         return date_str
+
+
+def encode_cursor(values) -> str:
+    """
+    Kodiert Keyset-Werte (z.B. submitted_at, id) als opaken URL-sicheren Cursor.
+    
+    Args:
+        values: JSON-serialisierbare Liste/Tuple
+    
+    Returns:
+        str: Base64-URL-kodierter Cursor ohne Padding
+    """
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Dekodiert einen mit encode_cursor erzeugten Cursor.
+    
+    Raises:
+        ValueError: Bei ungültigem Cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Ungültiger Cursor: {cursor}") from e
+    
+    if not isinstance(values, list):
+        raise ValueError(f"Ungültiger Cursor: {cursor}")
+    return values
+
+
+def apply_merge_patch(target, patch):
+    """
+    Wendet einen JSON Merge Patch (RFC 7396) an.
+    
+    Objekte werden rekursiv zusammengeführt, null löscht einen Schlüssel,
+    alle anderen Werte (auch Listen) ersetzen den bisherigen Wert.
+    
+    Args:
+        target: Bisheriges Dokument (wird nicht verändert)
+        patch: Merge Patch
+    
+    Returns:
+        Neues Dokument
+    """
+    if not isinstance(patch, dict):
+        return patch
+    
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+# Listen im Formular (JSON-Strings). Im Merge Patch darf statt des Strings ein
+# Objekt pro Eintrag stehen (Schlüssel: Eintrags-id, ohne id "#<Position>",
+# wie entryKey in static/lib/storage.js) - eine Änderung überträgt nur diesen Eintrag.
+FORM_LIST_FIELDS = ('_gottesdienste_list', '_arbeitszeiten_list')
+
+# Versteckte Formularfelder mit derselben Liste; im Patch nicht enthalten, sondern nachgezogen
+FORM_LIST_MIRRORS = {'_gottesdienste_list': 'Gottesdienste', '_arbeitszeiten_list': 'Arbeitszeiten'}
+
+
+def keyed_entries(value) -> dict:
+    """Liste aus dem Formular (JSON-String) als {Schlüssel: Eintrag} in Listenreihenfolge"""
+    try:
+        entries = json.loads(value) if isinstance(value, str) else value
+    except ValueError:
+        entries = None
+    if not isinstance(entries, list):
+        return {}
+    return {str(entry['id']) if isinstance(entry, dict) and entry.get('id') else f'#{index}': entry
+            for index, entry in enumerate(entries)}
+
+
+def apply_form_patch(form_data: dict, patch):
+    """
+    Merge Patch auf Formulardaten; Listenfelder auch eintragsweise adressiert.
+    
+    Bleibende Einträge behalten ihre Position, neue werden angehängt. Das
+    Ergebnis enthält die Listen wie gespeichert wieder als JSON-String; die
+    Spiegelfelder (FORM_LIST_MIRRORS) werden daraus neu aufgebaut, wenn der
+    Patch sie nicht selbst mitbringt.
+    """
+    if not isinstance(patch, dict):
+        return apply_merge_patch(form_data, patch)
+    
+    keyed = {name for name in FORM_LIST_FIELDS if isinstance(patch.get(name), dict)}
+    target = dict(form_data) if isinstance(form_data, dict) else {}
+    for name in keyed:
+        target[name] = keyed_entries(target.get(name))
+    
+    result = apply_merge_patch(target, patch)
+    for name in keyed:
+        if name in result:
+            result[name] = json.dumps(list(result[name].values()), ensure_ascii=False, separators=(',', ':'))
+    for name, mirror in FORM_LIST_MIRRORS.items():
+        if name in patch and mirror not in patch:
+            result[mirror] = result.get(name, '[]')
+    return result
+
+
+def iter_csv(header, rows, chunk_rows: int = 500):
+    """
+    Erzeugt CSV stückweise aus einem Zeilen-Iterator (für Streaming-Responses).
+    
+    Args:
+        header: Spaltenüberschriften
+        rows: Iterator über Zeilen (Sequenzen von Werten)
+        chunk_rows: Zeilen pro erzeugtem Block
+    
+    Yields:
+        str: CSV-Blöcke, der erste enthält die Überschriften
+    """
+    buffer = io.StringIO(newline='')
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    
+    for count, row in enumerate(rows, 1):
+        writer.writerow(['' if value is None else value for value in row])
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
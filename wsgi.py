@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI-Einstieg: erzeugt die App einmal pro Worker-Prozess
+
+Start:
+    gunicorn wsgi:app
+"""
+
+from zeitaufzeichnungWeb import create_app
+
+app = create_app()
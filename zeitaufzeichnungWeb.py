@@ -1,89 +1,201 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+_IMPORT_STARTED = time.perf_counter()  # Basis für den Kaltstart-Report
+
 import logging
-from flask import Flask, render_template, request, send_file, redirect, url_for, flash, make_response
+import threading
+from flask import Flask, render_template, request, send_file, redirect, url_for, flash, make_response, Response, g
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_wtf.csrf import CSRFProtect
-import bcrypt
 from datetime import date
 import re
-import tempfile
+import io
 import os
 
-from pdf_service import create_pdf
+from pdf_service import create_pdf, stream_pdf_zip
 from mail_service import send_pdf_mail, send_csv_mail, send_reset_mail
-from users import init_db, init_timerecords_table, init_submissions_table, init_profile_table, get_user_by_id, get_user_by_username, verify_password, create_user, get_all_users, approve_user, reject_user, get_user_by_email, create_reset_token, get_user_by_reset_token, reset_password, delete_user_account, save_timerecord, get_timerecord, get_all_timerecords, delete_timerecord, submit_timerecord, get_all_submitted_timerecords, delete_submission, get_profile, save_profile
-from utils import generate_filename
+from schema import ensure_schema
+from db_pool import DatabaseUnavailable
+from passwords import PasswordHashTimeout, start_calibration
+from users import get_user_by_id_cached, get_user_by_username, verify_password, check_user_password, create_user, get_all_users, approve_user, reject_user, get_user_by_email, create_reset_token, get_user_by_reset_token, reset_password, delete_user_account, save_timerecord, patch_timerecord, TimerecordConflict, TimerecordPreconditionFailed, get_timerecord, get_all_timerecords, delete_timerecord, submit_timerecord, query_submissions, get_submissions_by_cursor, get_submission_filter_options, get_submissions_for_month, get_timerecord_entries, get_yearly_report, iter_submission_export, EXPORT_COLUMNS, delete_submission, get_profile, save_profile, get_db, db_pool_stats
+from utils import generate_filename, encode_cursor, decode_cursor, iter_csv
+from ratelimit_storage import default_storage_uri  # registriert sqlite:// bei limits
 import csv
 import json
 
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-# Logging konfigurieren
-log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
-logging.basicConfig(
-    level=getattr(logging, log_level, logging.INFO),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Console output
-        logging.FileHandler('app.log') if not os.environ.get('RENDER') else logging.StreamHandler()
-    ]
-)
-
-# Secret Key: MUSS in Production gesetzt sein!
-IS_PRODUCTION = bool(os.environ.get('DATABASE_URL'))
-secret_key = os.environ.get("FLASK_SECRET_KEY") or os.environ.get("SECRET_KEY")
-
-if IS_PRODUCTION and not secret_key:
-    raise RuntimeError(
-        "FATAL: SECRET_KEY oder FLASK_SECRET_KEY muss in Production gesetzt sein!\n"
-        "Die App startet nicht ohne sicheren Secret Key."
-    )
-
-app.secret_key = secret_key or "dev-secret-only-for-local-development"
-logging.info(f"App läuft im {'PRODUCTION' if IS_PRODUCTION else 'DEVELOPMENT'} Modus")
-
-# Sichere Session-Einstellungen
-app.config['SESSION_COOKIE_SECURE'] = True  # Nur über HTTPS (in Production)
-app.config['SESSION_COOKIE_HTTPONLY'] = True  # Kein JavaScript-Zugriff
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # CSRF-Schutz
-app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 Stunde
-
-# CSRF-Schutz
-csrf = CSRFProtect(app)
+# Erweiterungen ohne App anlegen, create_app() bindet sie (Decorators funktionieren schon vorher)
+csrf = CSRFProtect()
 
 # Rate Limiting (Brute-Force-Schutz)
+# Zähler in einer SQLite-Datei, die sich alle Worker des Hosts teilen
+# (sonst gilt jedes Limit pro Worker; Überschreiben mit RATELIMIT_STORAGE_URI)
 limiter = Limiter(
-    app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=default_storage_uri()
 )
 
 # Flask-Login Setup
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Bitte melde dich an, um fortzufahren.'
 
-# Datenbank initialisieren
-init_db()
-init_timerecords_table()
-init_submissions_table()
-init_profile_table()
+# Routen werden beim Import nur gesammelt, init_routes() registriert sie an einer App
+_ROUTES = []
+
+
+def route(rule, **options):
+    """Wie app.route, aber ohne App: merkt die View für init_routes() vor"""
+    def decorator(view):
+        _ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+def create_app():
+    """
+    App-Factory: erzeugt und konfiguriert eine neue Flask-App.
+
+    Der Import des Moduls baut keine App; das übernimmt der WSGI-Einstieg
+    (wsgi.py bzw. gunicorn "zeitaufzeichnungWeb:create_app()").
+    Teures bleibt bis zum ersten Gebrauch liegen: Schema-Check und DB-Pool
+    beim ersten Request (_lazy_init), PDF-Template und pypdf beim ersten PDF.
+    Die bcrypt-Kalibrierung startet hier in einem Hintergrund-Thread.
+    """
+    app = Flask(__name__)
+
+    # Logging konfigurieren
+    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),  # Console output
+            logging.FileHandler('app.log') if not os.environ.get('RENDER') else logging.StreamHandler()
+        ]
+    )
+
+    # Secret Key: MUSS in Production gesetzt sein!
+    is_production = bool(os.environ.get('DATABASE_URL'))
+    secret_key = os.environ.get("FLASK_SECRET_KEY") or os.environ.get("SECRET_KEY")
+
+    if is_production and not secret_key:
+        raise RuntimeError(
+            "FATAL: SECRET_KEY oder FLASK_SECRET_KEY muss in Production gesetzt sein!\n"
+            "Die App startet nicht ohne sicheren Secret Key."
+        )
+
+    app.secret_key = secret_key or "dev-secret-only-for-local-development"
+    logging.info(f"App läuft im {'PRODUCTION' if is_production else 'DEVELOPMENT'} Modus")
+
+    # Sichere Session-Einstellungen
+    app.config['SESSION_COOKIE_SECURE'] = True  # Nur über HTTPS (in Production)
+    app.config['SESSION_COOKIE_HTTPONLY'] = True  # Kein JavaScript-Zugriff
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # CSRF-Schutz
+    app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 Stunde
+
+    csrf.init_app(app)
+    limiter.init_app(app)
+    login_manager.init_app(app)
+    init_routes(app)
+
+    # bcrypt-Benchmark im Hintergrund, nicht im ersten Login-Request
+    start_calibration()
+
+    COLD_START['import_ms'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+    return app
+
+
+# ============= Lazy Init & Kaltstart-Report =============
+# Nach dem Herunterfahren der Instanz trifft der erste Request auf einen
+# frischen Prozess. Gemessen werden Import, Initialisierung beim ersten
+# Request und dessen Gesamtdauer (im Log und in COLD_START, in ms).
+
+COLD_START = {}
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def _lazy_init():
+    """Schema-Check (öffnet dabei den DB-Pool) beim ersten Request statt beim Import"""
+    global _initialized
+    if _initialized or request.endpoint == 'health':
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        started = time.perf_counter()
+        # Eine Versionsabfrage, Migrationen nur bei veralteter Version
+        ensure_schema()
+        COLD_START['init_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        g.cold_start_request = started
+        _initialized = True
+
+
+def _report_cold_start(response):
+    started = g.pop('cold_start_request', None)
+    if started is not None:
+        COLD_START['first_request_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Kaltstart: Import {COLD_START.get('import_ms')} ms, "
+                    f"Initialisierung {COLD_START['init_ms']} ms, "
+                    f"erster Request {COLD_START['first_request_ms']} ms ({request.path})")
+    return response
+
+
+# ============= Vorübergehend nicht verfügbar =============
+# DB-Neustart, ausgeschöpfter DB-Pool oder ausgelasteter bcrypt-Pool: 503 mit
+# Retry-After statt 500, Load Balancer und Autosave im Browser versuchen es später erneut.
+
+RETRY_AFTER = 5
+
+
+def _service_unavailable(message):
+    if request.path.startswith('/api/'):
+        response = make_response({"success": False, "message": message}, 503)
+    else:
+        response = make_response(message, 503)
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+def database_unavailable(e):
+    logger.warning(f"503 für {request.path}: {e}")
+    return _service_unavailable("Die Datenbank ist gerade nicht erreichbar. Bitte in ein paar Sekunden erneut versuchen.")
+
+
+def password_hash_timeout(e):
+    # Registrierung/Passwort-Reset bei ausgelastetem bcrypt-Pool (Login meldet es selbst)
+    logger.warning(f"503 für {request.path}: {e}")
+    return _service_unavailable("Der Server ist gerade ausgelastet. Bitte in ein paar Sekunden erneut versuchen.")
+
+
+@route("/health")
+@limiter.exempt
+def health():
+    """Erreichbarkeit der Datenbank und Kennzahlen des Connection Pools"""
+    try:
+        with get_db() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        status, code = 'ok', 200
+    except DatabaseUnavailable:
+        status, code = 'unavailable', 503
+    return {"status": status, "database": db_pool_stats()}, code
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return get_user_by_id(int(user_id))
+    # Gecacht: authentifizierte Requests (z.B. Autosave) brauchen keinen DB-Roundtrip
+    return get_user_by_id_cached(int(user_id))
 
 
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 @limiter.limit("5 per minute")  # Max 5 Login-Versuche pro Minute
 def login():
     if request.method == "POST":
@@ -92,7 +204,14 @@ def login():
         
         user = get_user_by_email(email)
         
-        if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        try:
+            authenticated = bool(user) and check_user_password(user.id, user.password_hash, password)
+        except PasswordHashTimeout as e:
+            logger.warning(f"Login nicht möglich: {e}")
+            flash("❌ Anmeldung gerade überlastet. Bitte in ein paar Sekunden erneut versuchen.")
+            return render_template("login.html"), 503, {'Retry-After': str(RETRY_AFTER)}
+        
+        if authenticated:
             if not user.is_approved:
                 flash("❌ Dein Account wartet noch auf Freigabe durch einen Administrator.")
                 return render_template("login.html")
@@ -105,7 +224,7 @@ def login():
     return render_template("login.html")
 
 
-@app.route("/register", methods=["GET", "POST"])
+@route("/register", methods=["GET", "POST"])
 @limiter.limit("10 per hour")  # Max 10 Registrierungen pro Stunde
 def register():
     if request.method == "POST":
@@ -149,7 +268,7 @@ def register():
     return render_template("register.html")
 
 
-@app.route("/admin")
+@route("/admin")
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
@@ -160,7 +279,7 @@ def admin_dashboard():
     return render_template("admin.html", users=users)
 
 
-@app.route("/admin/approve/<int:user_id>", methods=["POST"])
+@route("/admin/approve/<int:user_id>", methods=["POST"])
 @login_required
 def admin_approve(user_id):
     if not current_user.is_admin:
@@ -172,7 +291,7 @@ def admin_approve(user_id):
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/admin/reject/<int:user_id>", methods=["POST"])
+@route("/admin/reject/<int:user_id>", methods=["POST"])
 @login_required
 def admin_reject(user_id):
     if not current_user.is_admin:
@@ -184,7 +303,7 @@ def admin_reject(user_id):
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/forgot-password", methods=["GET", "POST"])
+@route("/forgot-password", methods=["GET", "POST"])
 @limiter.limit("5 per hour")  # Max 5 Passwort-Reset-Anfragen pro Stunde
 def forgot_password():
     if request.method == "POST":
@@ -217,7 +336,7 @@ def forgot_password():
     return render_template("forgot_password.html")
 
 
-@app.route("/reset-password/<token>", methods=["GET", "POST"])
+@route("/reset-password/<token>", methods=["GET", "POST"])
 def reset_password_route(token):
     user = get_user_by_reset_token(token)
     
@@ -244,7 +363,7 @@ def reset_password_route(token):
     return render_template("reset_password.html", token=token)
 
 
-@app.route("/logout")
+@route("/logout")
 @login_required
 def logout():
     logout_user()
@@ -252,7 +371,7 @@ def logout():
     return redirect(url_for("login"))
 
 
-@app.route("/profile", methods=["GET", "POST"])
+@route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
     """Benutzer-Profilseite zum Anzeigen und Bearbeiten persönlicher Daten"""
@@ -273,19 +392,19 @@ def profile():
     return render_template("profile.html", profile=profile_data)
 
 
-@app.route("/datenschutz")
+@route("/datenschutz")
 def datenschutz():
     """DSGVO-Datenschutzerklärung"""
     return render_template("datenschutz.html")
 
 
-@app.route("/impressum")
+@route("/impressum")
 def impressum():
     """Impressum"""
     return render_template("impressum.html")
 
 
-@app.route("/account/export")
+@route("/account/export")
 @login_required
 def account_export():
     """Exportiert alle Benutzerdaten als JSON (DSGVO Art. 20)"""
@@ -306,7 +425,7 @@ def account_export():
     return response
 
 
-@app.route("/account/delete", methods=["GET", "POST"])
+@route("/account/delete", methods=["GET", "POST"])
 @login_required
 def account_delete():
     """Löscht den eigenen Account (DSGVO Art. 17)"""
@@ -327,7 +446,7 @@ def account_delete():
 
 # ============= API für Zeitaufzeichnungen =============
 
-@app.route("/api/timerecords", methods=["GET"])
+@route("/api/timerecords", methods=["GET"])
 @login_required
 def api_get_all_timerecords():
     """Gibt alle Zeitaufzeichnungen des aktuellen Users zurück"""
@@ -335,17 +454,41 @@ def api_get_all_timerecords():
     return {"success": True, "records": records}
 
 
-@app.route("/api/timerecords/<month_year>", methods=["GET"])
+@route("/api/timerecords/<month_year>", methods=["GET"])
 @login_required
 def api_get_timerecord(month_year):
     """Gibt eine spezifische Zeitaufzeichnung zurück"""
     record = get_timerecord(current_user.id, month_year)
-    if record:
-        return {"success": True, "record": record}
-    return {"success": False, "message": "Keine Daten gefunden"}, 404
+    if not record:
+        return {"success": False, "message": "Keine Daten gefunden"}, 404
+
+    # Unveränderte Daten: 304 ohne Body (Client hat den Stand bereits)
+    if request.if_none_match.contains_weak(record['etag']):
+        response = make_response('', 304)
+    else:
+        response = make_response({"success": True, "record": record})
+    response.set_etag(record['etag'])
+    response.headers['Cache-Control'] = 'no-cache, private'
+    return response
+
 
+def _request_if_match():
+    """Erster starker ETag aus If-Match (None ohne Header oder bei '*')"""
+    if request.if_match.star_tag:
+        return None
+    return next(iter(request.if_match), None)
+
+
+def _precondition_failed(error):
+    """412-Antwort mit dem aktuellen ETag, damit der Client neu laden kann"""
+    response = make_response({"success": False, "message": str(error),
+                              "etag": error.current_etag}, 412)
+    if error.current_etag:
+        response.set_etag(error.current_etag)
+    return response
 
-@app.route("/api/timerecords/<month_year>", methods=["POST", "PUT"])
+
+@route("/api/timerecords/<month_year>", methods=["POST", "PUT"])
 @login_required
 def api_save_timerecord(month_year):
     """Speichert oder aktualisiert eine Zeitaufzeichnung"""
@@ -355,25 +498,64 @@ def api_save_timerecord(month_year):
         return {"success": False, "message": "Keine Formulardaten übermittelt"}, 400
     
     try:
-        save_timerecord(current_user.id, month_year, data["form_data"])
-        # Lade Daten zurück um updated_at zu bekommen
-        record = get_timerecord(current_user.id, month_year)
-        return {"success": True, "message": "Daten gespeichert", "updated_at": record['updated_at'] if record else None}
+        result = save_timerecord(current_user.id, month_year, data["form_data"],
+                                 if_match=_request_if_match())
+        response = make_response({"success": True, "message": "Daten gespeichert",
+                                  "updated_at": result['updated_at'],
+                                  "version": result['version'],
+                                  "unchanged": not result['written']})
+        response.set_etag(result['etag'])
+        return response
+    except TimerecordPreconditionFailed as e:
+        return _precondition_failed(e)
+    except DatabaseUnavailable:
+        raise  # 503 über den Error-Handler, nicht als 500
     except Exception as e:
         return {"success": False, "message": str(e)}, 500
 
 
-@app.route("/api/timerecords/<month_year>", methods=["DELETE"])
+@route("/api/timerecords/<month_year>", methods=["PATCH"])
+@login_required
+def api_patch_timerecord(month_year):
+    """Aktualisiert nur geänderte Felder (JSON Merge Patch, RFC 7396)"""
+    patch = request.get_json(force=True, silent=True)
+    
+    if not isinstance(patch, dict):
+        return {"success": False, "message": "Merge Patch muss ein JSON-Objekt sein"}, 400
+    
+    try:
+        record = patch_timerecord(current_user.id, month_year, patch, if_match=_request_if_match())
+        if record is None:
+            return {"success": False, "message": "Keine Daten gefunden"}, 404
+        response = make_response({"success": True, "message": "Daten gespeichert",
+                                  "updated_at": record['updated_at'],
+                                  "version": record['version'],
+                                  "unchanged": not record['written']})
+        response.set_etag(record['etag'])
+        return response
+    except TimerecordPreconditionFailed as e:
+        return _precondition_failed(e)
+    except TimerecordConflict as e:
+        return {"success": False, "message": str(e)}, 409
+    except DatabaseUnavailable:
+        raise  # 503 über den Error-Handler, nicht als 500
+    except Exception as e:
+        return {"success": False, "message": str(e)}, 500
+
+
+@route("/api/timerecords/<month_year>", methods=["DELETE"])
 @login_required
 def api_delete_timerecord(month_year):
     """Löscht eine Zeitaufzeichnung"""
     try:
         delete_timerecord(current_user.id, month_year)
         return {"success": True, "message": "Daten gelöscht"}
+    except DatabaseUnavailable:
+        raise  # 503 über den Error-Handler, nicht als 500
     except Exception as e:
         return {"success": False, "message": str(e)}, 500
 
-@app.route("/api/timerecords/<month_year>/submit", methods=["POST"])
+@route("/api/timerecords/<month_year>/submit", methods=["POST"])
 @login_required
 def api_submit_timerecord(month_year):
     """Reicht eine Zeitaufzeichnung beim Admin ein"""
@@ -402,11 +584,39 @@ def api_submit_timerecord(month_year):
         submit_timerecord(current_user.id, month_year, json.dumps(form_data))
         
         return {"success": True, "message": "Daten an Admin gesendet"}
+    except DatabaseUnavailable:
+        raise  # 503 über den Error-Handler, nicht als 500
     except Exception as e:
         return {"success": False, "message": str(e)}, 500
 
 
-@app.route("/admin/submissions")
+def _parse_submission_form_data(sub):
+    """Parst form_data einer Submission inkl. verschachtelter JSON-Listen für die Anzeige"""
+    try:
+        form_data = json.loads(sub['form_data'])
+        sub['form_data_parsed'] = form_data
+        
+        # Parse nested JSON strings (Arbeitszeiten, Gottesdienste)
+        if 'Arbeitszeiten' in form_data and isinstance(form_data['Arbeitszeiten'], str):
+            try:
+                form_data['Arbeitszeiten'] = json.loads(form_data['Arbeitszeiten'])
+            except:
+                form_data['Arbeitszeiten'] = []
+        
+        if 'Gottesdienste' in form_data and isinstance(form_data['Gottesdienste'], str):
+            try:
+                form_data['Gottesdienste'] = json.loads(form_data['Gottesdienste'])
+            except:
+                form_data['Gottesdienste'] = []
+                
+    except Exception as e:
+        logger.error(f"Error parsing submission data: {e}")
+        sub['form_data_parsed'] = {}
+    
+    return sub
+
+
+@route("/admin/submissions")
 @login_required
 def admin_submissions():
     """Zeigt alle eingereichten Zeitaufzeichnungen mit Filter und Pagination"""
@@ -416,86 +626,35 @@ def admin_submissions():
     
     # Parameter aus Query-String
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
     search = request.args.get('search', '').strip().lower()
     month_filter = request.args.get('month', '').strip()
     taetigkeit_filter = request.args.get('taetigkeit', '').strip()
     sort_by = request.args.get('sort', 'date_desc')
     
-    submissions = get_all_submitted_timerecords()
-    
-    # Parse JSON form_data für jede Submission
-    for sub in submissions:
-        try:
-            form_data = json.loads(sub['form_data'])
-            sub['form_data_parsed'] = form_data
-            
-            # Parse nested JSON strings (Arbeitszeiten, Gottesdienste)
-            if 'Arbeitszeiten' in form_data and isinstance(form_data['Arbeitszeiten'], str):
-                try:
-                    form_data['Arbeitszeiten'] = json.loads(form_data['Arbeitszeiten'])
-                except:
-                    form_data['Arbeitszeiten'] = []
-            
-            if 'Gottesdienste' in form_data and isinstance(form_data['Gottesdienste'], str):
-                try:
-                    form_data['Gottesdienste'] = json.loads(form_data['Gottesdienste'])
-                except:
-                    form_data['Gottesdienste'] = []
-                    
-        except Exception as e:
-            logger.error(f"Error parsing submission data: {e}")
-            sub['form_data_parsed'] = {}
+    # Filter, Sortierung und Pagination laufen in der Datenbank
+    result = query_submissions(
+        search=search,
+        month=month_filter,
+        taetigkeit=taetigkeit_filter,
+        sort=sort_by,
+        page=page,
+        per_page=per_page,
+    )
+    paginated_submissions = result['submissions']
     
-    # Filter anwenden
-    filtered_submissions = []
-    for sub in submissions:
-        data = sub.get('form_data_parsed', {})
-        
-        # Suchfilter (Name, Pfarrei, Email)
-        if search:
-            searchable = f"{sub.get('username', '')} {sub.get('email', '')} {data.get('Vorname', '')} {data.get('Nachname', '')} {data.get('Kath. Kirchengemeinde', '')}".lower()
-            if search not in searchable:
-                continue
-        
-        # Monatsfilter
-        if month_filter and sub.get('month_year', '') != month_filter:
-            continue
-        
-        # Tätigkeitsfilter
-        if taetigkeit_filter and data.get('Tätigkeit', '') != taetigkeit_filter:
-            continue
-        
-        filtered_submissions.append(sub)
-    
-    # Sortierung
-    if sort_by == 'date_desc':
-        filtered_submissions.sort(key=lambda x: x.get('submitted_at', ''), reverse=True)
-    elif sort_by == 'date_asc':
-        filtered_submissions.sort(key=lambda x: x.get('submitted_at', ''))
-    elif sort_by == 'name':
-        filtered_submissions.sort(key=lambda x: (x['form_data_parsed'].get('Nachname', ''), x['form_data_parsed'].get('Vorname', '')))
-    elif sort_by == 'month':
-        filtered_submissions.sort(key=lambda x: x.get('month_year', ''))
-    
-    # Pagination
-    total = len(filtered_submissions)
-    total_pages = (total + per_page - 1) // per_page if per_page > 0 else 1
-    page = max(1, min(page, total_pages))
-    
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated_submissions = filtered_submissions[start:end]
+    # Nur die Submissions der aktuellen Seite parsen
+    for sub in paginated_submissions:
+        _parse_submission_form_data(sub)
     
     # Verfügbare Monate und Tätigkeiten für Filter
-    available_months = sorted(list(set(sub.get('month_year', '') for sub in submissions if sub.get('month_year'))), reverse=True)
-    available_taetigkeiten = sorted(list(set(sub['form_data_parsed'].get('Tätigkeit', '') for sub in submissions if sub['form_data_parsed'].get('Tätigkeit'))))
+    available_months, available_taetigkeiten = get_submission_filter_options()
     
     return render_template("admin_submissions.html", 
                          submissions=paginated_submissions,
-                         page=page,
-                         total_pages=total_pages,
-                         total=total,
+                         page=result['page'],
+                         total_pages=result['total_pages'],
+                         total=result['total'],
                          per_page=per_page,
                          search=search,
                          month_filter=month_filter,
@@ -505,7 +664,140 @@ def admin_submissions():
                          available_taetigkeiten=available_taetigkeiten)
 
 
-@app.route("/admin/submissions/delete/<int:submission_id>", methods=["POST"])
+@route("/api/admin/submissions", methods=["GET"])
+@login_required
+def api_admin_submissions():
+    """Eingereichte Zeitaufzeichnungen als JSON mit Cursor-Pagination (Keyset über submitted_at, id)"""
+    if not current_user.is_admin:
+        return {"success": False, "message": "Keine Berechtigung"}, 403
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    direction = request.args.get('direction', 'next')
+    if direction not in ('next', 'prev'):
+        return {"success": False, "message": "direction muss 'next' oder 'prev' sein"}, 400
+
+    cursor_key = None
+    cursor = request.args.get('cursor', '').strip()
+    if cursor:
+        try:
+            cursor_key = decode_cursor(cursor)
+            if len(cursor_key) != 2:
+                raise ValueError(f"Ungültiger Cursor: {cursor}")
+        except ValueError as e:
+            return {"success": False, "message": str(e)}, 400
+
+    result = get_submissions_by_cursor(
+        cursor_key=cursor_key,
+        direction=direction,
+        limit=limit,
+        search=request.args.get('search', '').strip().lower(),
+        month=request.args.get('month', '').strip(),
+        taetigkeit=request.args.get('taetigkeit', '').strip(),
+    )
+
+    return {
+        "success": True,
+        "submissions": result['submissions'],
+        "next_cursor": encode_cursor(result['next_key']) if result['next_key'] else None,
+        "prev_cursor": encode_cursor(result['prev_key']) if result['prev_key'] else None,
+    }
+
+
+@route("/api/admin/entries", methods=["GET"])
+@login_required
+def api_admin_entries():
+    """Eingereichte Gottesdienste/Arbeitszeiten pro Tag, User oder Kirchort als JSON"""
+    if not current_user.is_admin:
+        return {"success": False, "message": "Keine Berechtigung"}, 403
+
+    date_from = request.args.get('from', '').strip()
+    date_to = request.args.get('to', '').strip()
+    for value in (date_from, date_to):
+        if value and not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
+            return {"success": False, "message": f"Ungültiges Datum (YYYY-MM-DD): {value}"}, 400
+
+    entries = get_timerecord_entries(
+        user_id=request.args.get('user_id', type=int),
+        kirchort=request.args.get('kirchort', '').strip(),
+        kind=request.args.get('kind', '').strip(),
+        date_from=date_from,
+        date_to=date_to,
+        limit=max(1, min(request.args.get('limit', 1000, type=int), 5000)),
+    )
+    return {"success": True, "entries": entries}
+
+
+@route("/api/admin/reports/<int:year>", methods=["GET"])
+@login_required
+def api_admin_yearly_report(year):
+    """Jahresreport (Stunden, Gottesdienste, Honorare) aus den Monatssummen als JSON"""
+    if not current_user.is_admin:
+        return {"success": False, "message": "Keine Berechtigung"}, 403
+
+    report = get_yearly_report(year, user_id=request.args.get('user_id', type=int))
+    return {"success": True, "year": year, **report}
+
+
+@route("/admin/submissions/export/<month_year>")
+@login_required
+def admin_export_month(month_year):
+    """Exportiert alle PDFs eines Monats als ZIP (parallel gerendert, gestreamt)"""
+    if not current_user.is_admin:
+        flash("❌ Keine Berechtigung.")
+        return redirect(url_for("index"))
+    
+    submissions = get_submissions_for_month(month_year)
+    if not submissions:
+        flash(f"ℹ️ Keine Zeitaufzeichnungen für {month_year} vorhanden.")
+        return redirect(url_for("admin_submissions", month=month_year))
+    
+    files = []
+    used_names = set()
+    for sub in submissions:
+        try:
+            form_data = json.loads(sub['form_data'])
+        except (TypeError, ValueError) as e:
+            logger.error(f"Submission {sub['id']} hat ungültige Formulardaten: {e}")
+            continue
+        
+        # Gleichnamige Mitarbeiter bekommen ein Suffix statt sich zu überschreiben
+        filename = generate_filename(form_data, 'pdf')
+        base, ext = os.path.splitext(filename)
+        suffix = 2
+        while filename in used_names:
+            filename = f"{base}_{suffix}{ext}"
+            suffix += 1
+        used_names.add(filename)
+        files.append((filename, form_data))
+    
+    logger.info(f"Admin {current_user.username} exportiert {len(files)} PDFs für {month_year}")
+    
+    response = Response(stream_pdf_zip(files), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="Zeitaufzeichnungen_{month_year}.zip"'
+    return response
+
+
+@route("/admin/submissions/export.csv")
+@login_required
+def admin_export_csv():
+    """Streamt alle Submissions der aktuellen Filter als CSV (eine Zeile pro Eintrag)"""
+    if not current_user.is_admin:
+        flash("❌ Keine Berechtigung.")
+        return redirect(url_for("index"))
+    
+    search = request.args.get('search', '').strip().lower()
+    month_filter = request.args.get('month', '').strip()
+    taetigkeit_filter = request.args.get('taetigkeit', '').strip()
+    
+    logger.info(f"Admin {current_user.username} exportiert CSV (Suche '{search}', Monat '{month_filter}', Tätigkeit '{taetigkeit_filter}')")
+    
+    rows = iter_submission_export(search=search, month=month_filter, taetigkeit=taetigkeit_filter)
+    response = Response(iter_csv(EXPORT_COLUMNS, rows), mimetype="text/csv; charset=utf-8")
+    response.headers["Content-Disposition"] = f'attachment; filename="Zeitaufzeichnungen_{month_filter or "alle"}.csv"'
+    return response
+
+
+@route("/admin/submissions/delete/<int:submission_id>", methods=["POST"])
 @login_required
 def admin_delete_submission(submission_id):
     """Löscht eine eingereichte Zeitaufzeichnung"""
@@ -523,7 +815,7 @@ def admin_delete_submission(submission_id):
     return redirect(url_for("admin_submissions"))
 
 
-@app.route("/", methods=["GET", "POST"])
+@route("/", methods=["GET", "POST"])
 @login_required
 def index():
     if request.method == "POST":
@@ -542,13 +834,12 @@ def index():
         # CSV senden (kein PDF nötig)
         if action == 'send_csv':
             fields = list(request.form.keys())
-            # create temp csv
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode='w', newline='', encoding='utf-8')
             try:
-                writer = csv.writer(tmp)
+                # CSV komplett im Speicher erzeugen
+                buffer = io.StringIO(newline='')
+                writer = csv.writer(buffer)
                 writer.writerow(fields)
                 writer.writerow([request.form.get(k, '') for k in fields])
-                tmp.close()
 
                 # Nutze generate_filename aus utils für konsistente Benennung
                 csv_filename = generate_filename(form_data, 'csv')
@@ -558,32 +849,17 @@ def index():
                     logger.warning("MAIL_TO nicht gesetzt - CSV-Versand fehlgeschlagen")
                     flash("❌ E-Mail-Konfiguration fehlt. Bitte Administrator kontaktieren.")
                     return redirect(url_for("index"))
-                send_csv_mail(csv_path=tmp.name, recipient=mail_to, filename=csv_filename)
-                try:
-                    os.remove(tmp.name)
-                except OSError:
-                    pass
+                send_csv_mail(csv_data=buffer.getvalue().encode('utf-8'), recipient=mail_to, filename=csv_filename)
 
                 flash("✅ CSV wurde erfolgreich an die Verwaltung gesendet.")
                 return redirect(url_for("index"))
             except Exception as e:
-                try:
-                    tmp.close()
-                except Exception:
-                    pass
-                try:
-                    os.remove(tmp.name)
-                except Exception:
-                    pass
                 flash(f"❌ Fehler beim CSV-Versand: {e}")
                 return redirect(url_for("index"))
 
-        # PDF temporär erzeugen
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        tmp.close()
-
         try:
-            create_pdf(form_data, tmp.name)
+            # PDF im Speicher erzeugen (keine Temp-Dateien)
+            pdf_data = create_pdf(form_data)
 
             # Nutze Utility-Funktion für standardisierten Dateinamen
             pdf_filename = generate_filename(form_data, 'pdf')
@@ -596,44 +872,23 @@ def index():
                     flash("❌ E-Mail-Konfiguration fehlt. Bitte Administrator kontaktieren.")
                     return redirect(url_for("index"))
                 send_pdf_mail(
-                    pdf_path=tmp.name,
+                    pdf_data=pdf_data,
                     recipient=mail_to,
                     filename=pdf_filename,
                 )
 
-                # Temp-PDF entfernen
-                try:
-                    os.remove(tmp.name)
-                except OSError:
-                    pass
-
                 flash("✅ PDF wurde erfolgreich an die Verwaltung gesendet.")
                 return redirect(url_for("index"))
 
             # 👉 normaler Download
-            response = send_file(
-                tmp.name,
+            return send_file(
+                io.BytesIO(pdf_data),
+                mimetype="application/pdf",
                 as_attachment=True,
                 download_name=pdf_filename,
             )
 
-            # Temp-Datei nach dem Response löschen
-            @response.call_on_close
-            def cleanup():
-                try:
-                    os.remove(tmp.name)
-                except OSError:
-                    pass
-
-            return response
-
         except Exception as e:
-            # bei Fehler: Temp-Datei entfernen + Fehlermeldung anzeigen
-            try:
-                os.remove(tmp.name)
-            except OSError:
-                pass
-
             flash(f"❌ Fehler: {e}")
             return redirect(url_for("index"))
 
@@ -645,7 +900,18 @@ def index():
     )
 
 
+def init_routes(app):
+    """Registriert Hooks, Fehlerbehandlung und alle Routen an der App"""
+    app.before_request(_lazy_init)
+    app.after_request(_report_cold_start)
+    app.register_error_handler(DatabaseUnavailable, database_unavailable)
+    app.register_error_handler(PasswordHashTimeout, password_hash_timeout)
+    for rule, view, options in _ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+
+
 if __name__ == "__main__":
     # Debug-Mode nur in Entwicklung aktivieren
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() in ('true', '1', 'yes')
+    app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=debug_mode)